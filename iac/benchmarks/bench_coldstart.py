@@ -0,0 +1,156 @@
+import argparse
+import compileall
+import datetime
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+#################################
+# Cold start benchmark: module initialization of each aoss handler
+#
+# Imports every handler in a fresh interpreter (what a Lambda cold start does before the
+# first invocation), with the dependency layer from aoss-layer.zip (precompiled, as deployed)
+# and the aoss_common layer on sys.path like /opt/python. Reports the median init time per
+# handler over --runs fresh processes and the slowest top-level imports (python -X
+# importtime), appends the run to a JSON lines file and compares it with the previous run.
+# Init-phase network warmup is off (INIT_WARMUP=0) since there is no collection to talk to.
+# From the iac directory:
+#   python benchmarks/bench_coldstart.py --runs 10
+#################################
+
+IAC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(IAC_DIR, "iac", "lambda")
+LAYER_ZIP = os.path.join(LAMBDA_DIR, "custom_packages", "layers", "aoss-layer.zip")
+COMMON_DIR = os.path.join(LAMBDA_DIR, "custom_packages", "aoss_common", "python")
+RESULTS_FILE = os.path.join(IAC_DIR, "benchmarks", "coldstart.jsonl")
+
+CHILD = """
+import importlib.util, json, sys, time
+sys.path[:0] = {paths!r}
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("index", {handler!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps({{"init_ms": (time.perf_counter() - started) * 1000}}))
+"""
+
+CHILD_ENV = {
+    "AOSS_ENDPOINT": "https://localhost",
+    "EMBEDDINGS_API": "http://localhost/embeddings",
+    "EMBEDDINGS_API_KEY": "local",
+    "CORS_ALLOW_UI": "*",
+    "LOCALHOST_ORIGIN": "",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "local",
+    "AWS_SECRET_ACCESS_KEY": "local",
+    "AWS_SESSION_TOKEN": "local",
+    "INIT_WARMUP": "0",
+    "PYTHONDONTWRITEBYTECODE": "1"
+}
+
+
+def handlers():
+    root = os.path.join(LAMBDA_DIR, "aoss")
+    return sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "index.py")))
+
+
+def run_child(handler, paths, importtime=False):
+    env = {**os.environ, **CHILD_ENV}
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        "-c", CHILD.format(paths=paths, handler=os.path.join(LAMBDA_DIR, "aoss", handler, "index.py"))
+    ]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def top_imports(stderr, limit):
+    # top-level entries of -X importtime: "import time: self | cumulative | name"
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=IAC_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def previous_run(path, config):
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path) as fp:
+        for line in fp:
+            run = json.loads(line)
+            if run["config"] == config:
+                last = run
+    return last
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark for the aoss handlers")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per handler")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to show per handler")
+    parser.add_argument("--layer", default=LAYER_ZIP, help="dependency layer zip")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as layer_dir:
+        with zipfile.ZipFile(args.layer) as layer:
+            layer.extractall(layer_dir)
+        # the layer ships bytecode for the runtime's Python (README.md); compile it for this one
+        compileall.compile_dir(os.path.join(layer_dir, "python"), quiet=1)
+        # a clean copy, so bytecode cached by local runs doesn't flatter the numbers
+        common_dir = os.path.join(layer_dir, "common")
+        shutil.copytree(COMMON_DIR, common_dir, ignore=shutil.ignore_patterns("__pycache__"))
+        paths = [common_dir, os.path.join(layer_dir, "python")]
+
+        results = {}
+        for handler in handlers():
+            timings = [run_child(handler, paths)[0]["init_ms"] for _ in range(args.runs)]
+            _, stderr = run_child(handler, paths, importtime=True)
+            results[handler] = {
+                "init_ms": statistics.median(timings),
+                "min_ms": min(timings),
+                "top_imports": top_imports(stderr, args.top)
+            }
+
+    run = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "label": args.label,
+        "config": {"runs": args.runs, "layer": os.path.basename(args.layer), "python": sys.version.split()[0]},
+        "handlers": results
+    }
+    previous = previous_run(args.results, run["config"])
+
+    print(f"cold start, median of {args.runs} fresh interpreters (revision {run['revision']})")
+    for handler, result in results.items():
+        line = f"{handler:<20}{result['init_ms']:>9.1f} ms"
+        before = previous["handlers"].get(handler) if previous else None
+        if before:
+            line += f"   {result['init_ms'] - before['init_ms']:+.1f} ms vs {previous['revision']}"
+        print(line)
+        for name, ms in result["top_imports"]:
+            print(f"    {name:<32}{ms:>8.1f} ms")
+
+    with open(args.results, "a") as fp:
+        fp.write(json.dumps(run) + "\n")
+
+
+if __name__ == "__main__":
+    main()
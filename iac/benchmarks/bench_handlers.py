@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+#################################
+# Offline benchmark for the ingest and search handlers
+#
+# Drives ingest_post / search_post with synthetic API Gateway events against local stand-ins
+# (see standins.py): Comprehend Medical, the embeddings API and an in-memory OpenSearch
+# backend, each with configurable latency and error rate. Reports p50/p95/p99 per handler,
+# per stand-in call and per handler stage (the EMF records of metrics.py, collected with a
+# LocalSink) and appends every run to a JSON lines file, compared against the previous run
+# with the same settings. From the iac directory:
+#   python benchmarks/bench_handlers.py --requests 500 --search-latency 15 --embeddings-latency 40
+#################################
+
+IAC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(IAC_DIR, "iac", "lambda")
+RESULTS_FILE = os.path.join(IAC_DIR, "benchmarks", "results.jsonl")
+
+# handlers read these at import time; nothing below talks to AWS
+os.environ.setdefault("AOSS_ENDPOINT", "https://localhost")
+os.environ.setdefault("EMBEDDINGS_API", "http://localhost/embeddings")
+os.environ.setdefault("EMBEDDINGS_API_KEY", "local")
+os.environ.setdefault("CORS_ALLOW_UI", "*")
+os.environ.setdefault("LOCALHOST_ORIGIN", "")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ["SEARCH_BACKEND"] = "memory"
+os.environ["INGEST_POLL_INTERVAL"] = os.environ.get("INGEST_POLL_INTERVAL", "0.01")
+sys.path.insert(0, os.path.join(LAMBDA_DIR, "custom_packages", "aoss_common", "python"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aoss_common import backend, embeddings, entities, metrics  # noqa: E402
+from standins import Fault, FakeComprehendMedical, FakeEmbeddings, FaultyMemoryBackend, Recorder, synthetic_statement  # noqa: E402
+
+
+def load_handler(name):
+    # every function is iac/lambda/aoss/<name>/index.py, so load them under their own names
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", os.path.join(LAMBDA_DIR, "aoss", name, "index.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(timings, errors):
+    return {
+        stage: {
+            "count": len(values),
+            "errors": errors.get(stage, 0),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99)
+        }
+        for stage, values in sorted(timings.items()) if values
+    }
+
+
+def ingest_event(statement):
+    return {"body": json.dumps({"statement": statement, "intent": "symptom", "severity": "medium", "source": "patient"})}
+
+
+def search_event(statement):
+    return {"body": json.dumps({
+        "statement": statement, "intent": "", "severity": "", "source": "", "topics": [], "medicalConditions": []
+    })}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=IAC_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    entities.comprehend_client = FakeComprehendMedical(recorder, Fault(args.comprehend_latency, args.comprehend_errors, seed=args.seed))
+    embeddings.request_embeddings = FakeEmbeddings(recorder, Fault(args.embeddings_latency, args.embeddings_errors, seed=args.seed + 1))
+    backend.set_backend(FaultyMemoryBackend(recorder, Fault(args.search_latency, args.search_errors, seed=args.seed + 2)))
+    sink = metrics.LocalSink()
+    metrics.set_sink(sink)
+
+    log = io.StringIO() if not args.verbose else sys.stdout
+    with contextlib.redirect_stdout(log):
+        handlers = {name: load_handler(name) for name in ("bootstrap", "ingest_post", "search_post")}
+        handlers["bootstrap"]({}, None)
+
+        # corpus to search against; not measured
+        seen = []
+        for _ in range(args.corpus):
+            statement = synthetic_statement(rng)
+            handlers["ingest_post"](ingest_event(statement), None)
+            seen.append(statement)
+        recorder.timings.clear()
+        recorder.errors.clear()
+        sink.records.clear()
+
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            repeat = seen and rng.random() < args.repeat_ratio
+            statement = rng.choice(seen) if repeat else synthetic_statement(rng)
+            if rng.random() < args.search_ratio:
+                name, event = "search_post", search_event(statement)
+            else:
+                name, event = "ingest_post", ingest_event(statement)
+                seen.append(statement)
+            response = recorder.timed(f"handler.{name}", handlers[name], event, None)
+            if response["statusCode"] != 200:
+                recorder.errors[f"handler.{name}"] += 1
+        elapsed = time.perf_counter() - started
+
+    for (route, name), values in sink.timings().items():
+        recorder.timings[f"stage.{route}.{name}"] = values
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "label": args.label,
+        "config": {key: value for key, value in vars(args).items() if key not in ("label", "results", "verbose")},
+        "throughput": args.requests / elapsed,
+        "stages": summarize(recorder.timings, recorder.errors)
+    }
+
+
+def previous_run(path, config):
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path) as fp:
+        for line in fp:
+            run = json.loads(line)
+            if run["config"] == config:
+                last = run
+    return last
+
+
+def report(result, previous):
+    print(f"{result['config']['requests']} requests, {result['throughput']:.1f} req/s (revision {result['revision']})")
+    print(f"{'stage':<28}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in result["stages"].items():
+        line = f"{stage:<28}{stats['count']:>7}{stats['errors']:>8}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}"
+        before = previous["stages"].get(stage) if previous else None
+        if before:
+            line += f"   p95 {stats['p95'] - before['p95']:+.2f} vs {previous['revision']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--corpus", type=int, default=200, help="statements ingested before measuring")
+    parser.add_argument("--search-ratio", type=float, default=0.5)
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="share of requests reusing an earlier statement")
+    parser.add_argument("--comprehend-latency", type=float, default=0.0, help="mean ms")
+    parser.add_argument("--comprehend-errors", type=float, default=0.0, help="error rate 0..1")
+    parser.add_argument("--embeddings-latency", type=float, default=0.0)
+    parser.add_argument("--embeddings-errors", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.0)
+    parser.add_argument("--search-errors", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="", help="free text stored with the run")
+    parser.add_argument("--results", default=RESULTS_FILE)
+    parser.add_argument("--verbose", action="store_true", help="keep the handlers' own output")
+    args = parser.parse_args()
+
+    result = run(args)
+    previous = previous_run(args.results, result["config"])
+    report(result, previous)
+    with open(args.results, "a") as fp:
+        fp.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import hashlib
+import random
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from opensearchpy.exceptions import ConnectionError as OpenSearchConnectionError
+
+from aoss_common.backend import MemoryBackend
+from aoss_common.embeddings_client import EmbeddingsError
+
+#################################
+# Local stand-ins for the services the handlers call
+#
+# Each one sleeps for an injected latency (mean ms, log-normal jitter), fails at an injected
+# error rate, and records how long every call took under its stage name in a Recorder.
+#################################
+
+VECTOR_DIMENSION = 1536
+
+SYMPTOMS = ["headache", "nausea", "fatigue", "dizziness", "fever", "cough", "rash", "insomnia", "anxiety", "pain"]
+CONDITIONS = ["diabetes", "asthma", "hypertension", "migraine", "arthritis", "depression"]
+BODY_PARTS = ["head", "chest", "back", "knee", "stomach", "throat"]
+MEDICATIONS = ["ibuprofen", "metformin", "insulin", "albuterol"]
+CATEGORIES = {
+    **{word: "MEDICAL_CONDITION" for word in SYMPTOMS + CONDITIONS},
+    **{word: "ANATOMY" for word in BODY_PARTS},
+    **{word: "MEDICATION" for word in MEDICATIONS}
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, failed=False):
+        with self._lock:
+            self.timings[stage].append(seconds * 1000)
+            if failed:
+                self.errors[stage] += 1
+
+    def timed(self, stage, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(stage, time.perf_counter() - started, failed=True)
+            raise
+        self.record(stage, time.perf_counter() - started)
+        return result
+
+
+class Fault:
+    # latency_ms: mean injected latency; jitter: sigma of the log-normal multiplier
+    def __init__(self, latency_ms=0.0, error_rate=0.0, jitter=0.25, seed=None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self.random = random.Random(seed)
+
+    def inject(self, name):
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms * self.random.lognormvariate(0, self.jitter) / 1000)
+        if self.error_rate > 0 and self.random.random() < self.error_rate:
+            raise RuntimeError(f"Injected {name} failure")
+
+
+class FakeComprehendMedical:
+    # detect_entities_v2 with the response shape entities.detect_entities reads
+    def __init__(self, recorder, fault):
+        self.recorder = recorder
+        self.fault = fault
+
+    def _detect(self, Text):
+        self.fault.inject("comprehendmedical")
+        entities = []
+        for word in Text.lower().split():
+            if word in CATEGORIES:
+                entities.append({"Text": word, "Category": CATEGORIES[word], "Score": 0.9, "Type": "DX_NAME"})
+        return {"Entities": entities}
+
+    def detect_entities_v2(self, Text):
+        return self.recorder.timed("comprehendmedical", self._detect, Text)
+
+
+class FakeEmbeddings:
+    # bag-of-words vectors: statements sharing words get similar embeddings, like the real API
+    def __init__(self, recorder, fault):
+        self.recorder = recorder
+        self.fault = fault
+        self._words = {}
+        self._lock = threading.Lock()
+
+    def _word(self, word):
+        with self._lock:
+            if word not in self._words:
+                seed = int(hashlib.sha256(word.encode("utf-8")).hexdigest()[:16], 16)
+                self._words[word] = np.random.default_rng(seed).normal(size=VECTOR_DIMENSION)
+            return self._words[word]
+
+    def _embed(self, statement):
+        try:
+            self.fault.inject("embeddings")
+        except RuntimeError as e:
+            raise EmbeddingsError(str(e))
+        vector = sum(self._word(word) for word in statement.split()) if statement.split() else np.ones(VECTOR_DIMENSION)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def __call__(self, statement):
+        return self.recorder.timed("embeddings", self._embed, statement)
+
+
+class FaultyMemoryBackend(MemoryBackend):
+    # MemoryBackend with per-call latency/errors; reads and writes are recorded separately
+    def __init__(self, recorder, fault):
+        super().__init__()
+        self.recorder = recorder
+        self.fault = fault
+
+    def _call(self, stage, fn, *args, **kwargs):
+        def call():
+            try:
+                self.fault.inject("opensearch")
+            except RuntimeError as e:
+                raise OpenSearchConnectionError("N/A", str(e), e)
+            return fn(*args, **kwargs)
+        return self.recorder.timed(stage, call)
+
+    def search(self, index, body, scroll=None):
+        return self._call("opensearch.read", super().search, index, body, scroll)
+
+    def msearch(self, body):
+        return self._call("opensearch.read", super().msearch, body)
+
+    def scroll(self, scroll_id, scroll):
+        return self._call("opensearch.read", super().scroll, scroll_id, scroll)
+
+    def index(self, index, body, id=None):
+        return self._call("opensearch.write", super().index, index, body, id)
+
+    def update(self, index, id, body):
+        return self._call("opensearch.write", super().update, index, id, body)
+
+    def delete(self, index, id):
+        return self._call("opensearch.write", super().delete, index, id)
+
+    def bulk(self, body):
+        return self._call("opensearch.write", super().bulk, body)
+
+
+def synthetic_statement(rng):
+    tail = rng.choice([
+        "since yesterday",
+        "since last week",
+        f"after taking {rng.choice(MEDICATIONS)}",
+        f"because of my {rng.choice(CONDITIONS)}"
+    ])
+    severity = rng.choice(["mild", "severe", "constant", "occasional"])
+    return f"i have {severity} {rng.choice(SYMPTOMS)} in my {rng.choice(BODY_PARTS)} {tail}"
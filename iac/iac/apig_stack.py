@@ -5,8 +5,12 @@ from aws_cdk import(
     Duration,
     Stack,
     aws_apigateway as apigateway,
+    aws_dynamodb as dynamodb,
     aws_iam as iam,
-    aws_lambda as lambda_
+    aws_lambda as lambda_,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_sqs as sqs,
+    triggers
 )
 
 class ApigStack(Stack):
@@ -15,8 +19,22 @@ class ApigStack(Stack):
 
         LOCALHOST_ORIGIN="http://localhost:3000"
         ALLOW_LOCALHOST_ORIGIN=ALO
+        # optional S3 bucket for the persistent tier of the embedding/entity caches
+        CACHE_BUCKET=self.node.try_get_context('cache_bucket') or ""
+        # optional S3 bucket for search_all NDJSON exports larger than an API Gateway response
+        EXPORT_BUCKET=self.node.try_get_context('export_bucket') or ""
+        # queue POST /aoss/ingest for an SQS-triggered worker instead of ingesting in the request
+        ASYNC_INGEST=str(self.node.try_get_context('async_ingest') or "").lower() in ("1","true")
+        INGEST_MAX_ATTEMPTS=3
 
         layer_aoss = lambda_.LayerVersion.from_layer_version_arn(self,id="layer_aoss",layer_version_arn=self.node.try_get_context("layer_arn"))
+        # shared helpers (pooled AOSS client, ...) imported by every aoss function
+        layer_aoss_common = lambda_.LayerVersion(
+            self, "layer_aoss_common",
+            code=lambda_.Code.from_asset(os.path.join("iac/lambda/custom_packages","aoss_common")),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_10],
+            description="Shared helpers for the AOSS functions"
+        )
         
         core_api = apigateway.RestApi(
             self,"core-api",
@@ -88,10 +106,11 @@ class ApigStack(Stack):
                 "AOSS_ENDPOINT": AOSS_ENDPOINT.value,
                 "EMBEDDINGS_API": self.node.try_get_context('embeddings_api'),
                 "EMBEDDINGS_API_KEY": self.node.try_get_context('embeddings_api_key'),
+                "CACHE_BUCKET": CACHE_BUCKET,
                 "LOCALHOST_ORIGIN":LOCALHOST_ORIGIN if ALLOW_LOCALHOST_ORIGIN else ""
             },
             timeout=Duration.minutes(3),
-            layers=[ layer_aoss ]
+            layers=[ layer_aoss, layer_aoss_common ]
         )
         #
         # !! IMPORTANT !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
@@ -107,6 +126,132 @@ class ApigStack(Stack):
             api_key_required=True
         )
 
+        #################################################################################
+        # /aoss/ingest/batch
+        #################################################################################
+        fn_aoss_ingest_batch_post = lambda_.Function(
+            self,"fn_aoss_ingest_batch_post",
+            description="aoss-ingest-batch-post", #microservice tag
+            runtime=lambda_.Runtime.PYTHON_3_10,
+            handler="index.handler",
+            role=AOSS_ROLE,
+            code=lambda_.Code.from_asset(os.path.join("iac/lambda/aoss","ingest_batch_post")),
+            environment={
+                "AOSS_ENDPOINT": AOSS_ENDPOINT.value,
+                "EMBEDDINGS_API": self.node.try_get_context('embeddings_api'),
+                "EMBEDDINGS_API_KEY": self.node.try_get_context('embeddings_api_key'),
+                "CACHE_BUCKET": CACHE_BUCKET,
+                "LOCALHOST_ORIGIN":LOCALHOST_ORIGIN if ALLOW_LOCALHOST_ORIGIN else ""
+            },
+            timeout=Duration.minutes(3),
+            memory_size=512,
+            layers=[ layer_aoss, layer_aoss_common ]
+        )
+        # POST /ingest/batch
+        pr_aoss_ingest_batch=pr_aoss_ingest.add_resource("batch")
+        intg_ingest_batch_post=apigateway.LambdaIntegration(fn_aoss_ingest_batch_post)
+        method_ingest_batch=pr_aoss_ingest_batch.add_method(
+            "POST",intg_ingest_batch_post,
+            api_key_required=True
+        )
+
+        #################################################################################
+        # Ingest single-flight claims (see aoss_common/singleflight.py)
+        #################################################################################
+        # concurrent ingests of the same statement claim it here first; only the holder runs
+        # the pipeline and writes, the others wait for its outcome
+        claims_table = dynamodb.Table(
+            self,"ingest-claims",
+            partition_key=dynamodb.Attribute(name="claim_key",type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at"
+        )
+        for fn in [fn_aoss_ingest_post, fn_aoss_ingest_batch_post]:
+            fn.add_environment("INGEST_SINGLE_FLIGHT","dynamodb")
+            fn.add_environment("CLAIMS_TABLE",claims_table.table_name)
+        claims_table.grant_read_write_data(AOSS_ROLE)
+
+        #################################################################################
+        # /aoss/ingest async mode: queue + worker + /aoss/ingest/jobs/{job_id}
+        #################################################################################
+        if ASYNC_INGEST:
+            INGEST_WORKER_TIMEOUT=Duration.minutes(3)
+            ingest_dlq = sqs.Queue(
+                self,"ingest-dlq",
+                retention_period=Duration.days(14)
+            )
+            ingest_queue = sqs.Queue(
+                self,"ingest-queue",
+                # at least the worker timeout, or in-flight batches get redelivered
+                visibility_timeout=Duration.minutes(6),
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    max_receive_count=INGEST_MAX_ATTEMPTS,
+                    queue=ingest_dlq
+                )
+            )
+            jobs_table = dynamodb.Table(
+                self,"ingest-jobs",
+                partition_key=dynamodb.Attribute(name="job_id",type=dynamodb.AttributeType.STRING),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute="expires_at"
+            )
+            fn_aoss_ingest_post.add_environment("INGEST_MODE","async")
+            fn_aoss_ingest_post.add_environment("INGEST_QUEUE_URL",ingest_queue.queue_url)
+            fn_aoss_ingest_post.add_environment("JOBS_TABLE",jobs_table.table_name)
+
+            fn_aoss_ingest_worker = lambda_.Function(
+                self,"fn_aoss_ingest_worker",
+                description="aoss-ingest-worker", #microservice tag
+                runtime=lambda_.Runtime.PYTHON_3_10,
+                handler="index.handler",
+                role=AOSS_ROLE,
+                code=lambda_.Code.from_asset(os.path.join("iac/lambda/aoss","ingest_worker")),
+                environment={
+                    "AOSS_ENDPOINT": AOSS_ENDPOINT.value,
+                    "EMBEDDINGS_API": self.node.try_get_context('embeddings_api'),
+                    "EMBEDDINGS_API_KEY": self.node.try_get_context('embeddings_api_key'),
+                    "CACHE_BUCKET": CACHE_BUCKET,
+                    "JOBS_TABLE": jobs_table.table_name,
+                    "INGEST_MAX_ATTEMPTS": str(INGEST_MAX_ATTEMPTS),
+                    "INGEST_SINGLE_FLIGHT": "dynamodb",
+                    "CLAIMS_TABLE": claims_table.table_name
+                },
+                timeout=INGEST_WORKER_TIMEOUT,
+                memory_size=512,
+                layers=[ layer_aoss, layer_aoss_common ]
+            )
+            fn_aoss_ingest_worker.add_event_source(lambda_event_sources.SqsEventSource(
+                ingest_queue,
+                batch_size=25,
+                max_batching_window=Duration.seconds(2),
+                report_batch_item_failures=True
+            ))
+
+            fn_aoss_ingest_job_get = lambda_.Function(
+                self,"fn_aoss_ingest_job_get",
+                description="aoss-ingest-job-get", #microservice tag
+                runtime=lambda_.Runtime.PYTHON_3_10,
+                handler="index.handler",
+                role=AOSS_ROLE,
+                code=lambda_.Code.from_asset(os.path.join("iac/lambda/aoss","ingest_job_get")),
+                environment={
+                    "JOBS_TABLE": jobs_table.table_name,
+                    "LOCALHOST_ORIGIN":LOCALHOST_ORIGIN if ALLOW_LOCALHOST_ORIGIN else ""
+                },
+                timeout=Duration.seconds(10),
+                layers=[ layer_aoss, layer_aoss_common ]
+            )
+            # GET /ingest/jobs/{job_id}
+            pr_aoss_ingest_job=pr_aoss_ingest.add_resource("jobs").add_resource("{job_id}")
+            intg_ingest_job_get=apigateway.LambdaIntegration(fn_aoss_ingest_job_get)
+            method_ingest_job=pr_aoss_ingest_job.add_method(
+                "GET",intg_ingest_job_get,
+                api_key_required=True
+            )
+
+            ingest_queue.grant_send_messages(AOSS_ROLE)
+            jobs_table.grant_read_write_data(AOSS_ROLE)
+
         #################################################################################
         # /aoss/search_post
         #################################################################################
@@ -123,10 +268,11 @@ class ApigStack(Stack):
                 "AOSS_ENDPOINT": AOSS_ENDPOINT.value,
                 "EMBEDDINGS_API": self.node.try_get_context('embeddings_api'),
                 "EMBEDDINGS_API_KEY": self.node.try_get_context('embeddings_api_key'),
+                "CACHE_BUCKET": CACHE_BUCKET,
                 "LOCALHOST_ORIGIN":LOCALHOST_ORIGIN if ALLOW_LOCALHOST_ORIGIN else ""
             },
             timeout=Duration.minutes(3),
-            layers=[ layer_aoss ]
+            layers=[ layer_aoss, layer_aoss_common ]
         )
         #        
         ###### Route Base = /aoss
@@ -154,10 +300,11 @@ class ApigStack(Stack):
                 "AOSS_ENDPOINT": AOSS_ENDPOINT.value,
                 "EMBEDDINGS_API": self.node.try_get_context('embeddings_api'),
                 "EMBEDDINGS_API_KEY": self.node.try_get_context('embeddings_api_key'),
+                "EXPORT_BUCKET": EXPORT_BUCKET,
                 "LOCALHOST_ORIGIN":LOCALHOST_ORIGIN if ALLOW_LOCALHOST_ORIGIN else ""
             },
             timeout=Duration.minutes(3),
-            layers=[ layer_aoss ]
+            layers=[ layer_aoss, layer_aoss_common ]
         )
         #        
         ###### Route Base = /aoss
@@ -189,7 +336,7 @@ class ApigStack(Stack):
                 "LOCALHOST_ORIGIN":LOCALHOST_ORIGIN if ALLOW_LOCALHOST_ORIGIN else ""
             },
             timeout=Duration.minutes(3),
-            layers=[ layer_aoss ]
+            layers=[ layer_aoss, layer_aoss_common ]
         )
         #        
         # ###### Route Base = /aoss
@@ -201,6 +348,22 @@ class ApigStack(Stack):
         #     api_key_required=True
         # )
 
+        #################################################################################
+        # Search response cache generation (see aoss_common/searchcache.py)
+        #################################################################################
+        # ingest and delete bump the index generation, which retires cached search responses
+        generation_table = dynamodb.Table(
+            self,"index-generation",
+            partition_key=dynamodb.Attribute(name="index_name",type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
+        )
+        generation_fns = [fn_aoss_ingest_post, fn_aoss_ingest_batch_post, fn_aoss_search_post, fn_aoss_delete_post]
+        if ASYNC_INGEST:
+            generation_fns.append(fn_aoss_ingest_worker)
+        for fn in generation_fns:
+            fn.add_environment("GENERATION_TABLE",generation_table.table_name)
+        generation_table.grant_read_write_data(AOSS_ROLE)
+
         #################################################################################
         # Custom lambda execution role permissions
         #################################################################################
@@ -218,13 +381,14 @@ class ApigStack(Stack):
             )             
             ]
         ))
-        AOSS_ROLE.attach_inline_policy(iam.Policy(self, "lambda-basic-aoss",
+        aoss_policy = iam.Policy(self, "lambda-basic-aoss",
             statements=[iam.PolicyStatement(
                 actions=["aoss:BatchGetCollection","aoss:APIAccessAll","aoss:DashboardsAccessAll"],
                 resources=["*"]
             )             
             ]
-        ))
+        )
+        AOSS_ROLE.attach_inline_policy(aoss_policy)
         AOSS_ROLE.attach_inline_policy(iam.Policy(self, "lambda-comprehend-medical",
             statements=[iam.PolicyStatement(
                 actions=["comprehendmedical:*"],
@@ -232,6 +396,44 @@ class ApigStack(Stack):
             )             
             ]
         ))
+        if CACHE_BUCKET:
+            AOSS_ROLE.attach_inline_policy(iam.Policy(self, "lambda-cache-bucket",
+                statements=[iam.PolicyStatement(
+                    actions=["s3:GetObject","s3:PutObject"],
+                    resources=[f"arn:aws:s3:::{CACHE_BUCKET}/*"]
+                )
+                ]
+            ))
+        if EXPORT_BUCKET:
+            AOSS_ROLE.attach_inline_policy(iam.Policy(self, "lambda-export-bucket",
+                statements=[iam.PolicyStatement(
+                    actions=["s3:GetObject","s3:PutObject"],
+                    resources=[f"arn:aws:s3:::{EXPORT_BUCKET}/exports/*"]
+                )
+                ]
+            ))
+
+        #################################################################################
+        # AOSS index bootstrap
+        #################################################################################
+        # Creates the index + mappings once per deploy (no-op when it already exists) so the
+        # request handlers never create or wait for it. Invoke it by hand to re-provision.
+        fn_aoss_bootstrap = triggers.TriggerFunction(
+            self,"fn_aoss_bootstrap",
+            description="aoss-bootstrap", #microservice tag
+            runtime=lambda_.Runtime.PYTHON_3_10,
+            handler="index.handler",
+            role=AOSS_ROLE,
+            code=lambda_.Code.from_asset(os.path.join("iac/lambda/aoss","bootstrap")),
+            environment={
+                "AOSS_ENDPOINT": AOSS_ENDPOINT.value
+            },
+            # 15 minutes so a vector profile migration (see migrate.py) fits in one invocation
+            timeout=Duration.minutes(15),
+            layers=[ layer_aoss, layer_aoss_common ],
+            execute_on_handler_change=True
+        )
+        fn_aoss_bootstrap.execute_after(aoss_policy)
 
         #################################################################################
         # Usage plan and api key to "lock" API
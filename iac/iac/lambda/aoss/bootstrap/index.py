@@ -0,0 +1,41 @@
+import json
+
+from aoss_common import log
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.exact import HASH_PROPERTIES
+from aoss_common.indices import ensure_index, ensure_fields
+from aoss_common.migrate import migrate_index
+from aoss_common.similar import SIMILAR_INDEX_NAME, SIMILAR_MAPPING
+from aoss_common.vectors import VECTOR_PROFILE
+
+#################################
+# Provisions the AOSS indices (statements + similar-statement links) so the request handlers never have to.
+# Runs automatically after `cdk deploy cdk-apig-stack` and can be re-run by hand:
+#   aws lambda invoke --function-name <fn-aoss-bootstrap> out.json
+# Migrating to another vector profile (see vectors.py):
+#   aws lambda invoke --function-name <fn-aoss-bootstrap> \
+#     --payload '{"action": "migrate", "target": "statements-fp16", "profile": "fp16"}' out.json
+#################################
+
+def handler(event,context):
+    log.begin_request("bootstrap", event, context)
+    event = event or {}
+
+    if event.get("action") == "migrate":
+        result = migrate_index(
+            target=event["target"],
+            profile=event.get("profile", VECTOR_PROFILE),
+            source=event.get("source", AOSS_INDEX_NAME)
+        )
+    else:
+        result = {
+            AOSS_INDEX_NAME: ensure_index(),
+            SIMILAR_INDEX_NAME: ensure_index(SIMILAR_INDEX_NAME, SIMILAR_MAPPING)
+        }
+        # indexes created before statement-hash existed need the keyword field added
+        ensure_fields(AOSS_INDEX_NAME, HASH_PROPERTIES)
+    log.info("Bootstrap finished", result=result)
+    return {
+        "statusCode":200,
+        "body": json.dumps(result)
+    }
@@ -1,11 +1,14 @@
-import boto3
 import json
-import requests
-from requests_aws4auth import AWS4Auth
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from aoss_common import log
+from aoss_common.backend import get_backend
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.consistency import expect_deleted, wait_for_writes
+from aoss_common.indices import index_check, index_missing, invalidate_index
+from aoss_common.metrics import instrumented, stage
+from aoss_common.searchcache import bump_generation
+from aoss_common.similar import get_similar_store
+from aoss_common.warmup import warmup
 import os
-import time
-import string
 
 CORS_HEADERS = {
     'Access-Control-Allow-Headers': 'Content-Type',
@@ -23,43 +26,14 @@ EMBEDDINGS_API_KEY = os.environ["EMBEDDINGS_API_KEY"]
 # https://opensearch-project.github.io/opensearch-py/api-ref/clients/indices_client.html
 #################################
 
-aoss_client = boto3.client('opensearchserverless')
-
-region = boto3.Session().region_name
-service = 'aoss'
-credentials = boto3.Session().get_credentials()
-awsauth = AWS4Auth(credentials.access_key, credentials.secret_key, region, service, session_token=credentials.token)
-host=AOSS_ENDPOINT.replace("https://", "")
-aoss_index_name='statements'
+aoss_index_name=AOSS_INDEX_NAME
 headers = { "Content-Type": "application/json" }
 
-def index_check():
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-
-    response = client.indices.exists(aoss_index_name)
-    print('\Checking index:')
-    print(response)
-    return response
+warmup("aoss", "dynamodb")
 
 
 def delete_document(doc_id=None):
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
+    client = get_backend()
 
     response = client.delete(
             index = aoss_index_name,
@@ -69,31 +43,45 @@ def delete_document(doc_id=None):
     return response
 
 
+@instrumented("delete")
 def handler(event,context):
-    print("<Ingest:Hello>")
     field_values=json.loads(event["body"])
 
-    print(event["body"])
+    log.debug("Delete request", body=event["body"])
     
     try:
         # id of document to delete
         doc=field_values["id"]
 
-        index_exists = index_check()
-        print(type(index_exists))
+        with stage("IndexCheck"):
+            index_exists = index_check()
 
         if( index_exists==False ):
-            print("Index does not exist")
+            log.warning("Index does not exist")
             return []
 
-        response=delete_document(doc)
-        print(response)
+        # links first: if some fail, the document is still there to delete again
+        with stage("Unlink"):
+            unlinked, unlink_failed = get_similar_store().remove([doc])
+        if unlink_failed:
+            raise ValueError(f"{unlink_failed} similar statement links of '{doc}' were not deleted")
+        with stage("Delete"):
+            response=delete_document(doc)
+        log.info("Deleted", id=doc, result=response.get("result"), links=unlinked)
+        # cached search responses may still show the document; bump once searches stop
+        # returning it, or a search in between would cache it again under the new generation
+        with stage("Wait"):
+            visible = wait_for_writes([expect_deleted(doc)])
+        bump_generation(visible=visible)
         return {
             "statusCode":200,
             "headers": CORS_HEADERS,
             "body": "Successfully deleted"
         }
     except Exception as e:
+        log.error("Request failed", error=repr(e))
+        if index_missing(e):
+            invalidate_index()
         return {
             "statusCode":500,
             "headers": CORS_HEADERS,
@@ -0,0 +1,65 @@
+import json
+import os
+from aoss_common import log
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.consistency import wait_for_writes
+from aoss_common.indices import index_check, index_missing, invalidate_index
+from aoss_common.ingest import ingest_batch
+from aoss_common.metrics import instrumented, stage
+from aoss_common.searchcache import bump_generation
+from aoss_common.warmup import warmup
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Origin': os.environ["CORS_ALLOW_UI"] if os.environ["LOCALHOST_ORIGIN"] == "" else os.environ["LOCALHOST_ORIGIN"],
+    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+}
+
+warmup("aoss", "comprehendmedical", "dynamodb")
+
+#################################
+# POST /api/aoss/ingest/batch
+# body: {"statements": [{"statement": ..., "intent": ..., "severity": ..., "source": ...}, ...]}
+# Returns one result per statement, in order: created | mapped | exact | duplicate | error
+#################################
+
+@instrumented("ingest_batch")
+def handler(event,context):
+    field_values=json.loads(event["body"])
+
+    try:
+        with stage("IndexCheck"):
+            index_exists = index_check()
+        if( index_exists==False ):
+            # the index is provisioned by the bootstrap function at deploy time
+            raise ValueError(f"AOSS index '{AOSS_INDEX_NAME}' does not exist. Run the bootstrap function.")
+
+        with stage("Batch"):
+            results, writes = ingest_batch(field_values["statements"])
+        summary = {}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+        log.info("Batch ingested", summary=summary)
+
+        # Wait (bounded) until the writes are searchable so the next API call sees them
+        with stage("Wait"):
+            visible = wait_for_writes(writes)
+        # cached search responses predate these writes
+        if writes:
+            bump_generation(visible=visible)
+        with stage("Serialize"):
+            body = json.dumps({"results":results, "summary":summary})
+        return {
+            "statusCode":200,
+            "headers": CORS_HEADERS,
+            "body": body
+        }
+    except Exception as e:
+        log.error("Request failed", error=repr(e))
+        if index_missing(e):
+            invalidate_index()
+        return {
+            "statusCode":500,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"msg":str(e)})
+        }
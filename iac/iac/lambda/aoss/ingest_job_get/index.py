@@ -0,0 +1,48 @@
+import json
+import os
+from aoss_common import log
+from aoss_common.jobstore import get_job
+from aoss_common.metrics import instrumented, stage
+from aoss_common.warmup import warmup
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Origin': os.environ["CORS_ALLOW_UI"] if os.environ["LOCALHOST_ORIGIN"] == "" else os.environ["LOCALHOST_ORIGIN"],
+    'Access-Control-Allow-Methods': 'OPTIONS,POST,GET'
+}
+
+#################################
+# GET /api/aoss/ingest/jobs/{job_id}
+# Status of a queued ingest (INGEST_MODE=async, see jobs.py). Only needs JOBS_TABLE:
+# jobstore.py has no AOSS or embeddings imports.
+#   {"job_id", "status": queued | retrying | done | failed, "outcome": created | mapped | exact | duplicate, ...}
+#################################
+
+warmup("dynamodb")
+
+
+@instrumented("ingest_job")
+def handler(event,context):
+    job_id = (event.get("pathParameters") or {}).get("job_id")
+
+    try:
+        with stage("Lookup"):
+            job = get_job(job_id) if job_id else None
+        if job is None:
+            return {
+                "statusCode":404,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"msg":f"Unknown job '{job_id}'"})
+            }
+        return {
+            "statusCode":200,
+            "headers": CORS_HEADERS,
+            "body": json.dumps(job)
+        }
+    except Exception as e:
+        log.error("Request failed", error=repr(e))
+        return {
+            "statusCode":500,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"msg":str(e)})
+        }
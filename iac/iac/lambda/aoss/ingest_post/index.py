@@ -1,11 +1,20 @@
-import boto3
 import json
-import requests
-from requests_aws4auth import AWS4Auth
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from aoss_common import log
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.concurrency import run_concurrently, STAGE_TIMEOUTS
+from aoss_common.embeddings import generate_embeddings, embedding_cache_stats
+from aoss_common.entities import generate_statement_metadata, entities_cache_stats
+from aoss_common.indices import index_check, index_missing, invalidate_index
+from aoss_common.consistency import expect_document, wait_for_writes
+from aoss_common.exact import find_exact, statement_hash
+from aoss_common.metrics import instrumented, stage, timed
+from aoss_common.nearcache import near_cache_stats
+from aoss_common.jobs import enqueue_ingest, INGEST_MODE
+from aoss_common.searchcache import bump_generation
+from aoss_common.singleflight import single_flight
+from aoss_common.ingest import strip_punctuation, generate_statement_background, statement_document, create_filters, search_aoss, ingest_document, map_statement
+from aoss_common.warmup import warmup
 import os
-import time
-import string
 
 CORS_HEADERS = {
     'Access-Control-Allow-Headers': 'Content-Type',
@@ -25,303 +34,19 @@ EMBEDDINGS_API_KEY = os.environ["EMBEDDINGS_API_KEY"]
 # https://opensearch-project.github.io/opensearch-py/api-ref/clients/indices_client.html
 #################################
 
-aoss_client = boto3.client('opensearchserverless')
-comprehend_client = boto3.client('comprehendmedical')
-
-region = boto3.Session().region_name
-service = 'aoss'
-credentials = boto3.Session().get_credentials()
-awsauth = AWS4Auth(credentials.access_key, credentials.secret_key, region, service, session_token=credentials.token)
-host=AOSS_ENDPOINT.replace("https://", "")
-aoss_index_name='statements'
+aoss_index_name=AOSS_INDEX_NAME
 headers = { "Content-Type": "application/json" }
 
-
-
-def generate_statement_metadata(statement):
-    THRESHOLD = .75
-    meta = {}
-    topics = set()
-    result = comprehend_client.detect_entities_v2(Text=statement)
-    print("Comprehend Medical Result")
-    print( result )
-    
-    for entity in result['Entities']:
-        if entity["Score"] > THRESHOLD:
-            # topics.append(entity["Category"].replace('_', ' ').lower())
-            topics.add(entity["Category"].replace('_', ' ').lower())
-            entity["Category"] = entity["Category"].lower()
-            metanew = ''.join(e for e in entity["Category"] if e.isalnum())
-            if metanew not in meta.keys():
-                meta[metanew] = []
-            meta[metanew].append(entity["Text"].lower())
-
-
-    return meta, list(topics)
-
-def generate_statement_background(statement, intent, severity, source, topics):
-    back = {
-        "intent": intent,
-        "severity": severity,
-        "source": source,
-        "topic": topics
-    } 
-
-    return back
-
-
-def index_check():
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-
-    response = client.indices.exists(aoss_index_name)
-    print('\Checking index:')
-    print(response)
-    return response
-
-def index_create():
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-
-    response = client.indices.create(
-        aoss_index_name,
-        body={
-            "settings": {
-                "index.knn": True
-            },
-            "mappings": {
-                "properties": {
-                    "statement-vector": {
-                        "type": "knn_vector",
-                        "dimension": 1536,
-                        "method": {
-                            "name": "hnsw",
-                            "space_type": "cosinesimil",
-                            "engine": "nmslib",
-                            "parameters": {
-                                "ef_construction": 512,
-                                "m": 32
-                            }
-                        }
-                    },
-                    "statement": {
-                        "type": "text"
-                    },
-                    "statement-similar": {
-                        "type": "object"
-                    }
-                }
-            }
-        })
-    
-    print('\nCreating index:')
-    print(response)
-
-def generate_embeddings(statement):
-    headers = {
-        'x-api-key': EMBEDDINGS_API_KEY,
-        'Content-Type': 'application/json',
-    }
-    json_data = {
-        'inputText': statement,
-    }
-
-    response = requests.post(
-        EMBEDDINGS_API,
-        headers=headers,
-        json=json_data,
-    )
-    print(response)
-
-    vector_embedding = None
-    if response.status_code == 200:
-        vector_embedding = response.json()
-    else:
-        print(response.text)
-
-    return vector_embedding
-
-
-def create_filters(metadata):
-    filter_list = []
-    for key,values in metadata.items():
-        for filter_item in values:
-            query = {
-                "query_string": {
-                    "query": filter_item,
-                    "fields": [
-                        "metadata." + key
-                    ]
-                }
-            }
-            filter_list.append(query)
-    return filter_list
-
-def search_aoss(embeddings,filter_list):
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-
-    query = {
-        'size': 20,
-        'query': {
-            'knn': {
-                "statement-vector": {
-                    "vector": embeddings,
-                    "k": 5
-                }
-            }
-        },
-        "post_filter": {
-            "bool": {
-                "should": filter_list
-            }
-        },
-        "fields": ["statement"]
-    }    
-
-    response = client.search(
-        body = query,
-        index = aoss_index_name
-    )
-    return(response)
-
-
-def ingest_document(document,doc_id=None):
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-    response = None
-    if( doc_id is None ):
-        response = client.index(
-            index = aoss_index_name,
-            body = document
-        )
-    else:
-         print("~~~~~~~~UPDATE~~~~~~~")
-         
-         response = client.update(
-            index = aoss_index_name,
-            body = document,
-            id=doc_id
-        )
-                
-    return response
-
-
-def strip_knn_vector(data):
-    try:
-        rebuild = []
-        for entry in data['hits']['hits']:
-            entry["_source"]["statement-vector"]=[-1]
-            rebuild.append(entry)
-        data['hits']['hits'] = rebuild
-        return data
-    except:
-        return data
-
-def strip_punctuation(sentence):
-    # Create a translation table to remove punctuation
-    translator = str.maketrans('', '', string.punctuation)
-
-    # Use translate to remove punctuation from the sentence
-    stripped_sentence = sentence.translate(translator)
-
-    return stripped_sentence
-
-
-def map_statement(statement_document,statement_metadata,statement_backdata,matches):
-    THRESHOLD = 0.8
-    mapped_counter = 0
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-    # remember breaker for match on 1
-    for result in matches:
-        if (THRESHOLD <= result['_score'] < 1 ):
-            print("Result match, updating similar statement payload")
-            doc_id=result["_id"]
-
-            statement=statement_document["statement"]
-            doc_data=result["_source"]
-
-            statement_similar_json=doc_data["statement-similar"]
-            statement_similar_json[ statement ] = {"metadata":statement_metadata, "background": statement_backdata}
-            print("~~~SIMILAR-STATEMENT~~~~")
-            print(statement_similar_json)
-            
-            update_data = {
-                "doc": {
-                    "statement-similar":statement_similar_json
-                }
-            }
-
-            mapped_counter += 1
-            
-            response = ingest_document(update_data,doc_id=doc_id)
-
-            print(response)
-        elif( result['_score'] == 1 ):
-            # doc_id=result["_id"]
-            mapped_counter+=1
-            print("EXACT MATCH, BYPASS ACTION")
-            # update_data = {
-            #     "doc": {
-            #         "background":statement_backdata
-            #     }
-            # }
-            # response = ingest_document(update_data,doc_id=doc_id)
-
-            # print(response)
-    
-    # no matches met threshold, create a new one
-    if( mapped_counter == 0 ):
-        print("No threshold matches, creating a new document")
-        response = ingest_document(statement_document)
-
-
-
+warmup(*(("sqs", "dynamodb") if INGEST_MODE == "async" else ("aoss", "comprehendmedical", "dynamodb")))
 
 
 
+@instrumented("ingest")
 def handler(event,context):
-    print("<Ingest:Hello>")
     field_values=json.loads(event["body"])
     # field_values = event
     # print(field_values)
-    print(event["body"])
+    log.debug("Ingest request", body=event["body"])
     
     try:
         statement=strip_punctuation(field_values["statement"].lower())
@@ -332,61 +57,94 @@ def handler(event,context):
         # print(event["statement"])
         # print(statement)
 
-        index_exists = index_check()
-        print(type(index_exists))
-
-        if( index_exists==False ):
-            print("Index does not exist")
-            index_create()
-
-            wait_checks=0
-            wait_breaker=5
-            # Poll and wait for the index to be created
-            while not index_check():
-                print(f"Index  is not yet created. Waiting...")
-                time.sleep(5)  # Sleep for 5 seconds before checking again
-                wait_checks+=1
-                if wait_checks >= wait_breaker:
-                    raise ValueError("AOSS Index Creation error. Waited to long. Breaking loop.")
-        
-        metadata, topics=generate_statement_metadata(statement)
-        print(metadata)
-        backdata=generate_statement_background(statement, intent, severity, source, topics)
-        print(backdata)
-        embeddings=generate_embeddings(statement)
-        # print(embeddings)
-        filter_list = create_filters(metadata)
-        print(filter_list)
+        # async mode: queue it for the ingest worker (jobs.py) and answer straight away
+        if INGEST_MODE == "async":
+            with stage("Enqueue"):
+                job_id, = enqueue_ingest([{key: field_values[key] for key in ("statement", "intent", "severity", "source")}])
+            log.info("Ingest queued", job_id=job_id)
+            return {
+                "statusCode":202,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"job_id":job_id, "status":"queued"})
+            }
 
-        search_results = search_aoss(embeddings=embeddings,filter_list=filter_list)
+        with stage("IndexCheck"):
+            index_exists = index_check()
 
-        document = {
-            'statement': statement,
-            'statement-vector': embeddings,
-            'statement-similar': {},
-            'metadata': metadata,
-            'background': backdata
-        }
+        if( index_exists==False ):
+            # the index is provisioned by the bootstrap function at deploy time
+            raise ValueError(f"AOSS index '{aoss_index_name}' does not exist. Run the bootstrap function.")
+
+        # exact repeat of an ingested statement: nothing to extract, embed, search or write
+        key = statement_hash(statement)
+        with stage("ExactLookup"):
+            existing = find_exact([key])
+        if existing:
+            log.info("Exact match, bypassing", ids=list(existing.values()))
+            return {
+                "statusCode":200,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"Hello world":AOSS_ENDPOINT})
+            }
 
-        # Ingest or map to results
-        if (search_results['hits']['max_score'] == None):
-            print("No results found; ingesting...")
-            response=ingest_document(document)
-            print(response)
-        else:
-            print(strip_knn_vector(search_results))
-            print("Results found; mapping...")
-            response=map_statement(statement_document=document,statement_metadata=metadata,statement_backdata=backdata,matches=search_results['hits']['hits'])
-            
-        
-        print("Explicit wait so indices can refresh ;)....  15 seconds")
-        time.sleep(15)  # Sleep for 15 seconds to "ensure" that results are refreshed on index and available for next API call
+        def ingest_statement():
+            # entity extraction and embedding are independent; run them side by side
+            with stage("Enrich"):
+                stages = run_concurrently({
+                    "metadata": lambda: timed("Entities", generate_statement_metadata, statement),
+                    "embeddings": lambda: timed("Embeddings", generate_embeddings, statement)
+                }, timeouts=STAGE_TIMEOUTS)
+            metadata, topics=stages["metadata"]
+            embeddings=stages["embeddings"]
+            backdata=generate_statement_background(statement, intent, severity, source, topics)
+            filter_list = create_filters(metadata)
+            log.debug("Statement enriched", metadata=metadata, background=backdata, filters=filter_list)
+
+            with stage("Search"):
+                search_results = search_aoss(embeddings=embeddings,filter_list=filter_list)
+            log.debug("Cache stats", entities=entities_cache_stats, embeddings=embedding_cache_stats, near=near_cache_stats)
+
+            document = statement_document(statement, embeddings, metadata, backdata)
+
+            # Ingest or map to results
+            if (search_results['hits']['max_score'] == None):
+                log.info("No results found, ingesting")
+                with stage("Ingest"):
+                    response=ingest_document(document)
+                log.debug("Ingested", response=response)
+                status, writes="created", [expect_document(response.get("_id"))]
+            else:
+                log.info("Results found, mapping", hits=len(search_results['hits']['hits']))
+                log.debug("Search results", hits=lambda: search_results['hits']['hits'])
+                with stage("Map"):
+                    status, writes=map_statement(statement_document=document,statement_metadata=metadata,statement_backdata=backdata,matches=search_results['hits']['hits'])
+            # ids only, so requests coalesced onto this one can wait for the same writes
+            outcome = {"status": status, "writes": [[doc_id, index_name] for doc_id, _, index_name in writes if doc_id is not None]}
+            if status == "created":
+                outcome["id"] = writes[0][0]
+            return outcome
+
+        # concurrent requests for the same statement share one pipeline run (singleflight.py)
+        result, shared = single_flight(key, ingest_statement)
+        if shared:
+            log.info("Coalesced with a concurrent ingest", status=result["status"], writes=len(result["writes"]))
+        writes = [expect_document(doc_id, index_name=index_name) for doc_id, index_name in result["writes"]]
+
+        # Wait (bounded) until the writes are searchable so the next API call sees them
+        with stage("Wait"):
+            visible = wait_for_writes(writes)
+        # cached search responses predate these writes
+        if writes:
+            bump_generation(visible=visible)
         return {
             "statusCode":200,
             "headers": CORS_HEADERS,
             "body": json.dumps({"Hello world":AOSS_ENDPOINT})
         }
     except Exception as e:
+        log.error("Request failed", error=repr(e))
+        if index_missing(e):
+            invalidate_index()
         return {
             "statusCode":500,
             "headers": CORS_HEADERS,
@@ -0,0 +1,39 @@
+from aoss_common import log
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.indices import index_check, index_missing, invalidate_index
+from aoss_common.jobs import process_messages, sqs_messages
+from aoss_common.metrics import instrumented, stage
+from aoss_common.warmup import warmup
+
+#################################
+# Ingest worker, triggered by the ingest queue (INGEST_MODE=async, see jobs.py)
+# Each invocation gets a micro-batch of queued statements and ingests them together.
+# Statements to retry are reported as batchItemFailures, so only those are redelivered;
+# an exception fails the whole batch and the queue redelivers all of it.
+#################################
+
+warmup("aoss", "comprehendmedical", "dynamodb")
+
+
+@instrumented("ingest_worker")
+def handler(event,context):
+    messages = sqs_messages(event)
+    log.info("Ingest batch received", messages=len(messages))
+
+    try:
+        with stage("IndexCheck"):
+            index_exists = index_check()
+        if( index_exists==False ):
+            # the index is provisioned by the bootstrap function at deploy time
+            raise ValueError(f"AOSS index '{AOSS_INDEX_NAME}' does not exist. Run the bootstrap function.")
+
+        retry = process_messages(messages)
+    except Exception as e:
+        log.error("Ingest batch failed", error=repr(e))
+        if index_missing(e):
+            invalidate_index()
+        raise
+
+    return {
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in retry]
+    }
@@ -1,11 +1,14 @@
-import boto3
 import json
-import requests
-from requests_aws4auth import AWS4Auth
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from aoss_common import log
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.indices import index_missing, invalidate_index
+from aoss_common.metrics import instrumented, stage
+from aoss_common.paging import page_documents, export_ndjson, PAGE_SIZE
+from aoss_common.session import aws_client
+from aoss_common.warmup import warmup
 import os
+import tempfile
 import time
-import string
 
 CORS_HEADERS = {
     'Access-Control-Allow-Headers': 'Content-Type',
@@ -15,6 +18,9 @@ CORS_HEADERS = {
 AOSS_ENDPOINT = os.environ["AOSS_ENDPOINT"]
 EMBEDDINGS_API = os.environ["EMBEDDINGS_API"]
 EMBEDDINGS_API_KEY = os.environ["EMBEDDINGS_API_KEY"]
+EXPORT_BUCKET = os.environ.get("EXPORT_BUCKET", "")
+# API Gateway caps Lambda proxy responses at ~6 MB; larger exports need EXPORT_BUCKET
+EXPORT_INLINE_MAX_BYTES = 5 * 1024 * 1024
 
 
 
@@ -25,70 +31,97 @@ EMBEDDINGS_API_KEY = os.environ["EMBEDDINGS_API_KEY"]
 # https://opensearch-project.github.io/opensearch-py/api-ref/clients/indices_client.html
 #################################
 
-aoss_client = boto3.client('opensearchserverless')
-
-region = boto3.Session().region_name
-service = 'aoss'
-credentials = boto3.Session().get_credentials()
-awsauth = AWS4Auth(credentials.access_key, credentials.secret_key, region, service, session_token=credentials.token)
-host=AOSS_ENDPOINT.replace("https://", "")
-aoss_index_name='statements'
+aoss_index_name=AOSS_INDEX_NAME
 headers = { "Content-Type": "application/json" }
 
-def search_aoss():
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-
-    query = {
-        "query": {
-            "match_all": {}
+warmup("aoss")
+
+
+def export_all(fields=None):
+    # Walks the whole index page by page into a spooled temp file (memory up to 8 MB, then
+    # /tmp), so the export never holds more than one page of documents in memory.
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode="w+b") as spool:
+        writer = _TextWriter(spool)
+        count = export_ndjson(writer, fields=fields)
+        log.info("Exported documents", count=count, bytes=writer.bytes)
+        spool.seek(0)
+
+        if EXPORT_BUCKET:
+            s3 = aws_client("s3")
+            key = f"exports/{aoss_index_name}-{int(time.time())}.ndjson"
+            s3.upload_fileobj(spool, EXPORT_BUCKET, key, ExtraArgs={"ContentType": "application/x-ndjson"})
+            url = s3.generate_presigned_url("get_object", Params={"Bucket": EXPORT_BUCKET, "Key": key}, ExpiresIn=3600)
+            return {
+                "statusCode":200,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"count":count, "export":url})
+            }
+
+        if writer.bytes > EXPORT_INLINE_MAX_BYTES:
+            raise ValueError(f"Export is {writer.bytes} bytes; configure EXPORT_BUCKET to export more than {EXPORT_INLINE_MAX_BYTES}")
+        return {
+            "statusCode":200,
+            "headers": {**CORS_HEADERS, "Content-Type": "application/x-ndjson"},
+            "body": spool.read().decode("utf-8")
         }
-    }  
 
-    response = client.search(
-        body = query,
-        index = aoss_index_name
-    )
-    return(response)
 
-def strip_knn_vector(data):
-    try:
-        rebuild = []
-        for entry in data['hits']['hits']:
-            entry["_source"]["statement-vector"]=[-1]
-            rebuild.append(entry)
-        data['hits']['hits'] = rebuild
-        return data
-    except:
-        return data
+class _TextWriter:
+    def __init__(self, fp):
+        self.fp = fp
+        self.bytes = 0
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.bytes += len(data)
+        self.fp.write(data)
 
-def handler(event,context):
-    print("<Ingest:Hello>")
 
+@instrumented("search_all")
+def handler(event,context):
     # print(event["body"])
     
     try:
-        search_results = search_aoss()
-        final = strip_knn_vector(search_results)
-        print(final)
+        # ?fields=statement,background  optional _source projection
+        # ?size=100&cursor=...          cursor pagination (cursor comes from the previous page)
+        # ?format=ndjson                export every document as NDJSON
+        params = event.get("queryStringParameters") or {}
+        fields = params["fields"].split(",") if params.get("fields") else None
+
+        if params.get("format") == "ndjson":
+            with stage("Export"):
+                return export_all(fields=fields)
+
+        size = params.get("size") or str(PAGE_SIZE)
+        if not size.isdigit() or int(size) < 1:
+            return {
+                "statusCode":400,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"msg":f"size must be a positive integer, got '{size}'"})
+            }
+
+        with stage("Search"):
+            final, cursor = page_documents(
+                cursor=params.get("cursor") or None,
+                size=int(size),
+                fields=fields
+            )
+        log.info("Page read", documents=len(final['hits']['hits']), more=cursor is not None)
+        with stage("Serialize"):
+            # body = json.dumps({"All results":final['hits']['hits']})
+            body = json.dumps({"All results":final, "cursor":cursor})
         return {
             "statusCode":200,
             "headers": CORS_HEADERS,
-            # "body": json.dumps({"All results":final['hits']['hits']})
-            "body": json.dumps({"All results":final})
-
+            "body": body
         }
 
 
 
     except Exception as e:
+        log.error("Request failed", error=repr(e))
+        if index_missing(e):
+            invalidate_index()
         return {
             "statusCode":500,
             "headers": CORS_HEADERS,
@@ -1,10 +1,18 @@
-import boto3
 import json
-import requests
-from requests_aws4auth import AWS4Auth
-from opensearchpy import OpenSearch, RequestsHttpConnection
+from aoss_common import log
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.concurrency import run_concurrently, STAGE_TIMEOUTS
+from aoss_common.embeddings import generate_embeddings, embedding_cache_stats
+from aoss_common.entities import generate_statement_metadata, entities_cache_stats
+from aoss_common.indices import index_check, index_missing, invalidate_index
+from aoss_common.knn import knn_search
+from aoss_common.metrics import instrumented, stage, timed
+from aoss_common.nearcache import near_cache_stats
+from aoss_common.searchcache import search_key, cached_search, cache_search, search_cache_stats
+from aoss_common.similar import get_similar_store, similar_page_size, SIMILAR_PAGE_SIZE
+from aoss_common.vectors import is_exact_score
+from aoss_common.warmup import warmup
 import os
-import time
 import string
 
 CORS_HEADERS = {
@@ -25,38 +33,12 @@ EMBEDDINGS_API_KEY = os.environ["EMBEDDINGS_API_KEY"]
 # https://opensearch-project.github.io/opensearch-py/api-ref/clients/indices_client.html
 #################################
 
-aoss_client = boto3.client('opensearchserverless')
-comprehend_client = boto3.client('comprehendmedical')
-
-region = boto3.Session().region_name
-service = 'aoss'
-credentials = boto3.Session().get_credentials()
-awsauth = AWS4Auth(credentials.access_key, credentials.secret_key, region, service, session_token=credentials.token)
-host=AOSS_ENDPOINT.replace("https://", "")
-aoss_index_name='statements'
+aoss_index_name=AOSS_INDEX_NAME
 headers = { "Content-Type": "application/json" }
 
+warmup("aoss", "comprehendmedical", "dynamodb")
 
 
-def generate_statement_metadata(statement):
-    THRESHOLD = .75
-    meta = {}
-    topics = set()
-    result = comprehend_client.detect_entities_v2(Text=statement)
-    print("Comprehend Medical Result")
-    print( result )
-    
-    for entity in result['Entities']:
-        if entity["Score"] > THRESHOLD:
-            topics.add(entity["Category"].replace('_', ' ').lower())
-            entity["Category"] = entity["Category"].lower()
-            metanew = ''.join(e for e in entity["Category"] if e.isalnum())
-            if metanew not in meta.keys():
-                meta[metanew] = []
-            meta[metanew].append(entity["Text"].lower())
-
-
-    return meta, list(topics)
 
 def generate_statement_background(statement, intent, severity, source, topics):
     back = {
@@ -68,45 +50,6 @@ def generate_statement_background(statement, intent, severity, source, topics):
 
     return back
 
-def index_check():
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-
-    response = client.indices.exists(aoss_index_name)
-    print('\Checking index:')
-    print(response)
-    return response
-
-
-def generate_embeddings(statement):
-    headers = {
-        'x-api-key': EMBEDDINGS_API_KEY,
-        'Content-Type': 'application/json',
-    }
-    json_data = {
-        'inputText': statement,
-    }
-
-    response = requests.post(
-        EMBEDDINGS_API,
-        headers=headers,
-        json=json_data,
-    )
-    print(response)
-
-    vector_embedding = None
-    if response.status_code == 200:
-        vector_embedding = response.json()
-
-    return vector_embedding
-
 
 def create_filters(metadata, intent, severity, source, topic, medicalconditions):
     filter_list = []
@@ -150,56 +93,11 @@ def create_filters(metadata, intent, severity, source, topic, medicalconditions)
     filter_list.append(postfilter)
     return filter_list
 
-def search_aoss(embeddings,filter_list):
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
-
-    query = {
-        'size': 20,
-        'query': {
-            'knn': {
-                "statement-vector": {
-                    "vector": embeddings,
-                    "k": 5
-                }
-            }
-        },
-        "post_filter": {
-            "bool": {
-                "must": filter_list
-            }
-        },
-        "fields": ["statement"]
-    }    
-
-    print(query)
-    
-    response = client.search(
-        body = query,
-        index = aoss_index_name
-    )
-    return(response)
-
+def search_aoss(embeddings,filter_list,fields=None):
+    # filters are applied inside the kNN search where the engine supports it (see knn.py)
+    return knn_search(embeddings, {"bool": {"must": filter_list}}, fields=fields)
 
 
-def strip_knn_vector(data):
-    try:
-        rebuild = []
-        for entry in data['hits']['hits']:
-            entry["_source"]["statement-vector"]=[-1]
-            rebuild.append(entry)
-        data['hits']['hits'] = rebuild
-        return data
-    except:
-        return data
-
 def strip_punctuation(sentence):
     # Create a translation table to remove punctuation
     translator = str.maketrans('', '', string.punctuation)
@@ -210,62 +108,75 @@ def strip_punctuation(sentence):
     return stripped_sentence
 
 
-def map_statement(statement_document,statement_metadata,statement_background,matches):
+def map_statement(statement_document,statement_metadata,statement_background,matches,page_size=SIMILAR_PAGE_SIZE):
     THRESHOLD = 0.6
 
-    # Build the OpenSearch client
-    client = OpenSearch(
-        hosts=[{'host': host, 'port': 443}],
-        http_auth=awsauth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=300
-    )
     # remember breaker for match on 1
     similar_statements = []
+    similar_parents = []
     exact_match = []
     for result in matches:
         statement_json={}
         exact_json ={}
-        if (THRESHOLD <= result['_score'] < 1 ):
+        if (THRESHOLD <= result['_score'] and not is_exact_score(result['_score']) ):
             # print("Result match, updating similar statement payload")
             doc_id=result["_id"]
 
             statement=statement_document["statement"]
             doc_data=result["_source"]
-            print(doc_data)
+            log.debug("Similar match", id=doc_id, source=doc_data)
 
-            exact_json[ doc_data["statement"] ] = {"metadata":doc_data["metadata"], "background": doc_data["background"], "score": result['_score']}
+            exact_json[ doc_data.get("statement", doc_id) ] = {"metadata":doc_data.get("metadata"), "background": doc_data.get("background"), "score": result['_score']}
             exact_match.append(exact_json)
             
-            statement_similar_json=doc_data["statement-similar"]
-            # statement_similar_json[ statement ] = {"metadata":statement_metadata, "background": statement_background}
-
-            similar_statements.append(statement_similar_json)
-        elif( result['_score'] == 1 ):
-            print("EXACT MATCH")
+            similar_statements.append(doc_data.get("statement-similar") or {})
+            similar_parents.append(doc_id)
+        elif( is_exact_score(result['_score']) ):
             doc_data=result["_source"]
-            print(doc_data)
+            log.debug("Exact match", id=result["_id"], source=doc_data)
 
             statement=statement_document["statement"]
-            statement_json[ statement ] = {"metadata":doc_data["metadata"], "background": doc_data["background"], "score": result['_score']}
+            statement_json[ statement ] = {"metadata":doc_data.get("metadata"), "background": doc_data.get("background"), "score": result['_score']}
             exact_match.append(statement_json)
 
-            statement_similar_json=doc_data["statement-similar"]
-            similar_statements.append(statement_similar_json)
+            similar_statements.append(doc_data.get("statement-similar") or {})
+            similar_parents.append(result["_id"])
 
+    # similar statements live in the side store (plus any legacy inline statement-similar);
+    # the first page for every matched document comes back in one request
+    pages = get_similar_store().page(similar_parents, size=page_size)
+    similar_next = {}
+    for statement_similar_json, parent_id in zip(similar_statements, similar_parents):
+        entries, next_cursor = pages.get(parent_id, ({}, None))
+        statement_similar_json.update(entries)
+        if next_cursor:
+            similar_next[parent_id] = next_cursor
 
-    return (exact_match, similar_statements)
+    return (exact_match, similar_statements), similar_next
 
 
+@instrumented("search")
 def handler(event,context):
-    print("<Ingest:Hello>")
     field_values=json.loads(event["body"])
 
-    # print(event["body"])
+    log.debug("Search request", body=event["body"])
     
     try:
+        # next page of similar statements for one document: {"similarParent", "similarCursor"}
+        if "similarParent" in field_values:
+            parent_id = field_values["similarParent"]
+            pages = get_similar_store().page(
+                [parent_id],
+                size=similar_page_size(field_values.get("similarPageSize", SIMILAR_PAGE_SIZE)),
+                after={parent_id: field_values["similarCursor"]} if field_values.get("similarCursor") else None
+            )
+            entries, next_cursor = pages[parent_id]
+            return {
+                "statusCode":200,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"Similar statements":entries, "Similar cursor":next_cursor})
+            }
+
         statement=strip_punctuation(field_values["statement"].lower())
         intent=field_values["intent"].lower()
         severity=field_values["severity"].lower()
@@ -274,23 +185,43 @@ def handler(event,context):
         # medicalconditions=field_values["medicalConditions"].lower()
         topic = [topic.lower() for topic in field_values["topics"]]
         medicalconditions = [condition.lower() for condition in field_values["medicalConditions"]]
-        index_exists = index_check()
-        print(type(index_exists))
+        page_size = similar_page_size(field_values.get("similarPageSize", SIMILAR_PAGE_SIZE))
+
+        # repeated query since the last ingest/delete: answer from the response cache (searchcache.py)
+        with stage("CacheLookup"):
+            cache_key = search_key(statement, intent, severity, source, topic, medicalconditions, field_values.get("fields"), page_size)
+            body = cached_search(cache_key)
+        if body is not None:
+            log.info("Search cache hit")
+            return {
+                "statusCode":200,
+                "headers": CORS_HEADERS,
+                "body": body
+            }
+
+        with stage("IndexCheck"):
+            index_exists = index_check()
 
         if( index_exists==False ):
-            print("Index does not exist")
+            log.warning("Index does not exist")
             return []
             
-        metadata, topics=generate_statement_metadata(statement)
-        print(metadata)
+        # entity extraction and embedding are independent; run them side by side
+        with stage("Enrich"):
+            stages = run_concurrently({
+                "metadata": lambda: timed("Entities", generate_statement_metadata, statement),
+                "embeddings": lambda: timed("Embeddings", generate_embeddings, statement)
+            }, timeouts=STAGE_TIMEOUTS)
+        metadata, topics=stages["metadata"]
+        embeddings=stages["embeddings"]
         backdata=generate_statement_background(statement, intent, severity, source, topics)
-        print(backdata)
-        embeddings=generate_embeddings(statement)
-        # print(embeddings)
         filter_list = create_filters(metadata, intent, severity, source, topic, medicalconditions)
-        print(filter_list)
+        log.debug("Statement enriched", metadata=metadata, background=backdata, filters=filter_list)
 
-        search_results = search_aoss(embeddings=embeddings,filter_list=filter_list)
+        # optional _source projection, e.g. "fields": ["statement", "background"]
+        with stage("Search"):
+            search_results = search_aoss(embeddings=embeddings,filter_list=filter_list,fields=field_values.get("fields"))
+        log.debug("Cache stats", entities=entities_cache_stats, embeddings=embedding_cache_stats, near=near_cache_stats, search=search_cache_stats)
 
         document = {
             'statement': statement,
@@ -302,20 +233,28 @@ def handler(event,context):
 
         # Ingest or map to results
         if (search_results['hits']['max_score'] != None):
-            print(strip_knn_vector(search_results))
-            print("Results found; mapping...")
-            response=map_statement(statement_document=document,statement_metadata=metadata,statement_background=backdata,matches=search_results['hits']['hits'])
-            print(response)
+            log.info("Results found, mapping", hits=len(search_results['hits']['hits']))
+            log.debug("Search results", hits=lambda: search_results['hits']['hits'])
+            with stage("Map"):
+                response, similar_next=map_statement(statement_document=document,statement_metadata=metadata,statement_background=backdata,matches=search_results['hits']['hits'],page_size=page_size)
+            log.debug("Search response", response=response)
         else:
-            print("No results found.")
+            log.info("No results found")
             response=""
+            similar_next={}
 
+        with stage("Serialize"):
+            body = json.dumps({"Search response":response, "Similar cursors":similar_next})
+        cache_search(cache_key, body)
         return {
             "statusCode":200,
             "headers": CORS_HEADERS,
-            "body": json.dumps({"Search response":response})
+            "body": body
         }
     except Exception as e:
+        log.error("Request failed", error=repr(e))
+        if index_missing(e):
+            invalidate_index()
         return {
             "statusCode":500,
             "headers": CORS_HEADERS,
@@ -0,0 +1,3 @@
+# Shared helpers for the AOSS lambdas (ingest, search, search_all, delete).
+# Shipped as its own layer so every function imports the same code:
+#   from aoss_common import client
@@ -0,0 +1,489 @@
+import copy
+import itertools
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+
+from opensearchpy.exceptions import NotFoundError
+
+from aoss_common.client import get_client, get_write_client, AOSS_INDEX_NAME
+from aoss_common.vectors import cosine_score
+
+#################################
+# Search backends
+#
+# Everything in aoss_common talks to the index through get_backend(), never to
+# opensearchpy.OpenSearch directly. SearchBackend is the subset of the client the functions
+# use (index check/create/mapping, search/msearch/scroll with kNN and filters, index/update/
+# delete and _bulk); method names, arguments and responses follow opensearch-py so callers
+# read the same against either implementation:
+#   SEARCH_BACKEND=aoss (default) -> AossBackend, the pooled AOSS client from client.py
+#   SEARCH_BACKEND=memory         -> MemoryBackend, in-process (NumPy kNN), for local runs
+#################################
+
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "aoss")
+
+
+class SearchBackend(ABC):
+    @abstractmethod
+    def index_exists(self, index_name, timeout=None):
+        ...
+
+    @abstractmethod
+    def create_index(self, index_name, body):
+        ...
+
+    @abstractmethod
+    def get_mapping(self, index_name):
+        ...
+
+    @abstractmethod
+    def put_mapping(self, index_name, properties):
+        ...
+
+    @abstractmethod
+    def search(self, index, body, scroll=None):
+        ...
+
+    @abstractmethod
+    def msearch(self, body):
+        ...
+
+    @abstractmethod
+    def scroll(self, scroll_id, scroll):
+        ...
+
+    @abstractmethod
+    def clear_scroll(self, scroll_id):
+        ...
+
+    @abstractmethod
+    def index(self, index, body, id=None):
+        ...
+
+    @abstractmethod
+    def update(self, index, id, body):
+        ...
+
+    @abstractmethod
+    def delete(self, index, id):
+        ...
+
+    @abstractmethod
+    def bulk(self, body):
+        ...
+
+
+class AossBackend(SearchBackend):
+    def index_exists(self, index_name, timeout=None):
+        if timeout is not None:
+            return get_client().indices.exists(index=index_name, request_timeout=timeout)
+        return get_client().indices.exists(index_name)
+
+    def create_index(self, index_name, body):
+        return get_write_client().indices.create(index_name, body=body)
+
+    def get_mapping(self, index_name):
+        return get_client().indices.get_mapping(index=index_name)
+
+    def put_mapping(self, index_name, properties):
+        return get_write_client().indices.put_mapping(index=index_name, body={"properties": properties})
+
+    def search(self, index, body, scroll=None):
+        if scroll is None:
+            return get_client().search(index = index, body = body)
+        return get_client().search(index = index, body = body, scroll = scroll)
+
+    def msearch(self, body):
+        return get_client().msearch(body = body)
+
+    def scroll(self, scroll_id, scroll):
+        return get_client().scroll(scroll_id = scroll_id, scroll = scroll)
+
+    def clear_scroll(self, scroll_id):
+        return get_client().clear_scroll(scroll_id = scroll_id)
+
+    def index(self, index, body, id=None):
+        if id is None:
+            return get_write_client().index(index = index, body = body)
+        return get_write_client().index(index = index, body = body, id = id)
+
+    def update(self, index, id, body):
+        return get_write_client().update(index = index, body = body, id = id)
+
+    def delete(self, index, id):
+        return get_write_client().delete(index = index, id = id)
+
+    def bulk(self, body):
+        return get_write_client().bulk(body = body)
+
+
+#################################
+# In-memory backend
+#
+# Documents live in dicts per index; kNN is a brute-force cosine over a NumPy matrix of the
+# index's vectors (scores use the cosinesimil formula, so thresholds keep their meaning).
+# Filters cover what the functions send: match_all, ids, term, terms, match, query_string
+# (any token of the query in the fields) and bool must/filter/should/must_not. Writes are
+# visible immediately.
+#################################
+
+def _values(source, path):
+    # every value at a dotted path, lists flattened
+    values = [source]
+    for part in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict) and part in value:
+                child = value[part]
+                found += child if isinstance(child, list) else [child]
+        values = found
+    return values
+
+
+def _tokens(value):
+    return str(value).lower().split()
+
+
+def _term_matches(values, expected):
+    for value in values:
+        if value == expected:
+            return True
+        if isinstance(value, str) and isinstance(expected, str) and expected.lower() in _tokens(value):
+            return True
+    return False
+
+
+def _text_matches(values, text):
+    wanted = set(_tokens(text))
+    return any(wanted & set(_tokens(value)) for value in values if isinstance(value, (str, int, float)))
+
+
+def _single(clause):
+    # {"field": value} or {"field": {"value": value}} -> (field, value)
+    field, value = next(iter(clause.items()))
+    if isinstance(value, dict):
+        value = value.get("value", value.get("query"))
+    return field, value
+
+
+def _clauses(clause, occur):
+    queries = clause.get(occur, [])
+    return [queries] if isinstance(queries, dict) else queries
+
+
+def matches(doc_id, source, query):
+    if not query:
+        return True
+    kind, clause = next(iter(query.items()))
+    if kind == "match_all":
+        return True
+    if kind == "ids":
+        return doc_id in clause["values"]
+    if kind == "term":
+        field, value = _single(clause)
+        return _term_matches(_values(source, field), value)
+    if kind == "terms":
+        field, values = next(iter(clause.items()))
+        return any(_term_matches(_values(source, field), value) for value in values)
+    if kind == "match":
+        field, value = _single(clause)
+        return _text_matches(_values(source, field), value)
+    if kind == "query_string":
+        fields = clause.get("fields") or list(source)
+        return any(_text_matches(_values(source, field), clause["query"]) for field in fields)
+    if kind == "bool":
+        required = _clauses(clause, "must") + _clauses(clause, "filter")
+        if not all(matches(doc_id, source, q) for q in required):
+            return False
+        if any(matches(doc_id, source, q) for q in _clauses(clause, "must_not")):
+            return False
+        should = _clauses(clause, "should")
+        if should and (not required or "minimum_should_match" in clause):
+            return any(matches(doc_id, source, q) for q in should)
+        return True
+    raise ValueError(f"MemoryBackend does not support '{kind}' queries")
+
+
+def project(source, source_filter):
+    if source_filter is True or source_filter is None:
+        return copy.deepcopy(source)
+    if source_filter is False:
+        return None
+    if isinstance(source_filter, list):
+        source_filter = {"includes": source_filter}
+    includes = source_filter.get("includes")
+    excludes = source_filter.get("excludes", [])
+    return {
+        key: copy.deepcopy(value) for key, value in source.items()
+        if (not includes or key in includes) and key not in excludes
+    }
+
+
+def merge(target, partial):
+    for key, value in partial.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+def _after(values, cursor, orders):
+    # whether sort values come after a search_after cursor, key by key in each key's order
+    for value, after, order in zip(values, cursor, orders):
+        if value != after:
+            return value > after if order == "asc" else value < after
+    return False
+
+
+def not_found(kind, reason):
+    return NotFoundError(404, kind, {"error": {"type": kind, "reason": reason}})
+
+
+class MemoryBackend(SearchBackend):
+    def __init__(self):
+        self.indices = {}    # index name -> {"mappings": ..., "docs": {id: source}}
+        self.scrolls = {}    # scroll id -> (remaining hits, page size)
+        self._matrices = {}  # (index name, field) -> (ids, normalized vectors), rebuilt after writes
+        self._lock = threading.RLock()
+        self._sequence = itertools.count(1)
+
+    def _index(self, index_name):
+        if index_name not in self.indices:
+            raise not_found("index_not_found_exception", f"no such index [{index_name}]")
+        return self.indices[index_name]
+
+    def _written(self, index_name):
+        for key in [key for key in self._matrices if key[0] == index_name]:
+            del self._matrices[key]
+
+    # indices
+    def index_exists(self, index_name, timeout=None):
+        return index_name in self.indices
+
+    def create_index(self, index_name, body):
+        with self._lock:
+            if index_name in self.indices:
+                raise ValueError(f"Index {index_name} already exists")
+            self.indices[index_name] = {"mappings": copy.deepcopy((body or {}).get("mappings", {})), "docs": {}}
+            return {"acknowledged": True, "index": index_name}
+
+    def get_mapping(self, index_name):
+        return {index_name: {"mappings": copy.deepcopy(self._index(index_name)["mappings"])}}
+
+    def put_mapping(self, index_name, properties):
+        with self._lock:
+            self._index(index_name)["mappings"].setdefault("properties", {}).update(copy.deepcopy(properties))
+            return {"acknowledged": True}
+
+    # search
+    def _vectors(self, index_name, field):
+        import numpy as np  # only needed for kNN, and only by this backend
+        key = (index_name, field)
+        if key not in self._matrices:
+            docs = self._index(index_name)["docs"]
+            ids = [doc_id for doc_id, source in docs.items() if source.get(field) is not None]
+            if not ids:
+                self._matrices[key] = (ids, None)
+                return self._matrices[key]
+            matrix = np.array([docs[doc_id][field] for doc_id in ids], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrices[key] = (ids, matrix / np.where(norms == 0, 1, norms))
+        return self._matrices[key]
+
+    def _knn(self, index_name, docs, knn):
+        import numpy as np
+        field, spec = next(iter(knn.items()))
+        ids, matrix = self._vectors(index_name, field)
+        if not ids:
+            return []
+        query = np.asarray(spec["vector"], dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        # float32 rounding can push an identical vector just past 1
+        scores = cosine_score(np.clip(matrix @ query, -1.0, 1.0))
+        ranked = [(ids[i], float(scores[i])) for i in np.argsort(-scores, kind="stable")]
+        if "filter" in spec:
+            ranked = [(doc_id, score) for doc_id, score in ranked if matches(doc_id, docs[doc_id], spec["filter"])]
+        return ranked[:spec.get("k", 10)]
+
+    def _hits(self, index_name, body):
+        docs = self._index(index_name)["docs"]
+        query = body.get("query") or {"match_all": {}}
+        if "knn" in query:
+            ranked = self._knn(index_name, docs, query["knn"])
+        else:
+            ranked = [(doc_id, 1.0) for doc_id, source in docs.items() if matches(doc_id, source, query)]
+        if "post_filter" in body:
+            ranked = [(doc_id, score) for doc_id, score in ranked if matches(doc_id, docs[doc_id], body["post_filter"])]
+
+        hits = [{"_index": index_name, "_id": doc_id, "_score": score, "_source": docs[doc_id]} for doc_id, score in ranked]
+        sort = body.get("sort")
+        if sort:
+            fields = [next(iter(s.items())) if isinstance(s, dict) else (s, "asc") for s in sort]
+            orders = [order.get("order", "asc") if isinstance(order, dict) else order for _, order in fields]
+            for hit in hits:
+                hit["sort"] = [(_values(hit["_source"], field) or [None])[0] for field, _ in fields]
+                hit["_score"] = None
+            # one stable sort per key, last key first
+            for position in reversed(range(len(fields))):
+                hits.sort(key=lambda hit: (hit["sort"][position] is None, hit["sort"][position]), reverse=orders[position] == "desc")
+            if "search_after" in body:
+                hits = [hit for hit in hits if _after(hit["sort"], body["search_after"], orders)]
+        return hits
+
+    def _response(self, hits, size, source_filter, total=None):
+        page = [dict(hit, _source=project(hit["_source"], source_filter)) for hit in hits[:size]]
+        for hit in page:
+            if hit["_source"] is None:
+                del hit["_source"]
+        scores = [hit["_score"] for hit in page if hit["_score"] is not None]
+        return {
+            "took": 0,
+            "timed_out": False,
+            "hits": {
+                "total": {"value": len(hits) if total is None else total, "relation": "eq"},
+                "max_score": max(scores) if scores else None,
+                "hits": page
+            }
+        }
+
+    def search(self, index, body, scroll=None):
+        with self._lock:
+            body = body or {}
+            hits = self._hits(index, body)
+            size = body.get("size", 10)
+            source_filter = body.get("_source", True)
+            response = self._response(hits, size, source_filter)
+            if scroll is not None:
+                scroll_id = uuid.uuid4().hex
+                self.scrolls[scroll_id] = (hits[size:], size, source_filter)
+                response["_scroll_id"] = scroll_id
+            return response
+
+    def msearch(self, body):
+        responses = []
+        for header, query in zip(body[::2], body[1::2]):
+            try:
+                responses.append(dict(self.search(header["index"], query), status=200))
+            except NotFoundError as e:
+                responses.append({"error": e.info["error"], "status": 404})
+        return {"took": 0, "responses": responses}
+
+    def scroll(self, scroll_id, scroll):
+        with self._lock:
+            if scroll_id not in self.scrolls:
+                raise not_found("search_context_missing_exception", f"No search context found for id [{scroll_id}]")
+            hits, size, source_filter = self.scrolls[scroll_id]
+            self.scrolls[scroll_id] = (hits[size:], size, source_filter)
+            response = self._response(hits, size, source_filter)
+            response["_scroll_id"] = scroll_id
+            return response
+
+    def clear_scroll(self, scroll_id):
+        with self._lock:
+            self.scrolls.pop(scroll_id, None)
+            return {"succeeded": True}
+
+    # writes; bulk goes through the same _put/_merge/_remove as the single-document calls
+    def _put(self, index, body, id):
+        docs = self._index(index)["docs"]
+        doc_id = id or f"mem-{next(self._sequence)}"
+        result = "updated" if doc_id in docs else "created"
+        docs[doc_id] = copy.deepcopy(body)
+        self._written(index)
+        return {"_index": index, "_id": doc_id, "result": result}
+
+    def _merge(self, index, id, body):
+        docs = self._index(index)["docs"]
+        if id not in docs:
+            raise not_found("document_missing_exception", f"[{id}]: document missing")
+        if "doc" not in body:
+            raise ValueError("MemoryBackend only supports partial-document updates ({'doc': ...})")
+        merge(docs[id], body["doc"])
+        self._written(index)
+        return {"_index": index, "_id": id, "result": "updated"}
+
+    def _remove(self, index, id):
+        docs = self._index(index)["docs"]
+        if id not in docs:
+            raise not_found("not_found", f"[{id}]: document missing")
+        del docs[id]
+        self._written(index)
+        return {"_index": index, "_id": id, "result": "deleted"}
+
+    def index(self, index, body, id=None):
+        with self._lock:
+            return self._put(index, body, id)
+
+    def update(self, index, id, body):
+        with self._lock:
+            return self._merge(index, id, body)
+
+    def delete(self, index, id):
+        with self._lock:
+            return self._remove(index, id)
+
+    def bulk(self, body):
+        items = []
+        lines = iter(body)
+        with self._lock:
+            for header in lines:
+                op, meta = next(iter(header.items()))
+                document = next(lines) if op != "delete" else None
+                try:
+                    if op in ("index", "create"):
+                        response = self._put(meta["_index"], document, meta.get("_id"))
+                    elif op == "update":
+                        response = self._merge(meta["_index"], meta["_id"], document)
+                    else:
+                        response = self._remove(meta["_index"], meta["_id"])
+                    items.append({op: dict(response, status=201 if response["result"] == "created" else 200)})
+                except NotFoundError as e:
+                    items.append({op: {"_index": meta["_index"], "_id": meta.get("_id"), "status": 404, "error": e.info["error"]}})
+        return {"took": 0, "errors": any("error" in next(iter(item.values())) for item in items), "items": items}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if SEARCH_BACKEND == "memory":
+            _backend = MemoryBackend()
+        elif SEARCH_BACKEND == "aoss":
+            _backend = AossBackend()
+        else:
+            raise ValueError(f"Unknown SEARCH_BACKEND '{SEARCH_BACKEND}', expected aoss or memory")
+    return _backend
+
+
+def set_backend(backend):
+    # e.g. set_backend(MemoryBackend()) in a local script before calling a handler
+    global _backend
+    _backend = backend
+
+
+def bulk_write(actions):
+    # actions: [(op, index_name, doc_id, body)] with op "index" (new document), "update"
+    # (partial doc) or "delete" (body None); index_name None means the statements index.
+    # Returns one {"ok", "id", "error"} per action, in order.
+    if not actions:
+        return []
+
+    body = []
+    for op, index_name, doc_id, document in actions:
+        header = {"_index": index_name or AOSS_INDEX_NAME}
+        if doc_id is not None:
+            header["_id"] = doc_id
+        body.append({op: header})
+        if op != "delete":
+            body.append(document)
+
+    response = get_backend().bulk(body)
+    results = []
+    for item in response['items']:
+        _, outcome = next(iter(item.items()))
+        error = outcome.get('error')
+        results.append({"ok": error is None, "id": outcome.get('_id'), "error": error})
+    return results
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from aoss_common.session import aws_client
+
+#################################
+# Small caching building blocks
+#
+# ByteLRU is the in-process tier (lives as long as the warm container). The stores are the
+# optional persistent tier, addressed by a content hash so any container can reuse an entry:
+#   CACHE_BUCKET -> S3Store, CACHE_DIR -> FileStore, neither -> no persistent tier
+#################################
+
+CACHE_BUCKET = os.environ.get("CACHE_BUCKET", "")
+CACHE_DIR = os.environ.get("CACHE_DIR", "")
+
+
+def content_key(*parts):
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def normalize_statement(statement):
+    return " ".join(statement.split())
+
+
+class ByteLRU:
+    # ttl (seconds) is optional; expired entries count as misses and are dropped on access
+    def __init__(self, max_bytes, sizeof, ttl=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        # stages run on worker threads (see concurrency.py), so guard the OrderedDict
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.time():
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, expires_at=None):
+        with self._lock:
+            self._put(key, value, expires_at)
+
+    def _put(self, key, value, expires_at):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (expires_at, value)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= self.sizeof(evicted)
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, value = self._entries.pop(key)
+        self.bytes -= self.sizeof(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class FileStore:
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename so a concurrent reader never sees a partial entry
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+class S3Store:
+    def __init__(self, bucket, prefix):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _client(self):
+        return aws_client("s3")
+
+    def get(self, key):
+        try:
+            return self._client().get_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}")["Body"].read()
+        except self._client().exceptions.NoSuchKey:
+            return None
+
+    def put(self, key, data):
+        self._client().put_object(Bucket=self.bucket, Key=f"{self.prefix}/{key}", Body=data)
+
+
+def store_from_env(prefix):
+    if CACHE_BUCKET:
+        return S3Store(CACHE_BUCKET, prefix)
+    if CACHE_DIR:
+        return FileStore(os.path.join(CACHE_DIR, prefix))
+    return None
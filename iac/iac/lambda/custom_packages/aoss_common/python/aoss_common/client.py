@@ -0,0 +1,104 @@
+import os
+import time
+
+from opensearchpy import OpenSearch, RequestsHttpConnection
+
+from aoss_common import log
+from aoss_common.session import region_name
+from aoss_common.signing import RefreshableSigV4Auth, sigv4_auth
+
+#################################
+# Process-wide OpenSearch client
+#
+# Lambda keeps module globals alive between warm invocations, so the client (and the
+# keep-alive connection pool inside its requests.Session) is built once per container
+# and reused by every call instead of paying a TLS handshake per operation.
+# Writes go through a second client that never resends a request that timed out (or got a
+# 504): AOSS may have applied it anyway, and an index or _bulk sent twice stores the
+# documents twice. Timeouts leave room for the retries within the 3 minute function limit.
+#################################
+
+AOSS_ENDPOINT = os.environ["AOSS_ENDPOINT"]
+AOSS_INDEX_NAME = os.environ.get("AOSS_INDEX_NAME", "statements")
+AOSS_SERVICE = 'aoss'
+
+POOL_MAXSIZE = int(os.environ.get("AOSS_POOL_MAXSIZE", "10"))
+TIMEOUT = int(os.environ.get("AOSS_TIMEOUT", "30"))
+WRITE_TIMEOUT = int(os.environ.get("AOSS_WRITE_TIMEOUT", "60"))
+MAX_RETRIES = int(os.environ.get("AOSS_MAX_RETRIES", "2"))
+
+host = AOSS_ENDPOINT.replace("https://", "")
+
+_client = None
+_write_client = None
+_auth = None
+_stats = {"created": 0, "reused": 0, "created_at": None}
+
+
+def build_auth():
+    global _auth
+    # one signer per container; expiring credentials are reloaded by the signer itself (signing.py)
+    if _auth is None:
+        _auth = sigv4_auth(region_name(), AOSS_SERVICE)
+    return _auth
+
+
+def build_client(timeout=TIMEOUT, retry_on_timeout=True, retry_on_status=(502, 503, 504)):
+    return OpenSearch(
+        hosts=[{'host': host, 'port': 443}],
+        http_auth=build_auth(),
+        use_ssl=True,
+        verify_certs=True,
+        connection_class=RequestsHttpConnection,
+        pool_maxsize=POOL_MAXSIZE,
+        timeout=timeout,
+        max_retries=MAX_RETRIES,
+        retry_on_timeout=retry_on_timeout,
+        retry_on_status=retry_on_status
+    )
+
+
+def build_write_client():
+    # connection errors and 502/503 are still retried: the request never reached the index
+    return build_client(timeout=WRITE_TIMEOUT, retry_on_timeout=False, retry_on_status=(502, 503))
+
+
+def _created(build, kind):
+    started = time.perf_counter()
+    client = build()
+    _stats["created"] += 1
+    _stats["created_at"] = time.time()
+    log.info("AOSS client created", kind=kind, ms=round((time.perf_counter() - started) * 1000, 1))
+    return client
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = _created(build_client, "read")
+    else:
+        _stats["reused"] += 1
+    return _client
+
+
+def get_write_client():
+    global _write_client
+    if _write_client is None:
+        _write_client = _created(build_write_client, "write")
+    else:
+        _stats["reused"] += 1
+    return _write_client
+
+
+def reset_client():
+    global _client, _write_client
+    _client = None
+    _write_client = None
+
+
+def client_stats():
+    stats = dict(_stats)
+    if isinstance(_auth, RefreshableSigV4Auth):
+        stats["signing"] = _auth.stats()
+    return stats
+
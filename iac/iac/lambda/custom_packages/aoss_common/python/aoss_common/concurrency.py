@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+#################################
+# Run independent remote calls (Comprehend, embeddings, ...) side by side so a request
+# costs max() of its stages instead of their sum. One small pool per container.
+#################################
+
+MAX_WORKERS = int(os.environ.get("STAGE_MAX_WORKERS", "8"))
+DEFAULT_TIMEOUT = float(os.environ.get("STAGE_TIMEOUT", "30"))
+STAGE_TIMEOUTS = {
+    "metadata": float(os.environ.get("ENTITIES_TIMEOUT", "20")),
+    "embeddings": float(os.environ.get("EMBEDDINGS_TIMEOUT", "20"))
+}
+
+_executor = None
+
+
+class StageTimeout(TimeoutError):
+    pass
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="stage")
+    return _executor
+
+
+def run_concurrently(calls, timeouts=None):
+    # calls: {name: zero-arg callable}; timeouts: {name: seconds}. Returns {name: result}
+    # and re-raises the first failure; a stage that overruns raises StageTimeout.
+    timeouts = timeouts or {}
+    started = time.monotonic()
+    futures = {name: get_executor().submit(call) for name, call in calls.items()}
+
+    results = {}
+    for name, future in futures.items():
+        remaining = timeouts.get(name, DEFAULT_TIMEOUT) - (time.monotonic() - started)
+        try:
+            results[name] = future.result(timeout=max(remaining, 0))
+        except TimeoutError:
+            future.cancel()
+            raise StageTimeout(f"Stage '{name}' did not finish within {timeouts.get(name, DEFAULT_TIMEOUT)}s")
+    return results
+
+
+def map_concurrently(fn, items, timeout=None):
+    # fn(item) for every item on the pool; returns results in order with failures
+    # (including StageTimeout) returned in place instead of raised, for per-item reporting
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    started = time.monotonic()
+    futures = [get_executor().submit(fn, item) for item in items]
+
+    results = []
+    for future in futures:
+        remaining = timeout - (time.monotonic() - started)
+        try:
+            results.append(future.result(timeout=max(remaining, 0)))
+        except TimeoutError:
+            future.cancel()
+            results.append(StageTimeout(f"Did not finish within {timeout}s"))
+        except Exception as e:
+            results.append(e)
+    return results
@@ -0,0 +1,84 @@
+import os
+import time
+
+from aoss_common import log
+from aoss_common.backend import get_backend
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.indices import source_filter
+
+#################################
+# Read-your-writes for ingest
+#
+# AOSS acknowledges a write before it is searchable. Instead of sleeping a fixed amount,
+# poll for the written documents (by id) until they show up with the expected content,
+# backing off between polls and giving up at a bounded deadline.
+#################################
+
+CONSISTENCY_MODE = os.environ.get("INGEST_CONSISTENCY", "visible")  # visible | ack
+VISIBILITY_DEADLINE = float(os.environ.get("INGEST_VISIBILITY_DEADLINE", "15"))
+POLL_INTERVAL = float(os.environ.get("INGEST_POLL_INTERVAL", "0.25"))
+POLL_INTERVAL_MAX = 2.0
+
+
+def expect_document(doc_id, predicate=None, index_name=AOSS_INDEX_NAME):
+    # predicate(source) -> bool lets an update wait for its new content, not just the id
+    return (doc_id, predicate, index_name)
+
+
+# predicate for a delete: done once the id no longer shows up in searches
+DELETED = "deleted"
+
+
+def expect_deleted(doc_id, index_name=AOSS_INDEX_NAME):
+    return (doc_id, DELETED, index_name)
+
+
+def is_pending(doc_id, predicate, visible):
+    if predicate == DELETED:
+        return doc_id in visible
+    return doc_id not in visible or (predicate is not None and not predicate(visible[doc_id]))
+
+
+def pending_writes(client, expectations):
+    pending = []
+    for index_name in {e[2] for e in expectations}:
+        expected = [e for e in expectations if e[2] == index_name]
+        ids = [doc_id for doc_id, _, _ in expected]
+        response = client.search(
+            index = index_name,
+            body = {
+                "size": len(ids),
+                "query": {"ids": {"values": ids}},
+                "_source": source_filter()
+            }
+        )
+        visible = {hit["_id"]: hit["_source"] for hit in response['hits']['hits']}
+        pending += [
+            (doc_id, predicate, index_name) for doc_id, predicate, index_name in expected
+            if is_pending(doc_id, predicate, visible)
+        ]
+    return pending
+
+
+def wait_for_writes(expectations, deadline=None):
+    expectations = [e for e in expectations if e[0] is not None]
+    if CONSISTENCY_MODE == "ack" or not expectations:
+        return True
+
+    deadline = VISIBILITY_DEADLINE if deadline is None else deadline
+    client = get_backend()
+    started = time.monotonic()
+    delay = POLL_INTERVAL
+    polls = 0
+    while True:
+        expectations = pending_writes(client, expectations)
+        polls += 1
+        elapsed = time.monotonic() - started
+        if not expectations:
+            log.info("Writes visible", seconds=round(elapsed, 3), polls=polls)
+            return True
+        if elapsed + delay > deadline:
+            log.warning("Writes not visible, giving up", seconds=round(elapsed, 3), ids=[doc_id for doc_id, _, _ in expectations])
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_INTERVAL_MAX)
@@ -0,0 +1,80 @@
+import os
+from array import array
+
+from aoss_common import log
+from aoss_common.cache import ByteLRU, content_key, normalize_statement, store_from_env
+from aoss_common.embeddings_client import get_embeddings_client
+
+#################################
+# Embeddings with a two-tier cache
+#
+# Vectors are kept as float32 arrays (6 KiB for 1536 dims instead of ~50 KiB as a list of
+# Python floats) in a byte-bounded LRU, backed by the optional persistent store. Keys are
+# content addressed on (model id, normalized statement), so ingest and search share entries.
+#################################
+
+EMBEDDINGS_MODEL_ID = os.environ.get("EMBEDDINGS_MODEL_ID", "amazon.titan-embed-text-v1")
+EMBEDDINGS_CACHE_MAX_BYTES = int(os.environ.get("EMBEDDINGS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+_memory = ByteLRU(EMBEDDINGS_CACHE_MAX_BYTES, sizeof=lambda vector: vector.itemsize * len(vector))
+_store = store_from_env("embeddings")
+_store_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def embedding_key(statement):
+    return content_key(EMBEDDINGS_MODEL_ID, normalize_statement(statement))
+
+
+def request_embeddings(statement):
+    # the vector as a list of floats; EmbeddingsError when the API didn't give one (embeddings_client.py)
+    return get_embeddings_client().embed(statement)
+
+
+def _load(key):
+    if _store is None:
+        return None
+    try:
+        data = _store.get(key)
+    except Exception as e:
+        _store_stats["errors"] += 1
+        log.warning("Embedding store read failed", error=str(e))
+        return None
+    if data is None:
+        _store_stats["misses"] += 1
+        return None
+    _store_stats["hits"] += 1
+    vector = array('f')
+    vector.frombytes(data)
+    return vector
+
+
+def _save(key, vector):
+    if _store is None:
+        return
+    try:
+        _store.put(key, vector.tobytes())
+    except Exception as e:
+        _store_stats["errors"] += 1
+        log.warning("Embedding store write failed", error=str(e))
+
+
+def generate_embeddings(statement):
+    key = embedding_key(statement)
+    vector = _memory.get(key)
+    if vector is None:
+        vector = _load(key)
+        if vector is None:
+            vector = array('f', request_embeddings(statement))
+            _save(key, vector)
+        _memory.put(key, vector)
+    return vector.tolist()
+
+
+def set_store(store):
+    # any object with get(key) -> bytes|None and put(key, bytes), or None to disable
+    global _store
+    _store = store
+
+
+def embedding_cache_stats():
+    return {"memory": _memory.stats(), "store": dict(_store_stats), "client": get_embeddings_client().stats()}
@@ -0,0 +1,182 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from aoss_common import log
+
+#################################
+# HTTP client for the embeddings API
+#
+# One keep-alive requests.Session per container (pool sized for the stage workers of
+# concurrency.py), so warm calls skip the TLS handshake with API Gateway. Every call has a
+# connect and a read timeout; connection errors, timeouts, 429 and 5xx are retried up to
+# EMBEDDINGS_MAX_RETRIES times with full-jitter exponential backoff, as long as the retry
+# still fits in EMBEDDINGS_DEADLINE (kept under the embeddings stage timeout). Other
+# responses are not retried. embed() raises EmbeddingsError when it gets no vector. With
+# EMBEDDINGS_HEDGE=1, an attempt still running after the EMBEDDINGS_HEDGE_PERCENTILE latency
+# of recent calls gets a second, identical request and the first good answer wins (the API
+# is idempotent). stats() reports counts and latency percentiles over the last
+# EMBEDDINGS_LATENCY_WINDOW calls.
+#################################
+
+EMBEDDINGS_API = os.environ["EMBEDDINGS_API"]
+EMBEDDINGS_API_KEY = os.environ["EMBEDDINGS_API_KEY"]
+
+EMBEDDINGS_CONNECT_TIMEOUT = float(os.environ.get("EMBEDDINGS_CONNECT_TIMEOUT", "2"))
+EMBEDDINGS_READ_TIMEOUT = float(os.environ.get("EMBEDDINGS_READ_TIMEOUT", "8"))
+EMBEDDINGS_DEADLINE = float(os.environ.get("EMBEDDINGS_DEADLINE", "15"))
+EMBEDDINGS_MAX_RETRIES = int(os.environ.get("EMBEDDINGS_MAX_RETRIES", "2"))
+EMBEDDINGS_BACKOFF_BASE = float(os.environ.get("EMBEDDINGS_BACKOFF_BASE", "0.1"))
+EMBEDDINGS_BACKOFF_MAX = float(os.environ.get("EMBEDDINGS_BACKOFF_MAX", "2"))
+EMBEDDINGS_POOL_MAXSIZE = int(os.environ.get("EMBEDDINGS_POOL_MAXSIZE", os.environ.get("STAGE_MAX_WORKERS", "8")))
+
+EMBEDDINGS_HEDGE = os.environ.get("EMBEDDINGS_HEDGE", "0") == "1"
+EMBEDDINGS_HEDGE_PERCENTILE = float(os.environ.get("EMBEDDINGS_HEDGE_PERCENTILE", "95"))
+EMBEDDINGS_HEDGE_MIN_DELAY = float(os.environ.get("EMBEDDINGS_HEDGE_MIN_DELAY", "0.05"))
+# below this many samples the percentile means nothing, so no hedging yet
+EMBEDDINGS_HEDGE_MIN_SAMPLES = int(os.environ.get("EMBEDDINGS_HEDGE_MIN_SAMPLES", "20"))
+EMBEDDINGS_LATENCY_WINDOW = int(os.environ.get("EMBEDDINGS_LATENCY_WINDOW", "200"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class EmbeddingsError(Exception):
+    pass
+
+
+class RetryableResponse(EmbeddingsError):
+    def __init__(self, status_code):
+        super().__init__(f"Embeddings API answered {status_code}")
+        self.status_code = status_code
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class EmbeddingsClient:
+    def __init__(self, url=EMBEDDINGS_API, api_key=EMBEDDINGS_API_KEY):
+        self.url = url
+        self.session = requests.Session()
+        # retries are ours (with backoff and a deadline), not urllib3's
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=EMBEDDINGS_POOL_MAXSIZE, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'x-api-key': api_key,
+            'Content-Type': 'application/json',
+        })
+        self._latencies = deque(maxlen=EMBEDDINGS_LATENCY_WINDOW)
+        self._hedge_executor = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "attempts": 0, "retries": 0, "errors": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _attempt(self, statement, remaining):
+        # one HTTP call: the vector, EmbeddingsError for a final non-200, RetryableResponse to retry
+        self._count("attempts")
+        started = time.perf_counter()
+        response = self.session.post(
+            self.url,
+            json={'inputText': statement},
+            timeout=(EMBEDDINGS_CONNECT_TIMEOUT, max(min(EMBEDDINGS_READ_TIMEOUT, remaining), 0.001))
+        )
+        if response.status_code == 200:
+            vector_embedding = response.json()
+            self._latencies.append((time.perf_counter() - started) * 1000)
+            log.debug("Embeddings response", status=response.status_code, vector=vector_embedding)
+            return vector_embedding
+        if response.status_code in RETRY_STATUS:
+            raise RetryableResponse(response.status_code)
+        log.warning("Embeddings request failed", status=response.status_code, body=response.text)
+        raise EmbeddingsError(f"Embeddings API answered {response.status_code}")
+
+    def hedge_delay(self):
+        if not EMBEDDINGS_HEDGE or len(self._latencies) < EMBEDDINGS_HEDGE_MIN_SAMPLES:
+            return None
+        return max(percentile(list(self._latencies), EMBEDDINGS_HEDGE_PERCENTILE) / 1000, EMBEDDINGS_HEDGE_MIN_DELAY)
+
+    def _hedged_attempt(self, statement, delay, remaining):
+        # its own pool: the caller is usually already a stage worker of concurrency.py
+        if self._hedge_executor is None:
+            with self._lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(max_workers=EMBEDDINGS_POOL_MAXSIZE, thread_name_prefix="hedge")
+        primary = self._hedge_executor.submit(self._attempt, statement, remaining)
+        done, pending = wait([primary], timeout=min(delay, remaining))
+        if done:
+            return primary.result()
+
+        self._count("hedges")
+        hedge = self._hedge_executor.submit(self._attempt, statement, remaining - delay)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    self._count("hedge_wins")
+                # the slower request finishes in the background; its answer is dropped
+                return result
+        raise error
+
+    def embed(self, statement):
+        self._count("requests")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = EMBEDDINGS_DEADLINE - (time.monotonic() - started)
+            try:
+                delay = self.hedge_delay()
+                if delay is not None and delay < remaining:
+                    return self._hedged_attempt(statement, delay, remaining)
+                return self._attempt(statement, remaining)
+            except (requests.ConnectionError, requests.Timeout, RetryableResponse) as e:
+                if isinstance(e, requests.Timeout):
+                    self._count("timeouts")
+                backoff = random.uniform(0, min(EMBEDDINGS_BACKOFF_MAX, EMBEDDINGS_BACKOFF_BASE * 2 ** attempt))
+                elapsed = time.monotonic() - started
+                if attempt >= EMBEDDINGS_MAX_RETRIES or elapsed + backoff + EMBEDDINGS_CONNECT_TIMEOUT >= EMBEDDINGS_DEADLINE:
+                    self._count("errors")
+                    log.warning("Embeddings request failed", error=repr(e), attempts=attempt + 1)
+                    raise EmbeddingsError(f"Embeddings API unavailable after {attempt + 1} attempts: {e}") from e
+                attempt += 1
+                self._count("retries")
+                log.debug("Retrying embeddings request", error=repr(e), attempt=attempt, backoff=round(backoff, 3))
+                time.sleep(backoff)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        latencies = list(self._latencies)
+        for q in (50, 95, 99):
+            value = percentile(latencies, q)
+            stats[f"p{q}_ms"] = round(value, 1) if value is not None else None
+        return stats
+
+
+_client = None
+
+
+def get_embeddings_client():
+    global _client
+    if _client is None:
+        _client = EmbeddingsClient()
+    return _client
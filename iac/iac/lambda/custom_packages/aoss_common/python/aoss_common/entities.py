@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+from aoss_common import log
+from aoss_common.cache import ByteLRU, content_key, normalize_statement, store_from_env
+from aoss_common.session import aws_client
+
+#################################
+# Comprehend Medical entity extraction with a cache
+#
+# Only the thresholded output (meta dict + topics list) is cached, serialized as JSON so
+# callers always get fresh objects. Entries expire after ENTITIES_CACHE_TTL seconds in both
+# the in-process LRU and the optional persistent store shared with the embeddings cache.
+#################################
+
+THRESHOLD = .75
+ENTITIES_CACHE_TTL = int(os.environ.get("ENTITIES_CACHE_TTL", str(24 * 60 * 60)))
+ENTITIES_CACHE_MAX_BYTES = int(os.environ.get("ENTITIES_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# built on first use or by the init warmup (warmup.py); the benchmarks assign a stand-in
+comprehend_client = None
+
+_memory = ByteLRU(ENTITIES_CACHE_MAX_BYTES, sizeof=len, ttl=ENTITIES_CACHE_TTL)
+_store = store_from_env("entities")
+_store_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def entities_key(statement):
+    return content_key("comprehendmedical", str(THRESHOLD), normalize_statement(statement))
+
+
+def get_comprehend_client():
+    global comprehend_client
+    if comprehend_client is None:
+        comprehend_client = aws_client('comprehendmedical')
+    return comprehend_client
+
+
+def detect_entities(statement):
+    meta = {}
+    topics = set()
+    result = get_comprehend_client().detect_entities_v2(Text=statement)
+    log.debug("Comprehend Medical result", entities=lambda: result['Entities'])
+    
+    for entity in result['Entities']:
+        if entity["Score"] > THRESHOLD:
+            topics.add(entity["Category"].replace('_', ' ').lower())
+            entity["Category"] = entity["Category"].lower()
+            metanew = ''.join(e for e in entity["Category"] if e.isalnum())
+            if metanew not in meta.keys():
+                meta[metanew] = []
+            meta[metanew].append(entity["Text"].lower())
+
+    return meta, list(topics)
+
+
+def _load(key):
+    if _store is None:
+        return None
+    try:
+        data = _store.get(key)
+    except Exception as e:
+        _store_stats["errors"] += 1
+        log.warning("Entities store read failed", error=str(e))
+        return None
+    if data is None or json.loads(data)["expires"] <= time.time():
+        _store_stats["misses"] += 1
+        return None
+    _store_stats["hits"] += 1
+    return data.decode("utf-8")
+
+
+def _save(key, payload):
+    if _store is None:
+        return
+    try:
+        _store.put(key, payload.encode("utf-8"))
+    except Exception as e:
+        _store_stats["errors"] += 1
+        log.warning("Entities store write failed", error=str(e))
+
+
+def generate_statement_metadata(statement):
+    key = entities_key(statement)
+    payload = _memory.get(key)
+    if payload is None:
+        payload = _load(key)
+        if payload is None:
+            meta, topics = detect_entities(statement)
+            payload = json.dumps({"meta": meta, "topics": topics, "expires": time.time() + ENTITIES_CACHE_TTL})
+            _save(key, payload)
+        _memory.put(key, payload, expires_at=json.loads(payload)["expires"])
+
+    cached = json.loads(payload)
+    return cached["meta"], cached["topics"]
+
+
+def set_store(store):
+    # any object with get(key) -> bytes|None and put(key, bytes), or None to disable
+    global _store
+    _store = store
+
+
+def entities_cache_stats():
+    return {"memory": _memory.stats(), "store": dict(_store_stats)}
@@ -0,0 +1,48 @@
+import hashlib
+import unicodedata
+
+from aoss_common.backend import get_backend
+from aoss_common.client import AOSS_INDEX_NAME
+
+#################################
+# Exact-duplicate fast path
+#
+# Every statement document carries statement-hash, a sha256 of the canonical statement
+# (NFKC, casefolded, unicode punctuation dropped, whitespace collapsed). A term lookup on it
+# answers "was this exact statement ingested already?" before any Comprehend, embeddings or
+# kNN work. Documents written before the field existed simply never match here and still go
+# through the kNN exact-match check.
+#################################
+
+HASH_FIELD = "statement-hash"
+HASH_PROPERTIES = {HASH_FIELD: {"type": "keyword"}}
+
+
+def canonical_statement(statement):
+    text = unicodedata.normalize("NFKC", statement).casefold()
+    # every unicode punctuation category (Pc, Pd, Ps, Pe, Pi, Pf, Po), not just string.punctuation
+    text = "".join(" " if unicodedata.category(char).startswith("P") else char for char in text)
+    return " ".join(text.split())
+
+
+def statement_hash(statement):
+    return hashlib.sha256(canonical_statement(statement).encode("utf-8")).hexdigest()
+
+
+def find_exact(hashes, index_name=AOSS_INDEX_NAME):
+    # {hash: doc id} for the hashes already in the index, one term query per hash in one
+    # msearch so that many copies of one statement can't crowd out the others
+    hashes = list(dict.fromkeys(hashes))
+    if not hashes:
+        return {}
+    body = []
+    for key in hashes:
+        body.append({"index": index_name})
+        body.append({"size": 1, "query": {"term": {HASH_FIELD: key}}, "_source": False})
+    found = {}
+    for key, response in zip(hashes, get_backend().msearch(body = body)['responses']):
+        if 'error' in response:
+            raise ValueError(f"Exact lookup failed: {response['error']}")
+        if response['hits']['hits']:
+            found[key] = response['hits']['hits'][0]['_id']
+    return found
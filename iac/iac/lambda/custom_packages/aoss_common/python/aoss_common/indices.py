@@ -0,0 +1,117 @@
+import time
+
+from opensearchpy.exceptions import NotFoundError
+
+from aoss_common import log
+from aoss_common.backend import get_backend
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.exact import HASH_PROPERTIES
+from aoss_common.vectors import vector_properties, VECTOR_FIELD, FULL_VECTOR_FIELD, VECTOR_PROFILE
+
+#################################
+# Index existence and provisioning
+#
+# Request handlers only ever ask "does the index exist?" through index_check(), which is
+# memoized per container and invalidated when an operation fails with index_not_found.
+# Creating the index (and waiting for it) is done by the bootstrap function at deploy
+# time, never on the request path.
+#################################
+
+def statements_mapping(profile=VECTOR_PROFILE):
+    return {
+        "settings": {
+            "index.knn": True
+        },
+        "mappings": {
+            "properties": {
+                **vector_properties(profile),
+                **HASH_PROPERTIES,
+                "statement": {
+                    "type": "text"
+                },
+                "statement-similar": {
+                    "type": "object"
+                }
+            }
+        }
+    }
+
+_existing = set()
+_engines = {}
+
+
+def source_filter(fields=None, vectors=False):
+    # never ship the 1536-float vectors back from a search unless asked to (rescoring,
+    # migration); fields optionally projects _source
+    vector_fields = [VECTOR_FIELD, FULL_VECTOR_FIELD]
+    source = {} if vectors else {"excludes": vector_fields}
+    if fields:
+        source["includes"] = [field for field in fields if field not in vector_fields]
+        if vectors:
+            source["includes"] += vector_fields
+    return source or True
+
+
+def index_check(index_name=AOSS_INDEX_NAME, timeout=None):
+    if index_name in _existing:
+        return True
+
+    response = get_backend().index_exists(index_name, timeout=timeout)
+    log.info("Checked index", index=index_name, exists=response)
+    if response:
+        _existing.add(index_name)
+    return response
+
+
+def invalidate_index(index_name=AOSS_INDEX_NAME):
+    _existing.discard(index_name)
+    _engines.pop(index_name, None)
+
+
+def index_missing(error):
+    return isinstance(error, NotFoundError) and error.error == 'index_not_found_exception'
+
+
+def vector_engine(index_name=AOSS_INDEX_NAME):
+    # engine of the live index mapping, looked up once per container
+    if index_name not in _engines:
+        try:
+            mapping = get_backend().get_mapping(index_name)
+            properties = next(iter(mapping.values()))["mappings"]["properties"]
+            _engines[index_name] = properties[VECTOR_FIELD].get("method", {}).get("engine", "nmslib")
+        except Exception as e:
+            log.warning("Could not read the index mapping, assuming nmslib", index=index_name, error=str(e))
+            return "nmslib"
+    return _engines[index_name]
+
+
+def index_create(index_name=AOSS_INDEX_NAME, body=None):
+    response = get_backend().create_index(index_name, body or statements_mapping())
+    log.info("Created index", index=index_name, response=response)
+    return response
+
+
+def ensure_index(index_name=AOSS_INDEX_NAME, body=None, wait_checks=10, wait_seconds=5):
+    invalidate_index(index_name)
+    if index_check(index_name):
+        return False
+
+    index_create(index_name, body)
+    # Poll and wait for the index to be created
+    for _ in range(wait_checks):
+        if index_check(index_name):
+            return True
+        log.info("Index not created yet, waiting", index=index_name)
+        time.sleep(wait_seconds)
+    raise ValueError("AOSS Index Creation error. Waited to long. Breaking loop.")
+
+
+def ensure_fields(index_name, properties):
+    # adds fields introduced after the index was created; existing fields are left alone
+    try:
+        response = get_backend().put_mapping(index_name, properties)
+        log.info("Updated index mapping", index=index_name, response=response)
+        return True
+    except Exception as e:
+        log.warning("Could not update the index mapping", index=index_name, fields=list(properties), error=str(e))
+        return False
@@ -0,0 +1,328 @@
+import os
+import string
+
+from aoss_common import log
+from aoss_common.backend import get_backend, bulk_write, matches
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.concurrency import map_concurrently
+from aoss_common.consistency import expect_document
+from aoss_common.embeddings import generate_embeddings
+from aoss_common.entities import generate_statement_metadata
+from aoss_common.exact import find_exact, statement_hash, HASH_FIELD
+from aoss_common.knn import knn_search, knn_msearch, KNN_K
+from aoss_common.nearcache import record_write
+from aoss_common.similar import get_similar_store, similar_link
+from aoss_common.singleflight import claim_owner, acquire_claims, complete_claim, release_claim, await_claims
+from aoss_common.vectors import document_vectors, full_vector, is_exact_score, cosine, cosine_score
+
+#################################
+# Ingest pipeline pieces shared by POST /aoss/ingest and POST /aoss/ingest/batch
+#################################
+
+SIMILAR_THRESHOLD = 0.8
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "100"))
+BATCH_STAGE_TIMEOUT = float(os.environ.get("BATCH_STAGE_TIMEOUT", "25"))
+
+
+def strip_punctuation(sentence):
+    # Create a translation table to remove punctuation
+    translator = str.maketrans('', '', string.punctuation)
+
+    # Use translate to remove punctuation from the sentence
+    stripped_sentence = sentence.translate(translator)
+
+    return stripped_sentence
+
+
+def parse_statement(field_values):
+    return {
+        "statement": strip_punctuation(field_values["statement"].lower()),
+        "intent": field_values["intent"].lower(),
+        "severity": field_values["severity"].lower(),
+        "source": field_values["source"].lower()
+    }
+
+
+def generate_statement_background(statement, intent, severity, source, topics):
+    back = {
+        "intent": intent,
+        "severity": severity,
+        "source": source,
+        "topic": topics
+    } 
+
+    return back
+
+
+def statement_document(statement, embeddings, metadata, backdata):
+    return {
+        'statement': statement,
+        HASH_FIELD: statement_hash(statement),
+        **document_vectors(embeddings),
+        'metadata': metadata,
+        'background': backdata
+    }
+
+
+def create_filters(metadata):
+    filter_list = []
+    for key,values in metadata.items():
+        for filter_item in values:
+            query = {
+                "query_string": {
+                    "query": filter_item,
+                    "fields": [
+                        "metadata." + key
+                    ]
+                }
+            }
+            filter_list.append(query)
+    return filter_list
+
+
+def filter_clause(filter_list):
+    # at least one metadata clause has to match; no metadata means no filter at all
+    return {"bool": {"should": filter_list}} if filter_list else None
+
+
+def search_aoss(embeddings,filter_list):
+    return knn_search(embeddings, filter_clause(filter_list))
+
+
+def msearch_aoss(queries):
+    # one round trip for many kNN lookups; responses come back in request order
+    return knn_msearch([(embeddings, filter_clause(filter_list)) for embeddings, filter_list in queries])
+
+
+def ingest_document(document,doc_id=None):
+    client = get_backend()
+    response = None
+    if( doc_id is None ):
+        response = client.index(
+            index = AOSS_INDEX_NAME,
+            body = document
+        )
+        record_write(full_vector(document))
+    else:
+         log.debug("Updating document", id=doc_id)
+         
+         response = client.update(
+            index = AOSS_INDEX_NAME,
+            body = document,
+            id=doc_id
+        )
+                
+    return response
+
+
+def map_statement(statement_document,statement_metadata,statement_backdata,matches):
+    # Near-duplicate parents get one appended link record each (see similar.py), written
+    # together in a single request; failed items are reported without losing the others.
+    # Returns (created | mapped | exact, write expectations).
+    links = []
+    status, doc_ids = plan_statement(statement_document, matches, links)
+
+    if status == "exact":
+        log.info("Exact match, bypassing")
+        return status, []
+
+    # no matches met threshold, create a new one
+    if status == "created":
+        log.info("No threshold matches, creating a new document")
+        response = ingest_document(statement_document)
+        return status, [expect_document(response.get("_id"))]
+
+    log.info("Linking similar statement", parents=len(doc_ids))
+    outcomes, writes = get_similar_store().append(links)
+
+    failed = {link["parent-id"]: outcome["error"] for link, outcome in zip(links, outcomes) if not outcome["ok"]}
+    if failed:
+        log.warning("Similar statement links failed", failed=failed)
+        if len(failed) == len(links):
+            raise ValueError(f"All similar statement links failed: {failed}")
+    return status, writes
+
+
+def batch_matches(document, embeddings, creates):
+    # what the kNN lookup would return from the batch's earlier creates (same metadata
+    # filter, top KNN_K), with their batch positions as ids
+    clause = filter_clause(create_filters(document["metadata"]))
+    scored = [
+        {"_id": position, "_score": cosine_score(cosine(embeddings, earlier_embeddings))}
+        for position, earlier, earlier_embeddings in creates if matches(None, earlier, clause)
+    ]
+    scored.sort(key=lambda hit: hit["_score"], reverse=True)
+    return scored[:KNN_K]
+
+
+def plan_statement(document, matches, links):
+    # Same decisions as the original map_statement, but collects the similar-statement links
+    # to append (into `links`) instead of writing them.
+    statement = document["statement"]
+
+    mapped = []
+    exact = False
+    for result in matches:
+        if is_exact_score(result['_score']):
+            exact = True
+        elif SIMILAR_THRESHOLD <= result['_score']:
+            doc_id = result["_id"]
+            links.append(similar_link(doc_id, statement, document["metadata"], document["background"]))
+            mapped.append(doc_id)
+
+    if mapped:
+        return "mapped", mapped
+    if exact:
+        return "exact", []
+    return "created", []
+
+
+def ingest_batch(raw_items):
+    # Batched version of the single ingest: entity extraction and embeddings for all items
+    # on the thread pool, one msearch for the kNN lookups and _bulk for the writes.
+    # Returns (per-item results in request order, write expectations for wait_for_writes).
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        raise ValueError(f"Batch of {len(raw_items)} statements exceeds the limit of {BATCH_MAX_ITEMS}")
+
+    results = []
+    pending = []
+    seen = {}
+    for position, field_values in enumerate(raw_items):
+        try:
+            item = parse_statement(field_values)
+        except (KeyError, AttributeError, TypeError) as e:
+            results.append({"status": "error", "error": f"Invalid statement: {e!r}"})
+            continue
+        statement = item["statement"]
+        key = statement_hash(statement)
+        if key in seen:
+            results.append({"statement": statement, "status": "duplicate", "duplicate_of": seen[key]})
+            continue
+        seen[key] = position
+        results.append({"statement": statement, "status": None})
+        pending.append((position, item))
+
+    # statements already in the index skip every stage below
+    existing = find_exact(seen)
+    for key, doc_id in existing.items():
+        results[seen[key]].update(status="exact", id=doc_id)
+    pending = [(position, item) for position, item in pending if results[position]["status"] is None]
+
+    # statements another request is ingesting right now are left to it (see singleflight.py)
+    keys = {position: statement_hash(item["statement"]) for position, item in pending}
+    owner = claim_owner()
+    claims = acquire_claims(keys.values(), owner)
+    coalesced = [position for position, _ in pending if claims[keys[position]] is not None]
+    pending = [(position, item) for position, item in pending if claims[keys[position]] is None]
+
+    try:
+        writes = ingest_pending(pending, results)
+    except BaseException:
+        map_concurrently(lambda position: release_claim(keys[position], owner), [position for position, _ in pending])
+        raise
+
+    # hand our outcomes to whoever waits on them, then pick up the ones ingested elsewhere
+    def settle(position):
+        result = results[position]
+        if result["status"] == "error":
+            release_claim(keys[position], owner)
+        else:
+            outcome = {key: result[key] for key in ("status", "id", "mapped_to") if key in result}
+            complete_claim(keys[position], owner, dict(outcome, writes=[[result["id"], AOSS_INDEX_NAME]] if "id" in result else []))
+    map_concurrently(settle, [position for position, _ in pending])
+
+    shared = await_claims([keys[position] for position in coalesced])
+    for position in coalesced:
+        outcome = shared[keys[position]]
+        if outcome is None:
+            results[position].update(status="error", error="Statement is being ingested by another request")
+            continue
+        results[position].update({key: value for key, value in outcome.items() if key != "writes"}, shared=True)
+        writes += [expect_document(doc_id, index_name=index_name) for doc_id, index_name in outcome["writes"]]
+
+    return results, writes
+
+
+def ingest_pending(pending, results):
+    # enrichment, kNN lookups and writes for the (position, parsed item) pairs; fills in
+    # results[position] and returns the write expectations
+
+    # entity extraction + embeddings, every call in parallel
+    statements = [item["statement"] for _, item in pending]
+    stages = map_concurrently(
+        lambda task: task[0](task[1]),
+        [(generate_statement_metadata, s) for s in statements] + [(generate_embeddings, s) for s in statements],
+        timeout=BATCH_STAGE_TIMEOUT
+    )
+    metadata_results, embedding_results = stages[:len(statements)], stages[len(statements):]
+
+    ready = []
+    for (position, item), meta, embeddings in zip(pending, metadata_results, embedding_results):
+        if isinstance(meta, Exception) or isinstance(embeddings, Exception):
+            error = meta if isinstance(meta, Exception) else embeddings
+            results[position].update(status="error", error=str(error))
+            continue
+        metadata, topics = meta
+        backdata = generate_statement_background(item["statement"], item["intent"], item["severity"], item["source"], topics)
+        document = statement_document(item["statement"], embeddings, metadata, backdata)
+        ready.append((position, document, embeddings))
+
+    # kNN lookups in one msearch
+    responses = msearch_aoss([
+        (embeddings, create_filters(document["metadata"])) for _, document, embeddings in ready
+    ]) if ready else []
+
+    creates = []
+    links = []
+    link_positions = []
+    # links to statements created earlier in this batch, (position, link) with the parent's
+    # batch position as parent-id until the _bulk below gives it an id
+    batch_links = []
+    for (position, document, embeddings), response in zip(ready, responses):
+        if 'error' in response:
+            results[position].update(status="error", error=str(response['error']))
+            continue
+        matches = response['hits']['hits'] if response['hits']['max_score'] is not None else []
+        linked = len(links)
+        status, doc_ids = plan_statement(document, matches, links)
+        link_positions += [position] * (len(links) - linked)
+        if status == "created":
+            # one request at a time, the earlier creates would already be in the index
+            in_batch = []
+            status, _ = plan_statement(document, batch_matches(document, embeddings, creates), in_batch)
+            batch_links += [(position, link) for link in in_batch]
+        results[position].update(status=status)
+        if status == "created":
+            creates.append((position, document, embeddings))
+        if doc_ids:
+            results[position]["mapped_to"] = doc_ids
+
+    # new documents in one _bulk, similar-statement links appended in one more
+    outcomes = bulk_write([("index", None, None, document) for _, document, _ in creates])
+
+    writes = []
+    for (position, document, _), outcome in zip(creates, outcomes):
+        if outcome["ok"]:
+            record_write(full_vector(document))
+            results[position]["id"] = outcome["id"]
+            writes.append(expect_document(outcome["id"]))
+        else:
+            results[position].update(status="error", error=str(outcome["error"]))
+
+    for position, link in batch_links:
+        parent_id = results[link["parent-id"]].get("id")
+        if parent_id is None:
+            results[position].update(status="error", error="Near-duplicate of a statement in this batch that failed")
+            continue
+        links.append(dict(link, **{"parent-id": parent_id}))
+        link_positions.append(position)
+        results[position].setdefault("mapped_to", []).append(parent_id)
+
+    if links:
+        link_outcomes, link_writes = get_similar_store().append(links)
+        writes += link_writes
+        for position, outcome in zip(link_positions, link_outcomes):
+            if not outcome["ok"]:
+                results[position].update(status="error", error=str(outcome["error"]))
+
+    return writes
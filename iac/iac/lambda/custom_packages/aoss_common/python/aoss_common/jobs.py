@@ -0,0 +1,162 @@
+import collections
+import json
+import os
+import threading
+import time
+import uuid
+
+from aoss_common import log
+from aoss_common.consistency import wait_for_writes
+from aoss_common.ingest import ingest_batch
+from aoss_common.jobstore import job_record, get_job_store
+from aoss_common.metrics import stage
+from aoss_common.searchcache import bump_generation
+from aoss_common.session import aws_client
+
+#################################
+# Queued ingest
+#
+# With INGEST_MODE=async, POST /aoss/ingest validates the statement, records a job and puts
+# it on the ingest queue, then answers 202 with the job id. The ingest worker takes the
+# queue in micro-batches and runs them through ingest_batch (parallel enrichment, one
+# msearch, _bulk writes), then records each job's outcome, which GET /aoss/ingest/jobs/{id}
+# returns. A job is queued -> done (with the ingest status: created | mapped | exact |
+# duplicate) or failed; an item that errors is retried (status retrying) until
+# INGEST_MAX_ATTEMPTS. If a whole batch fails (index missing, AOSS down) the worker raises
+# and the queue redelivers it.
+#   INGEST_QUEUE=sqs (default, INGEST_QUEUE_URL) | local   -> in-process queue
+#   JOBS_STORE=dynamodb (default, JOBS_TABLE)   | local   -> in-process job store (jobstore.py)
+# The local pair plus drain_local_queue() runs the whole flow in one process.
+#################################
+
+INGEST_MODE = os.environ.get("INGEST_MODE", "sync")  # sync | async
+INGEST_QUEUE = os.environ.get("INGEST_QUEUE", "sqs")
+INGEST_QUEUE_URL = os.environ.get("INGEST_QUEUE_URL", "")
+INGEST_MAX_ATTEMPTS = int(os.environ.get("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_WORKER_BATCH = int(os.environ.get("INGEST_WORKER_BATCH", "25"))
+
+
+# queues: send(bodies)
+class SqsQueue:
+    def __init__(self, url):
+        self.url = url
+
+    def send(self, bodies):
+        for start in range(0, len(bodies), 10):
+            entries = [{"Id": str(i), "MessageBody": json.dumps(body)} for i, body in enumerate(bodies[start:start + 10])]
+            response = aws_client("sqs").send_message_batch(QueueUrl=self.url, Entries=entries)
+            if response.get("Failed"):
+                raise RuntimeError(f"{len(response['Failed'])} ingest messages not queued: {response['Failed'][0].get('Message')}")
+
+
+class LocalQueue:
+    # stand-in for SQS in local runs: receive() hands out up to n messages, failed ones are
+    # put back with their attempt count raised
+    def __init__(self):
+        self.messages = collections.deque()
+        self._lock = threading.Lock()
+
+    def send(self, bodies):
+        with self._lock:
+            for body in bodies:
+                self.messages.append({"message_id": uuid.uuid4().hex, "body": json.loads(json.dumps(body)), "attempt": 1})
+
+    def receive(self, max_messages):
+        with self._lock:
+            return [self.messages.popleft() for _ in range(min(max_messages, len(self.messages)))]
+
+    def retry(self, messages):
+        with self._lock:
+            for message in messages:
+                self.messages.append({**message, "attempt": message["attempt"] + 1})
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        if INGEST_QUEUE == "local":
+            _queue = LocalQueue()
+        elif INGEST_QUEUE == "sqs":
+            if not INGEST_QUEUE_URL:
+                raise ValueError("INGEST_QUEUE_URL is not set")
+            _queue = SqsQueue(INGEST_QUEUE_URL)
+        else:
+            raise ValueError(f"Unknown INGEST_QUEUE '{INGEST_QUEUE}', expected sqs or local")
+    return _queue
+
+
+def enqueue_ingest(items):
+    # items: raw request bodies (statement, intent, severity, source); returns the job ids
+    created = time.time()
+    jobs = [(uuid.uuid4().hex, item) for item in items]
+    # the job is recorded first so a status call right after the 202 never 404s
+    get_job_store().put([job_record(job_id, "queued", created, attempts=0) for job_id, _ in jobs])
+    get_queue().send([{"job_id": job_id, "created": created, "item": item} for job_id, item in jobs])
+    return [job_id for job_id, _ in jobs]
+
+
+def process_messages(messages):
+    # messages: [{"message_id", "body": {"job_id", "created", "item"}, "attempt"}]
+    # Returns the message ids to redeliver.
+    with stage("Batch"):
+        results, writes = ingest_batch([message["body"]["item"] for message in messages])
+    # done means searchable, so a client that polls the job can search for it straight away
+    with stage("Wait"):
+        visible = wait_for_writes(writes)
+    if writes:
+        bump_generation(visible=visible)
+
+    records = []
+    retry = []
+    for message, result in zip(messages, results):
+        body = message["body"]
+        detail = {key: value for key, value in result.items() if key not in ("status", "statement", "duplicate_of")}
+        status = result["status"]
+        if status == "duplicate":
+            # a repeat within the batch shares the fate of the statement it repeats
+            original = results[result["duplicate_of"]]
+            detail.update(duplicate_of=messages[result["duplicate_of"]]["body"]["job_id"])
+            if original["status"] == "error":
+                status = "error"
+                detail.update(error=original.get("error"))
+            else:
+                detail.update(id=original.get("id"))
+        if status == "error":
+            if message["attempt"] < INGEST_MAX_ATTEMPTS:
+                retry.append(message["message_id"])
+                records.append(job_record(body["job_id"], "retrying", body["created"], attempts=message["attempt"], **detail))
+            else:
+                records.append(job_record(body["job_id"], "failed", body["created"], attempts=message["attempt"], **detail))
+            continue
+        records.append(job_record(body["job_id"], "done", body["created"], attempts=message["attempt"], outcome=status, **detail))
+
+    with stage("Jobs"):
+        get_job_store().put(records)
+    summary = collections.Counter(record["status"] for record in records)
+    log.info("Ingest jobs processed", jobs=len(messages), summary=dict(summary))
+    return retry
+
+
+def sqs_messages(event):
+    # SQS event records -> process_messages() input
+    return [{
+        "message_id": record["messageId"],
+        "body": json.loads(record["body"]),
+        "attempt": int(record.get("attributes", {}).get("ApproximateReceiveCount", "1"))
+    } for record in event["Records"]]
+
+
+def drain_local_queue(batch_size=INGEST_WORKER_BATCH):
+    # runs the worker over the local queue until it is empty; returns the batches processed
+    queue = get_queue()
+    batches = 0
+    while True:
+        messages = queue.receive(batch_size)
+        if not messages:
+            return batches
+        retry = set(process_messages(messages))
+        queue.retry([message for message in messages if message["message_id"] in retry])
+        batches += 1
@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+
+from aoss_common.session import aws_client
+
+#################################
+# Ingest job records (see jobs.py)
+#
+# Kept apart from jobs.py so the job status function only loads boto3, without the
+# AOSS client, embeddings and the rest of the ingest pipeline.
+#   JOBS_STORE=dynamodb (default, JOBS_TABLE) | local -> in-process job store
+#################################
+
+JOBS_STORE = os.environ.get("JOBS_STORE", "dynamodb")
+JOBS_TABLE = os.environ.get("JOBS_TABLE", "")
+JOBS_TTL = int(os.environ.get("JOBS_TTL", str(7 * 24 * 60 * 60)))
+
+
+def job_record(job_id, status, created, **detail):
+    now = time.time()
+    return {"job_id": job_id, "status": status, "created": created, "updated": now, **detail}
+
+
+# job stores: put(records) / get(job_id)
+class DynamoJobStore:
+    # one item per job: job_id (hash key), status, timestamps, the rest as JSON; expires_at
+    # is the table's TTL attribute
+    def __init__(self, table):
+        self.table = table
+
+    def _item(self, record):
+        detail = {key: value for key, value in record.items() if key not in ("job_id", "status", "created", "updated")}
+        return {
+            "job_id": {"S": record["job_id"]},
+            "status": {"S": record["status"]},
+            "created": {"N": repr(record["created"])},
+            "updated": {"N": repr(record["updated"])},
+            "detail": {"S": json.dumps(detail)},
+            "expires_at": {"N": str(int(record["created"] + JOBS_TTL))}
+        }
+
+    def put(self, records):
+        puts = [{"PutRequest": {"Item": self._item(record)}} for record in records]
+        for start in range(0, len(puts), 25):
+            batch = {self.table: puts[start:start + 25]}
+            # unprocessed items come back when the table throttles; resend them
+            for attempt in range(5):
+                response = aws_client("dynamodb").batch_write_item(RequestItems=batch)
+                batch = response.get("UnprocessedItems") or {}
+                if not batch:
+                    break
+                time.sleep(0.05 * 2 ** attempt)
+            if batch:
+                raise RuntimeError(f"{len(batch[self.table])} job records not written")
+
+    def get(self, job_id):
+        item = aws_client("dynamodb").get_item(TableName=self.table, Key={"job_id": {"S": job_id}}, ConsistentRead=True).get("Item")
+        if item is None:
+            return None
+        return {
+            "job_id": item["job_id"]["S"],
+            "status": item["status"]["S"],
+            "created": float(item["created"]["N"]),
+            "updated": float(item["updated"]["N"]),
+            **json.loads(item["detail"]["S"])
+        }
+
+
+class LocalJobStore:
+    def __init__(self):
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def put(self, records):
+        with self._lock:
+            for record in records:
+                self.jobs[record["job_id"]] = json.loads(json.dumps(record))
+
+    def get(self, job_id):
+        with self._lock:
+            record = self.jobs.get(job_id)
+            return json.loads(json.dumps(record)) if record is not None else None
+
+
+_store = None
+
+
+def get_job_store():
+    global _store
+    if _store is None:
+        if JOBS_STORE == "local":
+            _store = LocalJobStore()
+        elif JOBS_STORE == "dynamodb":
+            if not JOBS_TABLE:
+                raise ValueError("JOBS_TABLE is not set")
+            _store = DynamoJobStore(JOBS_TABLE)
+        else:
+            raise ValueError(f"Unknown JOBS_STORE '{JOBS_STORE}', expected dynamodb or local")
+    return _store
+
+
+def get_job(job_id):
+    return get_job_store().get(job_id)
@@ -0,0 +1,159 @@
+import os
+
+from aoss_common import log
+from aoss_common.backend import get_backend
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.indices import source_filter, vector_engine
+from aoss_common.nearcache import get_near_cache, query_key
+from aoss_common.vectors import query_vector, rescore, VECTOR_FIELD, RESCORE, RESCORE_OVERSAMPLE
+
+#################################
+# Filtered kNN
+#
+# post_filter on a k=5 kNN query drops neighbours after the fact, so a restrictive filter
+# often leaves nothing. Where the index engine supports it (faiss/lucene) the filter is
+# pushed into the kNN clause instead ("efficient filtering"), which returns the top k among
+# the matching documents, so a larger k can't find more. With post_filter, when fewer than k
+# hits come back the query is retried with a larger k (KNN_OVERFETCH x per round, up to
+# KNN_K_MAX). A filter made only of empty bool clauses counts as no filter.
+#   KNN_FILTER_MODE=auto (default) | efficient | post
+# With KNN_RESCORE=1 (for quantized profiles, see vectors.py) each query fetches
+# KNN_RESCORE_OVERSAMPLE x the candidates and re-ranks them on full-precision vectors.
+# Both entry points check the in-process near-duplicate cache (nearcache.py) first.
+#################################
+
+KNN_K = int(os.environ.get("KNN_K", "5"))
+KNN_K_MAX = int(os.environ.get("KNN_K_MAX", "320"))
+KNN_OVERFETCH = int(os.environ.get("KNN_OVERFETCH", "4"))
+KNN_FILTER_MODE = os.environ.get("KNN_FILTER_MODE", "auto")
+EFFICIENT_FILTER_ENGINES = ("faiss", "lucene")
+
+
+def efficient_filtering(index_name=AOSS_INDEX_NAME):
+    if KNN_FILTER_MODE == "auto":
+        return vector_engine(index_name) in EFFICIENT_FILTER_ENGINES
+    return KNN_FILTER_MODE == "efficient"
+
+
+def empty_clause(clause):
+    # {"bool": {"must": []}} and nestings of it filter nothing
+    if not isinstance(clause, dict) or list(clause) != ["bool"]:
+        return False
+    for occur, children in clause["bool"].items():
+        if occur not in ("must", "filter", "should", "must_not"):
+            return False
+        if not all(empty_clause(child) for child in (children if isinstance(children, list) else [children])):
+            return False
+    return True
+
+
+def effective_filter(filter_clause):
+    return None if filter_clause is None or empty_clause(filter_clause) else filter_clause
+
+
+def knn_body(embeddings, filter_clause, k=KNN_K, size=20, fields=None, efficient=False):
+    if RESCORE:
+        k = int(k * RESCORE_OVERSAMPLE)
+        size = int(size * RESCORE_OVERSAMPLE)
+    knn = {
+        "vector": query_vector(embeddings),
+        "k": k
+    }
+    body = {
+        'size': size,
+        'query': {
+            'knn': {
+                VECTOR_FIELD: knn
+            }
+        },
+        "_source": source_filter(fields, vectors=RESCORE)
+    }
+    if filter_clause is not None:
+        if efficient:
+            knn["filter"] = filter_clause
+        else:
+            body["post_filter"] = filter_clause
+    return body
+
+
+def needs_overfetch(response, filter_clause, k, efficient):
+    # efficient filtering already returns the top k among the matches
+    return not efficient and filter_clause is not None and len(response['hits']['hits']) < KNN_K and k < KNN_K_MAX
+
+
+def finish(response, embeddings, size):
+    if RESCORE and 'hits' in response:
+        hits = rescore(response['hits']['hits'], embeddings, size)
+        response['hits']['hits'] = hits
+        response['hits']['max_score'] = hits[0]['_score'] if hits else None
+    return response
+
+
+def knn_search(embeddings, filter_clause, size=20, fields=None, index_name=AOSS_INDEX_NAME):
+    # filter_clause: a query clause (e.g. {"bool": {"must": [...]}}) or None for no filter
+    filter_clause = effective_filter(filter_clause)
+    cache = get_near_cache()
+    key = query_key(index_name, filter_clause, size, fields)
+    if cache is not None:
+        cached = cache.get(embeddings, key)
+        if cached is not None:
+            return cached
+
+    response = _knn_search(embeddings, filter_clause, size, fields, index_name)
+    if cache is not None:
+        cache.put(embeddings, key, response)
+    return response
+
+
+def _knn_search(embeddings, filter_clause, size, fields, index_name):
+    client = get_backend()
+    efficient = efficient_filtering(index_name)
+    k = KNN_K
+    while True:
+        response = client.search(
+            body = knn_body(embeddings, filter_clause, k, size, fields, efficient),
+            index = index_name
+        )
+        if not needs_overfetch(response, filter_clause, k, efficient):
+            return finish(response, embeddings, size)
+        k = min(k * KNN_OVERFETCH, KNN_K_MAX)
+        log.debug("Filtered kNN came back short, retrying", hits=len(response['hits']['hits']), k=k)
+
+
+def knn_msearch(queries, size=20, fields=None, index_name=AOSS_INDEX_NAME):
+    # queries: [(embeddings, filter_clause)]; one msearch round trip for the queries the
+    # near-duplicate cache can't answer, then only the ones that came back short are re-run
+    # (individually) with a larger k
+    queries = [(embeddings, effective_filter(filter_clause)) for embeddings, filter_clause in queries]
+    cache = get_near_cache()
+    responses = [None] * len(queries)
+    keys = [query_key(index_name, filter_clause, size, fields) for _, filter_clause in queries]
+    if cache is not None:
+        responses = [cache.get(embeddings, key) for (embeddings, _), key in zip(queries, keys)]
+    misses = [position for position, response in enumerate(responses) if response is None]
+    if not misses:
+        return responses
+
+    client = get_backend()
+    efficient = efficient_filtering(index_name)
+
+    body = []
+    for position in misses:
+        embeddings, filter_clause = queries[position]
+        body.append({"index": index_name})
+        body.append(knn_body(embeddings, filter_clause, KNN_K, size, fields, efficient))
+    fetched = client.msearch(body = body)['responses']
+
+    for position, response in zip(misses, fetched):
+        embeddings, filter_clause = queries[position]
+        if 'error' in response:
+            responses[position] = response
+            continue
+        if needs_overfetch(response, filter_clause, KNN_K, efficient):
+            response = _knn_search(embeddings, filter_clause, size, fields, index_name)
+        else:
+            response = finish(response, embeddings, size)
+        responses[position] = response
+        if cache is not None:
+            cache.put(embeddings, keys[position], response)
+    return responses
@@ -0,0 +1,84 @@
+import json
+import os
+import random
+
+#################################
+# Level-gated structured logging
+#
+# One JSON line per call: {"level", "msg", "route", "request_id", **fields}. Field values can
+# be callables, which are only evaluated when the line is actually written. Outside debug,
+# fields are compacted before serializing: float lists (embeddings) become "<vector[1536]>",
+# long strings and lists are cut. Debug is on for a request when LOG_LEVEL=DEBUG, for a
+# LOG_DEBUG_SAMPLE_RATE share of requests, or when the request carries "X-Debug-Log: 1"
+# and LOG_DEBUG_HEADER=1.
+#################################
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+LOG_LEVEL = LEVELS.get(os.environ.get("LOG_LEVEL", "INFO").upper(), LEVELS["INFO"])
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0"))
+LOG_DEBUG_HEADER = os.environ.get("LOG_DEBUG_HEADER", "0") == "1"
+LOG_MAX_STRING = int(os.environ.get("LOG_MAX_STRING", "256"))
+LOG_MAX_ITEMS = int(os.environ.get("LOG_MAX_ITEMS", "10"))
+VECTOR_MIN_LENGTH = 16
+
+_request = {"route": None, "request_id": None, "debug": LOG_LEVEL <= LEVELS["DEBUG"]}
+
+
+def begin_request(route, event=None, context=None):
+    headers = {key.lower(): value for key, value in ((event or {}).get("headers") or {}).items()}
+    _request["route"] = route
+    _request["request_id"] = getattr(context, "aws_request_id", None)
+    _request["debug"] = (
+        LOG_LEVEL <= LEVELS["DEBUG"]
+        or (LOG_DEBUG_SAMPLE_RATE > 0 and random.random() < LOG_DEBUG_SAMPLE_RATE)
+        or (LOG_DEBUG_HEADER and headers.get("x-debug-log") == "1")
+    )
+
+
+def debug_enabled():
+    return _request["debug"]
+
+
+def enabled(level):
+    return LEVELS[level] >= (LEVELS["DEBUG"] if _request["debug"] else LOG_LEVEL)
+
+
+def compact(value):
+    if isinstance(value, dict):
+        return {key: compact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if len(value) >= VECTOR_MIN_LENGTH and all(isinstance(item, (int, float)) for item in value[:VECTOR_MIN_LENGTH]):
+            return f"<vector[{len(value)}]>"
+        items = [compact(item) for item in value[:LOG_MAX_ITEMS]]
+        if len(value) > LOG_MAX_ITEMS:
+            items.append(f"<{len(value) - LOG_MAX_ITEMS} more>")
+        return items
+    if isinstance(value, str) and len(value) > LOG_MAX_STRING:
+        return f"{value[:LOG_MAX_STRING]}<{len(value) - LOG_MAX_STRING} more chars>"
+    return value
+
+
+def write(level, msg, fields):
+    if not enabled(level):
+        return
+    fields = {key: value() if callable(value) else value for key, value in fields.items()}
+    if not _request["debug"]:
+        fields = compact(fields)
+    record = {"level": level, "msg": msg, "route": _request["route"], "request_id": _request["request_id"], **fields}
+    print(json.dumps(record, default=str))
+
+
+def debug(msg, **fields):
+    write("DEBUG", msg, fields)
+
+
+def info(msg, **fields):
+    write("INFO", msg, fields)
+
+
+def warning(msg, **fields):
+    write("WARNING", msg, fields)
+
+
+def error(msg, **fields):
+    write("ERROR", msg, fields)
@@ -0,0 +1,130 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from aoss_common import log
+
+#################################
+# Per-stage latency metrics as CloudWatch Embedded Metric Format
+#
+# A handler wrapped with @instrumented("<route>") times the whole invocation; inside it,
+# `with stage("Search"):` / timed("Embeddings", fn, ...) add stage timings (milliseconds,
+# summed when a stage runs more than once). One EMF record per invocation is written to
+# stdout, where CloudWatch turns it into metrics under METRICS_NAMESPACE with a Route
+# dimension. set_sink() swaps stdout for anything callable, e.g. LocalSink for benchmarks.
+# The wrapper also starts the request's logging context (see log.py).
+#   METRICS=1 (default) | 0
+#################################
+
+METRICS = os.environ.get("METRICS", "1") == "1"
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ProjectHeal/Search")
+
+# Lambda runs one invocation per container at a time, but stages can run on the worker
+# threads of concurrency.py, so this is a plain module global rather than a thread local
+_current = None
+
+
+def print_sink(record):
+    print(json.dumps(record))
+
+
+_sink = print_sink
+
+
+class LocalSink:
+    # keeps the records in memory instead of printing them
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def timings(self):
+        # {(route, stage): [ms, ...]}
+        collected = {}
+        for record in self.records:
+            definition = record["_aws"]["CloudWatchMetrics"][0]
+            for metric in definition["Metrics"]:
+                if metric["Unit"] == "Milliseconds":
+                    collected.setdefault((record["Route"], metric["Name"]), []).append(record[metric["Name"]])
+        return collected
+
+
+def set_sink(sink):
+    global _sink
+    _sink = sink or print_sink
+
+
+class StageMetrics:
+    def __init__(self, route):
+        self.route = route
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, ms):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def record(self, status_code):
+        metrics = [{"Name": name, "Unit": "Milliseconds"} for name in self.stages]
+        metrics.append({"Name": "Errors", "Unit": "Count"})
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Route"]],
+                    "Metrics": metrics
+                }]
+            },
+            "Route": self.route,
+            "StatusCode": status_code,
+            **{name: round(ms, 3) for name, ms in self.stages.items()},
+            "Errors": 1 if status_code is None or status_code >= 500 else 0
+        }
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _current is not None:
+            _current.add(name, (time.perf_counter() - started) * 1000)
+
+
+def timed(name, fn, *args, **kwargs):
+    with stage(name):
+        return fn(*args, **kwargs)
+
+
+def instrumented(route):
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            global _current
+            log.begin_request(route, event, context)
+            if not METRICS:
+                return handler(event, context)
+            _current = StageMetrics(route)
+            status_code = None
+            try:
+                with stage("Total"):
+                    response = handler(event, context)
+                # non-HTTP invocations (the SQS ingest worker) return no statusCode
+                status_code = response.get("statusCode", 200) if isinstance(response, dict) else 200
+                return response
+            finally:
+                metrics, _current = _current, None
+                try:
+                    _sink(metrics.record(status_code))
+                except Exception as e:
+                    log.warning("Metrics emit failed", error=str(e))
+        return wrapper
+    return decorate
@@ -0,0 +1,94 @@
+from aoss_common import log
+from aoss_common.backend import bulk_write
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.exact import statement_hash, HASH_FIELD
+from aoss_common.indices import ensure_index, statements_mapping
+from aoss_common.paging import iter_documents
+from aoss_common.similar import get_similar_store, SIMILAR_INDEX_NAME
+from aoss_common.vectors import document_vectors, full_vector, VECTOR_FIELD, FULL_VECTOR_FIELD, VECTOR_PROFILE
+
+#################################
+# Copy the statements index into a new index with a different vector profile
+#
+# AOSS has no _reindex, so documents are walked with scroll and re-written with _bulk, the
+# vectors re-encoded for the target profile. New documents get new ids, so every
+# similar-statement link is copied with its parent-id pointing at the new document. The
+# originals stay in place for the source index, which the functions keep reading until the
+# cut-over (and for good if the migration is abandoned). Then point the functions at the new index:
+#   AOSS_INDEX_NAME=<target> AOSS_VECTOR_PROFILE=<profile>
+#################################
+
+BATCH_SIZE = 200
+
+
+def _copy_batch(batch, target, id_map):
+    outcomes = bulk_write([("index", target, None, document) for _, document in batch])
+    failed = 0
+    for (old_id, _), outcome in zip(batch, outcomes):
+        if outcome["ok"]:
+            id_map[old_id] = outcome["id"]
+        else:
+            failed += 1
+            log.warning("Migrating document failed", id=old_id, error=outcome['error'])
+    return failed
+
+
+def _relink_batch(batch):
+    # batch: link records already re-pointed at the target documents, appended as new records
+    # (links a previous run already copied are skipped)
+    outcomes, _ = get_similar_store().append(batch)
+    return sum(1 for outcome in outcomes if not outcome["ok"])
+
+
+def migrate_index(target, profile=VECTOR_PROFILE, source=AOSS_INDEX_NAME):
+    if target == source:
+        raise ValueError("Migration target must differ from the source index")
+    created = ensure_index(target, statements_mapping(profile))
+
+    id_map = {}
+    failed = 0
+    batch = []
+    for hit in iter_documents(size=BATCH_SIZE, index_name=source, vectors=True):
+        document = hit["_source"]
+        vector = full_vector(document)
+        document.pop(VECTOR_FIELD, None)
+        document.pop(FULL_VECTOR_FIELD, None)
+        if vector is not None:
+            document.update(document_vectors(vector, profile))
+        if "statement" in document:
+            # backfills the exact-duplicate key for documents that predate it
+            document[HASH_FIELD] = statement_hash(document["statement"])
+        batch.append((hit["_id"], document))
+        if len(batch) >= BATCH_SIZE:
+            failed += _copy_batch(batch, target, id_map)
+            batch = []
+    if batch:
+        failed += _copy_batch(batch, target, id_map)
+
+    relinked = 0
+    relink_failed = 0
+    batch = []
+    for hit in iter_documents(size=BATCH_SIZE, index_name=SIMILAR_INDEX_NAME):
+        parent_id = hit["_source"].get("parent-id")
+        if parent_id in id_map:
+            batch.append(dict(hit["_source"], **{"parent-id": id_map[parent_id]}))
+        if len(batch) >= BATCH_SIZE:
+            relinked += len(batch)
+            relink_failed += _relink_batch(batch)
+            batch = []
+    if batch:
+        relinked += len(batch)
+        relink_failed += _relink_batch(batch)
+
+    result = {
+        "source": source,
+        "target": target,
+        "profile": profile,
+        "created": created,
+        "documents": len(id_map),
+        "failed": failed,
+        "links": relinked,
+        "links_failed": relink_failed
+    }
+    log.info("Migration finished", **result)
+    return result
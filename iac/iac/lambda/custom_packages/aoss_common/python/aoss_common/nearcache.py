@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+
+from aoss_common import log
+from aoss_common.vectors import VECTOR_DIMENSION, cosine_score
+
+# imported when the first cache is built: knn, ingest and searchcache import this module,
+# and numpy would add ~100 ms to every cold start of the functions that use them
+np = None
+
+#################################
+# L1 near-duplicate kNN cache (per warm container)
+#
+# Keeps the last L1_CAPACITY kNN responses next to their normalized float32 query vectors in
+# one NumPy matrix. A new query is compared against every row at once (one matrix-vector
+# product); when a cached query with the same filter/size/fields scores at or above
+# L1_THRESHOLD (OpenSearch cosinesimil score, 1 = same vector) its response is reused and
+# AOSS is skipped. Rows expire after L1_TTL seconds, the least recently used row is evicted
+# when full, and a write evicts the rows whose query is near the written vector. Writes from
+# other containers are only visible through the index generation: the search cache clears
+# this tier whenever it reads a new one.
+#   L1_CACHE=1 (default, off if numpy is missing) | 0
+#################################
+
+L1_CACHE = os.environ.get("L1_CACHE", "1") == "1"
+L1_CAPACITY = int(os.environ.get("L1_CAPACITY", "512"))
+L1_THRESHOLD = float(os.environ.get("L1_THRESHOLD", "0.9999"))
+L1_TTL = float(os.environ.get("L1_TTL", "30"))
+# a write invalidates cached queries it could have shown up in as a similar statement
+L1_INVALIDATE_THRESHOLD = float(os.environ.get("L1_INVALIDATE_THRESHOLD", "0.8"))
+
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def query_key(index_name, filter_clause, size, fields):
+    return hash(json.dumps([index_name, filter_clause, size, fields], sort_keys=True))
+
+
+class NearDuplicateCache:
+    def __init__(self, capacity=L1_CAPACITY, dimension=VECTOR_DIMENSION, threshold=L1_THRESHOLD, ttl=L1_TTL):
+        load_numpy()
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.keys = np.zeros(capacity, dtype=np.int64)
+        self.expires = np.zeros(capacity, dtype=np.float64)  # 0 = empty row
+        self.used = np.zeros(capacity, dtype=np.int64)
+        self.responses = [None] * capacity
+        self.tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _similarities(self, query, live):
+        # cosine of the query against every live row, as the OpenSearch score
+        return cosine_score(self.vectors[live] @ query)
+
+    def get(self, vector, key):
+        query = self.normalize(vector)
+        with self._lock:
+            live = np.flatnonzero((self.expires > time.time()) & (self.keys == key))
+            if live.size:
+                scores = self._similarities(query, live)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    row = live[best]
+                    self.tick += 1
+                    self.used[row] = self.tick
+                    self.hits += 1
+                    return json.loads(self.responses[row])
+            self.misses += 1
+            return None
+
+    def put(self, vector, key, response):
+        query = self.normalize(vector)
+        with self._lock:
+            empty = np.flatnonzero(self.expires <= time.time())
+            if empty.size:
+                row = int(empty[0])
+            else:
+                row = int(np.argmin(self.used))
+                self.evictions += 1
+            self.tick += 1
+            self.vectors[row] = query
+            self.keys[row] = key
+            self.expires[row] = time.time() + self.ttl
+            self.used[row] = self.tick
+            # stored serialized so callers can't mutate a cached response
+            self.responses[row] = json.dumps(response)
+
+    def invalidate(self, vector, threshold=L1_INVALIDATE_THRESHOLD):
+        query = self.normalize(vector)
+        with self._lock:
+            live = np.flatnonzero(self.expires > time.time())
+            if not live.size:
+                return 0
+            stale = live[self._similarities(query, live) >= threshold]
+            self.expires[stale] = 0
+            for row in stale:
+                self.responses[row] = None
+            self.invalidations += int(stale.size)
+            return int(stale.size)
+
+    def clear(self):
+        with self._lock:
+            self.expires[:] = 0
+            self.responses = [None] * self.capacity
+            self.invalidations += 1
+
+    def stats(self):
+        return {
+            "rows": int(np.count_nonzero(self.expires > time.time())),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+_cache = None
+_unavailable = False
+
+
+def get_near_cache():
+    # None when the L1 tier is disabled (L1_CACHE=0 or numpy missing)
+    global _cache, _unavailable
+    if not L1_CACHE or _unavailable:
+        return None
+    if _cache is None:
+        try:
+            _cache = NearDuplicateCache()
+        except ImportError as e:
+            _unavailable = True
+            log.warning("L1 kNN cache disabled", error=repr(e))
+    return _cache
+
+
+def near_cache_stats():
+    return _cache.stats() if _cache is not None else {}
+
+
+def clear_near_cache():
+    # writes from other containers only show up as a new index generation (searchcache.py)
+    if _cache is not None:
+        _cache.clear()
+
+
+def record_write(vector):
+    # call with the vector of every document written to the statements index
+    if _cache is not None and vector is not None:
+        _cache.invalidate(vector)
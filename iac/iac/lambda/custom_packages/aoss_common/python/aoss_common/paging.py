@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+
+from aoss_common import log
+from aoss_common.backend import get_backend
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.indices import source_filter
+
+#################################
+# Cursor pagination and NDJSON export over the whole index
+#
+# Uses scroll contexts: the cursor handed to API clients is the scroll id, valid for
+# SCROLL_KEEPALIVE between calls. iter_documents() walks every document one page at a time,
+# so an export holds at most one page in memory. Local export:
+#   python -m aoss_common.paging > statements.ndjson
+#################################
+
+PAGE_SIZE = int(os.environ.get("SEARCH_ALL_PAGE_SIZE", "100"))
+PAGE_SIZE_MAX = 1000
+SCROLL_KEEPALIVE = os.environ.get("SCROLL_KEEPALIVE", "5m")
+
+
+def page_documents(cursor=None, size=PAGE_SIZE, fields=None, index_name=AOSS_INDEX_NAME, vectors=False):
+    # returns (search response, next cursor or None when the walk is finished)
+    client = get_backend()
+    size = max(1, min(size, PAGE_SIZE_MAX))
+    if cursor is None:
+        response = client.search(
+            index = index_name,
+            scroll = SCROLL_KEEPALIVE,
+            body = {
+                "size": size,
+                "query": {"match_all": {}},
+                "_source": source_filter(fields, vectors)
+            }
+        )
+    else:
+        response = client.scroll(scroll_id = cursor, scroll = SCROLL_KEEPALIVE)
+
+    next_cursor = response.get('_scroll_id')
+    if len(response['hits']['hits']) < size:
+        # last page: free the scroll context now instead of waiting for it to expire
+        if next_cursor:
+            try:
+                client.clear_scroll(scroll_id = next_cursor)
+            except Exception as e:
+                log.warning("clear_scroll failed", error=str(e))
+        next_cursor = None
+    return response, next_cursor
+
+
+def iter_documents(size=PAGE_SIZE, fields=None, index_name=AOSS_INDEX_NAME, vectors=False):
+    cursor = None
+    while True:
+        response, cursor = page_documents(cursor, size, fields, index_name, vectors)
+        for hit in response['hits']['hits']:
+            yield hit
+        if cursor is None:
+            return
+
+
+def export_ndjson(fp, size=PAGE_SIZE, fields=None, index_name=AOSS_INDEX_NAME):
+    # one {"_id", "_source"} object per line; fp receives text
+    count = 0
+    for hit in iter_documents(size, fields, index_name):
+        fp.write(json.dumps({"_id": hit["_id"], "_source": hit["_source"]}))
+        fp.write("\n")
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    out = sys.stdout
+    sys.stdout = sys.stderr  # keep log prints out of the NDJSON stream
+    log.info("Exported documents", count=export_ndjson(out))
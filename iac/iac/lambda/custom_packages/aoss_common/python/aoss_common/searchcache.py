@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+
+from aoss_common import log
+from aoss_common.cache import ByteLRU, content_key
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.nearcache import clear_near_cache
+from aoss_common.session import aws_client
+
+#################################
+# Search response cache
+#
+# The UI sends the same search again and again. POST /aoss/search keeps the response body of
+# each query in an LRU (per warm container). The key is the statement as the handler
+# normalized it (lowercased, punctuation stripped), intent, severity, source, topics,
+# medicalConditions, the _source fields, the page size and the index generation.
+# The generation is a counter that ingest and delete bump after their writes are visible.
+# A write therefore retires every cached response without tracking which ones it touched,
+# and a hit costs one read of the counter instead of Comprehend, embeddings, kNN and the
+# similar-statement pages. Entries also expire after SEARCH_CACHE_TTL seconds.
+# If the wait for the writes times out, the bump also holds the cache: until
+# SEARCH_CACHE_HOLD seconds later, searches run uncached, so one that runs before the write
+# is searchable can't store its stale response under the new generation.
+#   SEARCH_CACHE=1 (default) | 0
+#   GENERATION_TABLE set -> counter in DynamoDB, shared by every function
+#   otherwise            -> in-process counter (local runs, where ingest and search share a process)
+#################################
+
+SEARCH_CACHE = os.environ.get("SEARCH_CACHE", "1") == "1"
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_HOLD = float(os.environ.get("SEARCH_CACHE_HOLD", "60"))
+SEARCH_CACHE_MAX_BYTES = int(os.environ.get("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+GENERATION_TABLE = os.environ.get("GENERATION_TABLE", "")
+
+search_cache = ByteLRU(SEARCH_CACHE_MAX_BYTES, len, ttl=SEARCH_CACHE_TTL)
+_counters = {"bypassed": 0, "bumps": 0, "held": 0}
+# last generation seen per index, to notice writes made by other containers
+_seen = {}
+
+
+# generation stores: get(index) -> (generation, cache held until), bump(index, hold_until=None)
+class LocalGeneration:
+    def __init__(self):
+        self.generations = {}
+        self.holds = {}
+        self._lock = threading.Lock()
+
+    def get(self, index_name):
+        with self._lock:
+            return self.generations.get(index_name, 0), self.holds.get(index_name, 0.0)
+
+    def bump(self, index_name, hold_until=None):
+        with self._lock:
+            self.generations[index_name] = self.generations.get(index_name, 0) + 1
+            if hold_until is not None:
+                self.holds[index_name] = max(self.holds.get(index_name, 0.0), hold_until)
+            return self.generations[index_name]
+
+
+class DynamoGeneration:
+    # one item per index: index_name (hash key), generation (atomic counter), hold_until
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, index_name):
+        item = aws_client("dynamodb").get_item(TableName=self.table, Key={"index_name": {"S": index_name}}, ConsistentRead=True).get("Item")
+        if not item:
+            return 0, 0.0
+        return int(item["generation"]["N"]), float(item["hold_until"]["N"]) if "hold_until" in item else 0.0
+
+    def bump(self, index_name, hold_until=None):
+        update = "ADD generation :one"
+        values = {":one": {"N": "1"}}
+        if hold_until is not None:
+            # holds all have the same length, so the latest one ends last
+            update += " SET hold_until = :hold"
+            values[":hold"] = {"N": repr(hold_until)}
+        response = aws_client("dynamodb").update_item(
+            TableName=self.table,
+            Key={"index_name": {"S": index_name}},
+            UpdateExpression=update,
+            ExpressionAttributeValues=values,
+            ReturnValues="UPDATED_NEW"
+        )
+        return int(response["Attributes"]["generation"]["N"])
+
+
+_generation = None
+
+
+def get_generation_store():
+    global _generation
+    if _generation is None:
+        _generation = DynamoGeneration(GENERATION_TABLE) if GENERATION_TABLE else LocalGeneration()
+    return _generation
+
+
+def bump_generation(index_name=AOSS_INDEX_NAME, visible=True):
+    # call after waiting for the writes, with whether they became visible; a failure only
+    # leaves cached searches until they expire
+    hold_until = None if visible else time.time() + SEARCH_CACHE_HOLD
+    try:
+        generation = get_generation_store().bump(index_name, hold_until)
+        _counters["bumps"] += 1
+        log.debug("Index generation bumped", index=index_name, generation=generation, held=not visible)
+    except Exception as e:
+        log.warning("Index generation bump failed", index=index_name, error=repr(e))
+
+
+def search_key(statement, intent, severity, source, topics, medicalconditions, fields, page_size, index_name=AOSS_INDEX_NAME):
+    # None when the cache is off or the generation can't be read: search without the cache
+    if not SEARCH_CACHE:
+        return None
+    try:
+        generation, hold_until = get_generation_store().get(index_name)
+    except Exception as e:
+        _counters["bypassed"] += 1
+        log.warning("Index generation read failed, bypassing search cache", error=repr(e))
+        return None
+    # the L1 kNN tier only hears about this container's writes; drop it so a stale kNN
+    # response isn't cached again under the new generation
+    if _seen.get(index_name) != generation:
+        clear_near_cache()
+        _seen[index_name] = generation
+    if hold_until > time.time():
+        _counters["held"] += 1
+        return None
+    # topics and conditions become terms filters, so their order doesn't matter
+    return content_key(
+        index_name, str(generation), statement, intent, severity, source,
+        json.dumps(sorted(topics)), json.dumps(sorted(medicalconditions)), json.dumps(fields), str(page_size)
+    )
+
+
+def cached_search(key):
+    if key is None:
+        return None
+    body = search_cache.get(key)
+    return body.decode("utf-8") if body is not None else None
+
+
+def cache_search(key, body):
+    if key is not None:
+        search_cache.put(key, body.encode("utf-8"))
+
+
+def search_cache_stats():
+    return {**search_cache.stats(), **_counters}
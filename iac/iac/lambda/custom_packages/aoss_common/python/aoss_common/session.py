@@ -0,0 +1,59 @@
+import os
+import threading
+from collections import namedtuple
+
+#################################
+# One boto3 session per container, imported on first use
+#
+# boto3/botocore is the slowest import a handler makes, and a route that never calls an AWS
+# API (delete, search_all without EXPORT_BUCKET) shouldn't pay for it at cold start. All
+# AWS clients come from aws_client(), which builds them once from the same session instead
+# of each module creating its own boto3.Session() / boto3.client().
+#################################
+
+# expiry: epoch seconds, or None when the source doesn't say (static keys, Lambda environment)
+Credentials = namedtuple("Credentials", ["access_key", "secret_key", "token", "expiry"])
+
+_session = None
+_clients = {}
+_lock = threading.RLock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import boto3
+                _session = boto3.Session()
+    return _session
+
+
+def aws_client(service):
+    client = _clients.get(service)
+    if client is None:
+        with _lock:
+            client = _clients.get(service)
+            if client is None:
+                client = _clients[service] = get_session().client(service)
+    return client
+
+
+def region_name():
+    # Lambda always sets AWS_REGION; falls back to the session (profile/config) locally
+    return os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION") or get_session().region_name
+
+
+def get_credentials():
+    # Lambda passes the execution role's credentials in the environment, which is also the
+    # first place botocore would look, so read them directly and leave boto3 unimported
+    access_key = os.environ.get("AWS_ACCESS_KEY_ID")
+    secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
+    if access_key and secret_key:
+        return Credentials(access_key, secret_key, os.environ.get("AWS_SESSION_TOKEN"), None)
+    # botocore refreshes assumed-role / container / instance credentials itself when asked
+    # for a frozen copy close to expiry
+    credentials = get_session().get_credentials()
+    frozen = credentials.get_frozen_credentials()
+    expiry = getattr(credentials, "_expiry_time", None)
+    return Credentials(frozen.access_key, frozen.secret_key, frozen.token, expiry.timestamp() if expiry else None)
@@ -0,0 +1,125 @@
+import datetime
+import os
+import threading
+import time
+
+from requests.auth import AuthBase
+from requests_aws4auth import AWS4Auth, AWS4SigningKey
+
+from aoss_common import log
+from aoss_common.metrics import stage
+from aoss_common.session import get_credentials
+
+#################################
+# SigV4 signing for the AOSS client that outlives its credentials
+#
+# The OpenSearch client (and its auth) lives as long as the warm container. sigv4_auth()
+# picks the signer from the credentials it finds:
+#   - without an expiry (the Lambda environment, static keys) they can't change under the
+#     container: Lambda doesn't rotate the role credentials it put in the environment for
+#     the life of the execution environment, so re-reading them would only return the same
+#     values. These get a plain AWS4Auth, which is the cheapest signer per request.
+#   - with an expiry (botocore assumed-role / SSO / container / instance providers, i.e.
+#     local and non-Lambda runs) they get RefreshableSigV4Auth, which keeps them with their
+#     expiry and reloads them ahead of it: inside SIGV4_REFRESH_AHEAD seconds one request
+#     reloads them while the others keep signing with the current (still valid) ones; inside
+#     SIGV4_MANDATORY_REFRESH seconds, or once expired, every request waits for it; a 401/403
+#     from AOSS about the security token reloads them before the next request. Its derived
+#     signing key (HMAC chain over date/region/service) is cached per access key and day,
+#     and time spent signing is added to the request's metrics as the "Signing" stage.
+#################################
+
+SIGV4_REFRESH_AHEAD = int(os.environ.get("SIGV4_REFRESH_AHEAD", str(10 * 60)))
+SIGV4_MANDATORY_REFRESH = int(os.environ.get("SIGV4_MANDATORY_REFRESH", "60"))
+
+EXPIRED_TOKEN_MARKERS = (b"security token", b"expired")
+
+
+class RefreshableSigV4Auth(AuthBase):
+    def __init__(self, region, service, load_credentials=get_credentials):
+        self.region = region
+        self.service = service
+        self._load_credentials = load_credentials
+        self._credentials = None
+        self._stale = False
+        self._refresh_lock = threading.Lock()
+        # (access key, yyyymmdd) -> AWS4Auth built from the cached signing key
+        self._signers = {}
+        self._stats = {"signed": 0, "signing_ms": 0.0, "keys_derived": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def _expires_in(self, credentials, now):
+        if credentials.expiry is None:
+            return float("inf")
+        return credentials.expiry - now
+
+    def _refresh(self):
+        credentials = self._load_credentials()
+        self._credentials, self._stale = credentials, False
+        self._stats["refreshes"] += 1
+        log.info("SigV4 credentials loaded", expiry=credentials.expiry)
+        return credentials
+
+    def credentials(self):
+        credentials = self._credentials
+        now = time.time()
+        if credentials is None or self._stale or self._expires_in(credentials, now) <= SIGV4_MANDATORY_REFRESH:
+            with self._refresh_lock:
+                # another thread may have refreshed while this one waited
+                if self._credentials is credentials:
+                    return self._refresh()
+                return self._credentials
+        if self._expires_in(credentials, now) <= SIGV4_REFRESH_AHEAD and self._refresh_lock.acquire(blocking=False):
+            try:
+                return self._refresh()
+            except Exception as e:
+                # the current credentials are still valid for a while; try again on the next request
+                self._stats["refresh_errors"] += 1
+                log.warning("SigV4 credential refresh failed", error=repr(e))
+            finally:
+                self._refresh_lock.release()
+        return credentials
+
+    def signer(self, credentials, date):
+        key = (credentials.access_key, date)
+        signer = self._signers.get(key)
+        if signer is None:
+            signing_key = AWS4SigningKey(credentials.secret_key, self.region, self.service, date)
+            signer = AWS4Auth(credentials.access_key, signing_key, session_token=credentials.token)
+            # only today's key for the current credentials is ever needed again
+            self._signers = {key: signer}
+            self._stats["keys_derived"] += 1
+        return signer
+
+    def invalidate(self):
+        self._stale = True
+
+    def _check_response(self, response, **kwargs):
+        if response.status_code in (401, 403) and any(marker in response.content.lower() for marker in EXPIRED_TOKEN_MARKERS):
+            log.warning("AOSS rejected the request signature, reloading credentials", status=response.status_code)
+            self.invalidate()
+        return response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with stage("Signing"):
+            credentials = self.credentials()
+            date = datetime.datetime.utcnow().strftime("%Y%m%d")
+            request = self.signer(credentials, date)(request)
+            request.register_hook("response", self._check_response)
+        self._stats["signed"] += 1
+        self._stats["signing_ms"] += (time.perf_counter() - started) * 1000
+        return request
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["signing_ms"] = round(stats["signing_ms"], 3)
+        if self._credentials is not None:
+            stats["expires_in"] = round(self._expires_in(self._credentials, time.time()))
+        return stats
+
+
+def sigv4_auth(region, service, load_credentials=get_credentials):
+    credentials = load_credentials()
+    if credentials.expiry is None:
+        return AWS4Auth(credentials.access_key, credentials.secret_key, region, service, session_token=credentials.token)
+    return RefreshableSigV4Auth(region, service, load_credentials)
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import time
+
+from aoss_common import log
+from aoss_common.backend import get_backend, bulk_write
+from aoss_common.consistency import expect_document
+
+#################################
+# Similar-statement links
+#
+# Near-duplicates used to be folded into the parent's `statement-similar` object, which was
+# read and rewritten in full on every ingest. Each link is now its own small record in a side
+# index, appended once and read back a page at a time per parent (sorted by creation, with
+# link-id as tie-breaker so search_after cursors are stable).
+# link-id is a hash of parent-id and statement. append() looks the ids up first (one msearch)
+# and writes only the missing links, so ingesting the same near-duplicate again, after its
+# claim expired or from another container, leaves one link per parent and statement. AOSS
+# vector collections reject custom document ids, so the lookup can't be an upsert on _id.
+#   SIMILAR_STORE=aoss (default) -> AossSimilarStore, SIMILAR_STORE=local -> LocalSimilarStore
+#################################
+
+SIMILAR_INDEX_NAME = os.environ.get("AOSS_SIMILAR_INDEX_NAME", "statements-similar")
+SIMILAR_STORE = os.environ.get("SIMILAR_STORE", "aoss")
+SIMILAR_PAGE_SIZE = int(os.environ.get("SIMILAR_PAGE_SIZE", "50"))
+# a search returns one page per kNN hit, in one response
+SIMILAR_PAGE_SIZE_MAX = 200
+SIMILAR_DELETE_BATCH = 500
+
+SIMILAR_MAPPING = {
+    "mappings": {
+        "properties": {
+            "parent-id": {"type": "keyword"},
+            "link-id": {"type": "keyword"},
+            "created": {"type": "long"},
+            "statement": {"type": "text"},
+            "metadata": {"type": "object"},
+            "background": {"type": "object"}
+        }
+    }
+}
+
+
+def link_id(parent_id, statement):
+    return hashlib.sha256(f"{parent_id}\n{statement}".encode("utf-8")).hexdigest()
+
+
+def keyed(links):
+    # {link-id: link} with link-id recomputed, for links whose parent-id was set after
+    # similar_link(); a repeat within the list keeps the first
+    unique = {}
+    for link in links:
+        key = link_id(link["parent-id"], link["statement"])
+        unique.setdefault(key, dict(link, **{"link-id": key}))
+    return unique
+
+
+def similar_link(parent_id, statement, metadata, background):
+    return {
+        "parent-id": parent_id,
+        "link-id": link_id(parent_id, statement),
+        "created": int(time.time() * 1000),
+        "statement": statement,
+        "metadata": metadata,
+        "background": background
+    }
+
+
+def similar_page_size(size):
+    return max(1, min(int(size), SIMILAR_PAGE_SIZE_MAX))
+
+
+def encode_cursor(link):
+    return f'{link["created"]}:{link["link-id"]}'
+
+
+def decode_cursor(cursor):
+    created, link_id = cursor.split(":", 1)
+    return [int(created), link_id]
+
+
+def page_result(links, size):
+    # links were fetched with size + 1 so we can tell whether another page exists
+    page = links[:size]
+    entries = {link["statement"]: {"metadata": link["metadata"], "background": link["background"]} for link in page}
+    next_cursor = encode_cursor(page[-1]) if len(links) > size else None
+    return entries, next_cursor
+
+
+class AossSimilarStore:
+    def __init__(self, index_name=SIMILAR_INDEX_NAME):
+        self.index_name = index_name
+
+    def existing(self, link_ids):
+        # {link-id: document id} for the links already stored, one term query per id so
+        # leftover duplicates of one link can't crowd out the others
+        if not link_ids:
+            return {}
+        body = []
+        for key in link_ids:
+            body.append({"index": self.index_name})
+            body.append({"size": 1, "query": {"term": {"link-id": key}}, "_source": False})
+        found = {}
+        for key, response in zip(link_ids, get_backend().msearch(body = body)['responses']):
+            if 'error' in response:
+                raise ValueError(f"Similar link lookup failed: {response['error']}")
+            if response['hits']['hits']:
+                found[key] = response['hits']['hits'][0]['_id']
+        return found
+
+    def append(self, links):
+        # returns (per-link {"ok", "id", "error"}, write expectations for wait_for_writes);
+        # links already stored count as ok without a write
+        unique = keyed(links)
+        stored = self.existing(list(unique))
+        missing = [key for key in unique if key not in stored]
+        outcomes = dict(zip(missing, bulk_write([("index", self.index_name, None, unique[key]) for key in missing])))
+        outcomes.update({key: {"ok": True, "id": doc_id, "error": None} for key, doc_id in stored.items()})
+        writes = [expect_document(outcomes[key]["id"], index_name=self.index_name) for key in missing if outcomes[key]["ok"]]
+        return [outcomes[link_id(link["parent-id"], link["statement"])] for link in links], writes
+
+    def remove(self, parent_ids):
+        # deletes every link of the parents; returns (deleted, failed). AOSS has no
+        # _delete_by_query, so the links are walked with search_after and deleted by _bulk.
+        deleted, failed = 0, 0
+        for parent_id in parent_ids:
+            after = None
+            while True:
+                query = {
+                    "size": SIMILAR_DELETE_BATCH,
+                    "query": {"term": {"parent-id": parent_id}},
+                    "sort": [{"created": "asc"}, {"link-id": "asc"}],
+                    "_source": ["created", "link-id"]
+                }
+                if after is not None:
+                    query["search_after"] = after
+                hits = get_backend().search(index = self.index_name, body = query)['hits']['hits']
+                if not hits:
+                    break
+                outcomes = bulk_write([("delete", self.index_name, hit["_id"], None) for hit in hits])
+                deleted += sum(1 for outcome in outcomes if outcome["ok"])
+                failed += sum(1 for outcome in outcomes if not outcome["ok"])
+                if len(hits) < SIMILAR_DELETE_BATCH:
+                    break
+                after = [hits[-1]["_source"]["created"], hits[-1]["_source"]["link-id"]]
+        return deleted, failed
+
+    def page(self, parent_ids, size=SIMILAR_PAGE_SIZE, after=None):
+        # one msearch for every parent; after: {parent_id: cursor}
+        # returns {parent_id: (entries {statement: {metadata, background}}, next cursor or None)}
+        if not parent_ids:
+            return {}
+        size = similar_page_size(size)
+        after = after or {}
+        body = []
+        for parent_id in parent_ids:
+            query = {
+                "size": size + 1,
+                "query": {"term": {"parent-id": parent_id}},
+                "sort": [{"created": "asc"}, {"link-id": "asc"}]
+            }
+            if parent_id in after:
+                query["search_after"] = decode_cursor(after[parent_id])
+            body.append({"index": self.index_name})
+            body.append(query)
+
+        responses = get_backend().msearch(body = body)['responses']
+        pages = {}
+        for parent_id, response in zip(parent_ids, responses):
+            if 'error' in response:
+                log.warning("Similar page failed", parent=parent_id, error=response['error'])
+                pages[parent_id] = ({}, None)
+                continue
+            pages[parent_id] = page_result([hit["_source"] for hit in response['hits']['hits']], size)
+        return pages
+
+
+class LocalSimilarStore:
+    # in-process stand-in with the same interface, for local runs without AOSS
+    def __init__(self):
+        self.links = {}
+
+    def append(self, links):
+        outcomes = []
+        for key, link in keyed(links).items():
+            self.links.setdefault(link["parent-id"], {}).setdefault(key, link)
+        return [{"ok": True, "id": link_id(link["parent-id"], link["statement"]), "error": None} for link in links], []
+
+    def remove(self, parent_ids):
+        deleted = sum(len(self.links.pop(parent_id, {})) for parent_id in parent_ids)
+        return deleted, 0
+
+    def page(self, parent_ids, size=SIMILAR_PAGE_SIZE, after=None):
+        size = similar_page_size(size)
+        after = after or {}
+        pages = {}
+        for parent_id in parent_ids:
+            links = sorted(self.links.get(parent_id, {}).values(), key=lambda link: (link["created"], link["link-id"]))
+            if parent_id in after:
+                cursor = decode_cursor(after[parent_id])
+                links = [link for link in links if [link["created"], link["link-id"]] > cursor]
+            pages[parent_id] = page_result(links[:size + 1], size)
+        return pages
+
+
+_store = None
+
+
+def get_similar_store():
+    global _store
+    if _store is None:
+        _store = LocalSimilarStore() if SIMILAR_STORE == "local" else AossSimilarStore()
+    return _store
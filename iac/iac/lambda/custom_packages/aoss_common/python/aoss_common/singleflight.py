@@ -0,0 +1,273 @@
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+
+from aoss_common import log
+from aoss_common.concurrency import map_concurrently
+from aoss_common.session import aws_client
+
+#################################
+# Single-flight ingest
+#
+# A burst of the same statement used to run the whole pipeline once per request, and since
+# none of them saw the others' writes, several created a document. Before running the
+# pipeline, an ingest claims the statement. The claim is keyed on statement-hash (exact.py)
+# and created only if absent. The request that gets the claim ingests the statement and
+# stores the outcome in the claim. Concurrent requests for the same statement wait for that
+# outcome, then for its writes to be visible, and return it as their own.
+# A claim is a lease of INGEST_CLAIM_LEASE seconds. If its holder fails, the claim is
+# released; if its holder dies, the lease runs out. Either way, the next request takes it over.
+# Statements already in the index never get here (find_exact answers first), so a claim
+# only matters for the few seconds a statement is in flight.
+#   INGEST_SINGLE_FLIGHT=local (default) -> claims in process memory, coalesces threads only
+#   INGEST_SINGLE_FLIGHT=dynamodb        -> conditional writes to CLAIMS_TABLE, across containers
+#   INGEST_SINGLE_FLIGHT=off
+# AOSS vector collections reject custom document ids on index/create, so statement-hash
+# cannot be the document id itself. The claim record is the create-if-absent step instead.
+#################################
+
+INGEST_SINGLE_FLIGHT = os.environ.get("INGEST_SINGLE_FLIGHT", "local")
+CLAIMS_TABLE = os.environ.get("CLAIMS_TABLE", "")
+CLAIM_LEASE = float(os.environ.get("INGEST_CLAIM_LEASE", "60"))
+CLAIM_WAIT = float(os.environ.get("INGEST_CLAIM_WAIT", "30"))
+CLAIM_POLL_INTERVAL = float(os.environ.get("INGEST_CLAIM_POLL_INTERVAL", "0.1"))
+CLAIM_POLL_INTERVAL_MAX = 1.0
+
+
+class ClaimTimeout(Exception):
+    pass
+
+
+# claim stores: acquire(key, owner) -> None when the claim is now ours, else the current
+# claim {"owner", "status": running | done, "lease_until", "result"}; get / complete / release
+class LocalClaimStore:
+    def __init__(self):
+        self.claims = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, owner):
+        now = time.time()
+        with self._lock:
+            claim = self.claims.get(key)
+            if claim is not None and claim["lease_until"] >= now:
+                return copy.deepcopy(claim)
+            self.claims[key] = {"owner": owner, "status": "running", "lease_until": now + CLAIM_LEASE, "result": None}
+            return None
+
+    def get(self, key):
+        with self._lock:
+            return copy.deepcopy(self.claims.get(key))
+
+    def complete(self, key, owner, result):
+        with self._lock:
+            claim = self.claims.get(key)
+            if claim is not None and claim["owner"] == owner:
+                claim.update(status="done", lease_until=time.time() + CLAIM_LEASE, result=copy.deepcopy(result))
+
+    def release(self, key, owner):
+        with self._lock:
+            if self.claims.get(key, {}).get("owner") == owner:
+                del self.claims[key]
+
+
+def _condition_failed(e):
+    return getattr(e, "response", {}).get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+class DynamoClaimStore:
+    # one item per claim: claim_key (hash key), owner, status, lease_until, result as JSON;
+    # expires_at is the table's TTL attribute, so finished claims clean themselves up
+    def __init__(self, table):
+        self.table = table
+
+    def _claim(self, item):
+        return {
+            "owner": item["owner"]["S"],
+            "status": item["status"]["S"],
+            "lease_until": float(item["lease_until"]["N"]),
+            "result": json.loads(item["result"]["S"]) if "result" in item else None
+        }
+
+    def acquire(self, key, owner):
+        now = time.time()
+        try:
+            aws_client("dynamodb").put_item(
+                TableName=self.table,
+                Item={
+                    "claim_key": {"S": key},
+                    "owner": {"S": owner},
+                    "status": {"S": "running"},
+                    "lease_until": {"N": repr(now + CLAIM_LEASE)},
+                    "expires_at": {"N": str(int(now + CLAIM_LEASE + 86400))}
+                },
+                ConditionExpression="attribute_not_exists(claim_key) OR lease_until < :now",
+                ExpressionAttributeValues={":now": {"N": repr(now)}},
+                ReturnValuesOnConditionCheckFailure="ALL_OLD"
+            )
+            return None
+        except Exception as e:
+            if not _condition_failed(e):
+                raise
+            item = e.response.get("Item")
+            return self._claim(item) if item else self.get(key)
+
+    def get(self, key):
+        item = aws_client("dynamodb").get_item(TableName=self.table, Key={"claim_key": {"S": key}}, ConsistentRead=True).get("Item")
+        return self._claim(item) if item else None
+
+    def complete(self, key, owner, result):
+        now = time.time()
+        try:
+            aws_client("dynamodb").update_item(
+                TableName=self.table,
+                Key={"claim_key": {"S": key}},
+                UpdateExpression="SET #status = :done, lease_until = :lease, #result = :result",
+                ConditionExpression="#owner = :owner",
+                ExpressionAttributeNames={"#status": "status", "#result": "result", "#owner": "owner"},
+                ExpressionAttributeValues={
+                    ":done": {"S": "done"},
+                    ":lease": {"N": repr(now + CLAIM_LEASE)},
+                    ":result": {"S": json.dumps(result)},
+                    ":owner": {"S": owner}
+                }
+            )
+        except Exception as e:
+            if not _condition_failed(e):
+                raise
+            # the lease ran out and someone else holds the claim now; their outcome stands
+            log.warning("Claim lost before completion", key=key)
+
+    def release(self, key, owner):
+        try:
+            aws_client("dynamodb").delete_item(
+                TableName=self.table,
+                Key={"claim_key": {"S": key}},
+                ConditionExpression="#owner = :owner",
+                ExpressionAttributeNames={"#owner": "owner"},
+                ExpressionAttributeValues={":owner": {"S": owner}}
+            )
+        except Exception as e:
+            if not _condition_failed(e):
+                raise
+
+
+_store = None
+
+
+def get_claim_store():
+    # None when single-flight is off
+    global _store
+    if _store is None and INGEST_SINGLE_FLIGHT != "off":
+        if INGEST_SINGLE_FLIGHT == "local":
+            _store = LocalClaimStore()
+        elif INGEST_SINGLE_FLIGHT == "dynamodb":
+            if not CLAIMS_TABLE:
+                raise ValueError("CLAIMS_TABLE is not set")
+            _store = DynamoClaimStore(CLAIMS_TABLE)
+        else:
+            raise ValueError(f"Unknown INGEST_SINGLE_FLIGHT '{INGEST_SINGLE_FLIGHT}', expected local, dynamodb or off")
+    return _store
+
+
+def claim_owner():
+    return uuid.uuid4().hex
+
+
+def acquire_claims(keys, owner):
+    # {key: None if we hold the claim now, else the other request's claim}, one conditional
+    # write per key, in parallel. A store failure counts as holding the claim: ingest goes
+    # ahead without coalescing rather than failing.
+    store = get_claim_store()
+    keys = list(dict.fromkeys(keys))
+    if store is None or not keys:
+        return {key: None for key in keys}
+    claims = {}
+    for key, claim in zip(keys, map_concurrently(lambda key: store.acquire(key, owner), keys)):
+        if isinstance(claim, Exception):
+            log.warning("Claim failed, ingesting without it", key=key, error=repr(claim))
+            claim = None
+        claims[key] = claim
+    return claims
+
+
+def complete_claim(key, owner, result):
+    store = get_claim_store()
+    if store is None:
+        return
+    try:
+        store.complete(key, owner, result)
+    except Exception as e:
+        log.warning("Claim completion failed", key=key, error=repr(e))
+
+
+def release_claim(key, owner):
+    store = get_claim_store()
+    if store is None:
+        return
+    try:
+        store.release(key, owner)
+    except Exception as e:
+        log.warning("Claim release failed", key=key, error=repr(e))
+
+
+def await_claims(keys, deadline=None):
+    # waits for other requests' claims; returns {key: their result, or None when the claim
+    # was released, its lease ran out or the wait hit the deadline}
+    store = get_claim_store()
+    keys = list(dict.fromkeys(keys))
+    if store is None or not keys:
+        return {key: None for key in keys}
+    deadline = CLAIM_WAIT if deadline is None else deadline
+    started = time.monotonic()
+    delay = CLAIM_POLL_INTERVAL
+    results = {}
+    pending = keys
+    while pending:
+        waiting = []
+        for key, claim in zip(pending, map_concurrently(store.get, pending)):
+            if isinstance(claim, Exception) or claim is None or claim["lease_until"] < time.time():
+                results[key] = None
+            elif claim["status"] == "done":
+                results[key] = claim["result"]
+            else:
+                waiting.append(key)
+        pending = waiting
+        if pending and time.monotonic() - started + delay > deadline:
+            results.update({key: None for key in pending})
+            break
+        if pending:
+            time.sleep(delay)
+            delay = min(delay * 2, CLAIM_POLL_INTERVAL_MAX)
+    return results
+
+
+def single_flight(key, fn, deadline=None):
+    # fn() runs once across concurrent callers with the same key; the others wait and get
+    # its result (it has to be JSON-serializable). Returns (result, shared). If the running
+    # call fails, a waiting caller takes the claim over and runs fn() itself.
+    deadline = CLAIM_WAIT if deadline is None else deadline
+    started = time.monotonic()
+    owner = claim_owner()
+    while True:
+        claim = acquire_claims([key], owner)[key]
+        if claim is None:
+            break
+        if claim["status"] == "done":
+            return claim["result"], True
+        remaining = deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            raise ClaimTimeout(f"Statement is still being ingested by another request after {deadline}s")
+        result = await_claims([key], deadline=remaining)[key]
+        if result is not None:
+            return result, True
+
+    try:
+        result = fn()
+    except BaseException:
+        release_claim(key, owner)
+        raise
+    complete_claim(key, owner, result)
+    return result, False
@@ -0,0 +1,122 @@
+import math
+import os
+
+#################################
+# Vector storage profiles
+#
+# AOSS_VECTOR_PROFILE picks how statement-vector is stored in the index:
+#   float - 32-bit floats (original behaviour)
+#   fp16  - faiss HNSW with the fp16 scalar-quantization encoder (half the graph memory)
+#   byte  - 8-bit vectors; quantized client side with a per-vector scale, which keeps cosine
+#           similarity intact; the full-precision vector is kept in _source only
+#   pq    - faiss product quantization; needs a model trained out of band (AOSS_PQ_MODEL_ID)
+# With KNN_RESCORE=1 the kNN query over-fetches by KNN_RESCORE_OVERSAMPLE and re-ranks the
+# candidates on their full-precision vectors before returning.
+#################################
+
+VECTOR_FIELD = "statement-vector"
+FULL_VECTOR_FIELD = "statement-vector-full"
+VECTOR_DIMENSION = 1536
+PROFILES = ("float", "fp16", "byte", "pq")
+
+# faiss supports efficient filtered kNN (see knn.py); existing nmslib indexes keep working
+# with post filtering
+KNN_ENGINE = os.environ.get("AOSS_KNN_ENGINE", "faiss")
+VECTOR_PROFILE = os.environ.get("AOSS_VECTOR_PROFILE", "float")
+PQ_MODEL_ID = os.environ.get("AOSS_PQ_MODEL_ID", "")
+RESCORE = os.environ.get("KNN_RESCORE", "0") == "1"
+RESCORE_OVERSAMPLE = float(os.environ.get("KNN_RESCORE_OVERSAMPLE", "2"))
+
+
+def vector_mapping(profile=VECTOR_PROFILE):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown vector profile '{profile}', expected one of {PROFILES}")
+
+    if profile == "pq":
+        if not PQ_MODEL_ID:
+            raise ValueError("The pq profile needs AOSS_PQ_MODEL_ID (a trained faiss model)")
+        return {"type": "knn_vector", "model_id": PQ_MODEL_ID}
+
+    method = {
+        "name": "hnsw",
+        "space_type": "cosinesimil",
+        "engine": KNN_ENGINE,
+        "parameters": {
+            "ef_construction": 512,
+            "m": 32
+        }
+    }
+    field = {
+        "type": "knn_vector",
+        "dimension": VECTOR_DIMENSION,
+        "method": method
+    }
+    if profile == "fp16":
+        method["engine"] = "faiss"
+        method["parameters"]["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+    elif profile == "byte":
+        field["data_type"] = "byte"
+    return field
+
+
+def vector_properties(profile=VECTOR_PROFILE):
+    properties = {VECTOR_FIELD: vector_mapping(profile)}
+    if profile == "byte":
+        # full precision for rescoring/migration, stored but neither indexed nor in doc values
+        properties[FULL_VECTOR_FIELD] = {"type": "float", "index": False, "doc_values": False}
+    return properties
+
+
+def quantize_byte(vector):
+    peak = max((abs(x) for x in vector), default=0.0) or 1.0
+    scale = 127.0 / peak
+    return [max(-128, min(127, round(x * scale))) for x in vector]
+
+
+def query_vector(vector, profile=VECTOR_PROFILE):
+    return quantize_byte(vector) if profile == "byte" else vector
+
+
+def document_vectors(vector, profile=VECTOR_PROFILE):
+    # the vector fields of a statement document for the given profile
+    if profile == "byte":
+        return {VECTOR_FIELD: quantize_byte(vector), FULL_VECTOR_FIELD: vector}
+    return {VECTOR_FIELD: vector}
+
+
+def full_vector(source):
+    return source.get(FULL_VECTOR_FIELD) or source.get(VECTOR_FIELD)
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    # rounding can push identical vectors just past 1
+    return max(-1.0, min(1.0, dot / norm)) if norm else 0.0
+
+
+def cosine_score(similarity):
+    # the score OpenSearch reports for cosinesimil, so thresholds keep their meaning
+    return 1 / (2 - similarity)
+
+
+# identical vectors score 1 give or take float rounding (float32 in the engine, float64 here)
+EXACT_SCORE_EPSILON = 1e-5
+
+
+def is_exact_score(score):
+    return score >= 1 - EXACT_SCORE_EPSILON
+
+
+def rescore(hits, query, size, keep_vectors=False):
+    # re-rank candidates on full-precision vectors; drops the vectors from _source afterwards
+    for hit in hits:
+        source = hit["_source"]
+        vector = full_vector(source)
+        if vector is not None:
+            hit["_score"] = cosine_score(cosine(query, vector))
+        if not keep_vectors:
+            source.pop(VECTOR_FIELD, None)
+            source.pop(FULL_VECTOR_FIELD, None)
+    hits.sort(key=lambda hit: hit["_score"], reverse=True)
+    return hits[:size]
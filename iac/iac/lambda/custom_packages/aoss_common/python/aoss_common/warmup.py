@@ -0,0 +1,60 @@
+import os
+import time
+
+from aoss_common import log
+
+#################################
+# Init-phase warmup
+#
+# Lambda runs module-level code in the init phase, before the first request and (for
+# on-demand functions) with a CPU boost, so each handler calls warmup() at import to build
+# the clients its route needs there instead of on the first request: "aoss" builds the
+# clients and opens the keep-alive connection through the memoized index check,
+# "comprehendmedical", "sqs" and "dynamodb" build the boto3 clients (botocore loads its
+# service models on the first client). Every step is best-effort: the index check uses
+# INIT_WARMUP_TIMEOUT as its request timeout, failures are logged and the request path
+# builds the client as before. INIT_WARMUP=0 turns it off (local runs).
+#################################
+
+INIT_WARMUP = os.environ.get("INIT_WARMUP", "1") == "1"
+INIT_WARMUP_TIMEOUT = float(os.environ.get("INIT_WARMUP_TIMEOUT", "1"))
+
+
+def _warm_aoss():
+    from aoss_common.client import get_write_client
+    from aoss_common.indices import index_check
+    index_check(timeout=INIT_WARMUP_TIMEOUT)
+    get_write_client()
+
+
+def _warm_comprehendmedical():
+    from aoss_common.entities import get_comprehend_client
+    get_comprehend_client()
+
+
+def _warm_client(service):
+    from aoss_common.session import aws_client
+    return lambda: aws_client(service)
+
+
+STEPS = {
+    "aoss": _warm_aoss,
+    "comprehendmedical": _warm_comprehendmedical,
+    "sqs": _warm_client("sqs"),
+    "dynamodb": _warm_client("dynamodb")
+}
+
+
+def warmup(*services):
+    if not INIT_WARMUP:
+        return {}
+    timings = {}
+    for service in services:
+        started = time.perf_counter()
+        try:
+            STEPS[service]()
+        except Exception as e:
+            log.warning("Warmup step failed", service=service, error=repr(e))
+        timings[service] = round((time.perf_counter() - started) * 1000, 1)
+    log.info("Init warmup", ms=timings)
+    return timings
@@ -0,0 +1,54 @@
+import argparse
+import fnmatch
+import os
+import shutil
+import tempfile
+import zipfile
+
+#################################
+# Drops files the Lambda runtime never loads from a layer zip (see README.md):
+#   python trim_layer.py layers/aoss-layer.zip
+# Type stubs, console scripts, installer leftovers and binaries built for another platform
+# only add to the layer size (download + unzip on cold start). opensearchpy/_async stays:
+# opensearchpy.helpers imports it unconditionally.
+#################################
+
+TRIM_PATTERNS = [
+    "*.pyi",
+    "*/py.typed",
+    "*.pyd",
+    "*.exe",
+    "python/bin/*",
+    "python/install/*",
+    "*.dist-info/*",
+    "*/tests/*"
+]
+
+
+def trimmed(name):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in TRIM_PATTERNS)
+
+
+def trim_layer(path):
+    removed, removed_bytes = 0, 0
+    fd, tmp = tempfile.mkstemp(suffix=".zip", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            if trimmed(info.filename):
+                removed += 1
+                removed_bytes += info.file_size
+                continue
+            target.writestr(info, source.read(info), compress_type=zipfile.ZIP_DEFLATED)
+    shutil.copymode(path, tmp)
+    shutil.move(tmp, path)
+    return removed, removed_bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove files Lambda never loads from a layer zip")
+    parser.add_argument("layer", help="layer zip, rewritten in place")
+    args = parser.parse_args()
+    before = os.path.getsize(args.layer)
+    removed, removed_bytes = trim_layer(args.layer)
+    print(f"removed {removed} files ({removed_bytes / 1024:.0f} KB uncompressed), zip {before / 1024:.0f} KB -> {os.path.getsize(args.layer) / 1024:.0f} KB")
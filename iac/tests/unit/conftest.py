@@ -0,0 +1,97 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+#################################
+# Unit tests for the aoss functions, run offline from the iac directory:
+#   python -m pytest tests/unit
+# The handlers and aoss_common read their settings at import time, so the defaults below
+# are set before anything is imported; SEARCH_BACKEND=memory keeps every call in process.
+#################################
+
+IAC_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LAMBDA_DIR = os.path.join(IAC_DIR, "iac", "lambda")
+LAYER_DIR = os.path.join(LAMBDA_DIR, "custom_packages", "aoss_common", "python")
+
+os.environ.setdefault("AOSS_ENDPOINT", "https://localhost")
+os.environ.setdefault("EMBEDDINGS_API", "http://localhost/embeddings")
+os.environ.setdefault("EMBEDDINGS_API_KEY", "local")
+os.environ.setdefault("CORS_ALLOW_UI", "*")
+os.environ.setdefault("LOCALHOST_ORIGIN", "")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+os.environ["SEARCH_BACKEND"] = "memory"
+os.environ["INIT_WARMUP"] = "0"
+os.environ["METRICS"] = "0"
+os.environ["INGEST_POLL_INTERVAL"] = "0.01"
+sys.path.insert(0, LAYER_DIR)
+
+
+def load_handler(name):
+    spec = importlib.util.spec_from_file_location(f"test_{name}", os.path.join(LAMBDA_DIR, "aoss", name, "index.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def memory_backend():
+    # a fresh in-memory collection with both indices, as the bootstrap function leaves it,
+    # and no claims left over from another test
+    from aoss_common import backend, indices, searchcache, singleflight
+    from aoss_common.similar import SIMILAR_INDEX_NAME, SIMILAR_MAPPING
+    from aoss_common.nearcache import clear_near_cache
+    from aoss_common.searchcache import search_cache
+    store = backend.MemoryBackend()
+    backend.set_backend(store)
+    indices.invalidate_index()
+    clear_near_cache()
+    search_cache.clear()
+    singleflight._store = None
+    searchcache._generation = None
+    indices.ensure_index()
+    indices.ensure_index(SIMILAR_INDEX_NAME, SIMILAR_MAPPING)
+    yield store
+    backend.set_backend(None)
+    indices.invalidate_index()
+
+
+def fake_embeddings(statement):
+    # bag of hashed words: the same statement gives the same vector, shared words make
+    # statements near each other
+    import hashlib
+    import numpy as np
+    vector = np.zeros(1536)
+    for word in statement.split():
+        seed = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16)
+        vector += np.random.default_rng(seed).normal(size=1536)
+    return vector.tolist()
+
+
+def fake_metadata(statement):
+    return {"symptom": [statement.split()[-1]]}, ["topic"]
+
+
+@pytest.fixture
+def fake_enrichment(monkeypatch):
+    # Comprehend Medical and the embeddings API stand-ins, patched wherever they were imported
+    from aoss_common import ingest
+    calls = []
+
+    def embeddings(statement):
+        calls.append(statement)
+        return fake_embeddings(statement)
+
+    def patch(*modules):
+        for module in modules:
+            if hasattr(module, "generate_embeddings"):
+                monkeypatch.setattr(module, "generate_embeddings", embeddings)
+            if hasattr(module, "generate_statement_metadata"):
+                monkeypatch.setattr(module, "generate_statement_metadata", fake_metadata)
+
+    patch(ingest)
+    patch.calls = calls
+    return patch
@@ -0,0 +1,81 @@
+import pytest
+from opensearchpy.exceptions import NotFoundError
+
+from aoss_common import backend
+
+
+@pytest.fixture
+def store():
+    store = backend.MemoryBackend()
+    store.create_index("statements", {"mappings": {"properties": {}}})
+    for statement, intent, symptoms, created in (
+        ("pain in my knee", "Inform", ["pain", "knee"], 3),
+        ("rash on my arm", "Ask", ["rash"], 1),
+        ("knee swelling", "Inform", ["swelling"], 2)
+    ):
+        store.index("statements", {"statement": statement, "created": created, "background": {"intent": intent}, "metadata": {"symptom": symptoms}}, id=statement)
+    return store
+
+
+def statements(response):
+    return [hit["_id"] for hit in response["hits"]["hits"]]
+
+
+def test_filters_cover_what_the_functions_send(store):
+    def search(query):
+        return sorted(statements(store.search("statements", {"query": query})))
+    assert search({"terms": {"metadata.symptom": ["knee", "rash"]}}) == ["pain in my knee", "rash on my arm"]
+    assert search({"match": {"statement": "Knee"}}) == ["knee swelling", "pain in my knee"]
+    assert search({"bool": {
+        "filter": [{"term": {"background.intent": "Inform"}}],
+        "must_not": {"ids": {"values": ["knee swelling"]}}
+    }}) == ["pain in my knee"]
+    assert search({"bool": {"should": [{"term": {"metadata.symptom": "rash"}}, {"term": {"metadata.symptom": "swelling"}}]}}) == ["knee swelling", "rash on my arm"]
+    with pytest.raises(ValueError, match="regexp"):
+        search({"regexp": {"statement": "kn.*"}})
+
+
+def test_sorted_pages_continue_after_the_last_sort_values(store):
+    body = {"size": 2, "sort": [{"created": "desc"}], "_source": ["statement"]}
+    first = store.search("statements", body)
+    assert statements(first) == ["pain in my knee", "knee swelling"]
+    assert first["hits"]["hits"][0]["_source"] == {"statement": "pain in my knee"}
+    rest = store.search("statements", {**body, "search_after": first["hits"]["hits"][-1]["sort"]})
+    assert statements(rest) == ["rash on my arm"]
+
+
+def test_scroll_walks_every_document_once(store):
+    page = store.search("statements", {"size": 2, "_source": False}, scroll="1m")
+    seen = statements(page)
+    while page["hits"]["hits"]:
+        page = store.scroll(page["_scroll_id"], "1m")
+        seen += statements(page)
+    assert sorted(seen) == ["knee swelling", "pain in my knee", "rash on my arm"]
+
+
+def test_bulk_reports_each_item(store, monkeypatch):
+    monkeypatch.setattr(backend, "_backend", store)
+    outcomes = backend.bulk_write([
+        ("update", "statements", "rash on my arm", {"doc": {"metadata": {"symptom": ["rash", "itch"]}}}),
+        ("delete", "statements", "knee swelling", None),
+        ("delete", "statements", "never indexed", None),
+        ("index", "statements", None, {"statement": "headache"})
+    ])
+    assert [outcome["ok"] for outcome in outcomes] == [True, True, False, True]
+    assert store.search("statements", {"query": {"term": {"metadata.symptom": "itch"}}})["hits"]["total"]["value"] == 1
+    assert outcomes[2]["error"]["type"] == "not_found"
+
+
+def test_a_missing_index_is_index_not_found(store):
+    with pytest.raises(NotFoundError) as error:
+        store.search("missing", {"query": {"match_all": {}}})
+    assert error.value.error == "index_not_found_exception"
+    assert store.msearch([{"index": "missing"}, {}, {"index": "statements"}, {"size": 0}])["responses"][0]["status"] == 404
+
+
+def test_a_backend_must_implement_every_call():
+    class Partial(backend.SearchBackend):
+        def search(self, index, body, scroll=None):
+            return {}
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+from tests.unit.conftest import IAC_DIR
+
+
+def bench(tmp_path, *args):
+    results = tmp_path / "results.jsonl"
+    subprocess.run(
+        [sys.executable, os.path.join(IAC_DIR, "benchmarks", "bench_handlers.py"), "--requests", "20", "--corpus", "10", "--results", str(results), *args],
+        # conftest turns metrics off for the tests; the stage timings come from them
+        cwd=IAC_DIR, env={**os.environ, "METRICS": "1"}, check=True, capture_output=True, timeout=120
+    )
+    return [json.loads(line) for line in results.read_text().splitlines()]
+
+
+def test_handler_benchmark_records_every_request_and_its_stages(tmp_path):
+    [run] = bench(tmp_path, "--label", "smoke")
+    stages = run["stages"]
+    assert run["label"] == "smoke"
+    assert stages["handler.ingest_post"]["count"] + stages["handler.search_post"]["count"] == 20
+    assert stages["handler.ingest_post"]["errors"] == stages["handler.search_post"]["errors"] == 0
+    assert {"stage.search.Embeddings", "stage.ingest.Total", "opensearch.read"} <= set(stages)
+
+
+def test_stand_in_faults_show_up_as_handler_errors(tmp_path):
+    [run] = bench(tmp_path, "--embeddings-errors", "1")
+    assert run["stages"]["handler.search_post"]["errors"] > 0
@@ -0,0 +1,11 @@
+from aoss_common import client
+
+
+def test_writes_are_not_resent_after_a_timeout():
+    reads, writes = client.build_client().transport, client.build_write_client().transport
+    assert reads.retry_on_timeout and 504 in reads.retry_on_status
+    assert not writes.retry_on_timeout and 504 not in writes.retry_on_status
+    assert writes.max_retries == client.MAX_RETRIES
+    # both fit, retries included, in the 3 minute function timeout
+    assert client.TIMEOUT * (client.MAX_RETRIES + 1) < 180
+    assert client.WRITE_TIMEOUT < 180
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+from tests.unit.conftest import LAMBDA_DIR, LAYER_DIR
+
+
+def start(name, **env):
+    # a fresh interpreter loading one handler, as the Lambda init phase does
+    script = (
+        "import importlib.util, json, sys\n"
+        f"spec = importlib.util.spec_from_file_location('index', {os.path.join(LAMBDA_DIR, 'aoss', name, 'index.py')!r})\n"
+        "module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)\n"
+        "print(json.dumps(sorted(name.split('.')[0] for name in sys.modules)))\n"
+    )
+    env = {
+        "AOSS_ENDPOINT": "https://localhost:1",
+        "EMBEDDINGS_API": "http://localhost/embeddings",
+        "EMBEDDINGS_API_KEY": "local",
+        "CORS_ALLOW_UI": "*",
+        "LOCALHOST_ORIGIN": "",
+        "AWS_REGION": "us-east-1",
+        "AWS_ACCESS_KEY_ID": "test",
+        "AWS_SECRET_ACCESS_KEY": "test",
+        "PATH": os.environ.get("PATH", ""),
+        "PYTHONPATH": LAYER_DIR,
+        **env
+    }
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_loading_a_handler_leaves_boto3_unimported():
+    # boto3 is imported by the first AWS call, not at init (session.py)
+    for name in ("search_all", "delete_post", "search_post", "ingest_post"):
+        modules = start(name, INIT_WARMUP="0")
+        assert "boto3" not in modules and "botocore" not in modules
+
+
+def test_a_failed_warmup_does_not_fail_the_init_phase():
+    # nothing listens on localhost:1, so the index check of the warmup fails
+    modules = start("search_all", INIT_WARMUP="1", INIT_WARMUP_TIMEOUT="0.5")
+    assert "opensearchpy" in modules
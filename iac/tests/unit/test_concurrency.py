@@ -0,0 +1,39 @@
+import threading
+import time
+
+import pytest
+
+from aoss_common import concurrency
+
+
+def test_stages_run_side_by_side():
+    barrier = threading.Barrier(2, timeout=2)
+
+    def stage(result):
+        # only returns once both stages are running
+        barrier.wait()
+        return result
+    assert concurrency.run_concurrently({"metadata": lambda: stage("meta"), "embeddings": lambda: stage([1.0])}) == {"metadata": "meta", "embeddings": [1.0]}
+
+
+def test_a_stage_that_overruns_or_fails_fails_the_request():
+    with pytest.raises(concurrency.StageTimeout, match="slow"):
+        concurrency.run_concurrently({"fast": lambda: 1, "slow": lambda: time.sleep(0.5)}, timeouts={"slow": 0.05})
+
+    def failing():
+        raise RuntimeError("comprehend unavailable")
+    with pytest.raises(RuntimeError, match="comprehend unavailable"):
+        concurrency.run_concurrently({"metadata": failing, "embeddings": lambda: [1.0]})
+
+
+def test_mapped_failures_are_returned_in_place():
+    def embed(statement):
+        if statement == "bad":
+            raise ValueError(statement)
+        if statement == "slow":
+            time.sleep(0.5)
+        return statement.upper()
+    results = concurrency.map_concurrently(embed, ["knee", "bad", "slow", "arm"], timeout=0.2)
+    assert results[0] == "KNEE" and results[3] == "ARM"
+    assert isinstance(results[1], ValueError)
+    assert isinstance(results[2], concurrency.StageTimeout)
@@ -0,0 +1,23 @@
+from aoss_common import consistency
+from aoss_common.client import AOSS_INDEX_NAME
+
+
+def test_written_documents_are_waited_for_by_id_and_content(memory_backend):
+    doc_id = memory_backend.index(AOSS_INDEX_NAME, {"statement": "knee pain", "metadata": {"symptom": ["pain"]}})["_id"]
+    assert consistency.wait_for_writes([consistency.expect_document(doc_id)])
+
+    updated = consistency.expect_document(doc_id, lambda source: "swelling" in source["metadata"]["symptom"])
+    assert consistency.pending_writes(memory_backend, [updated]) == [updated]
+    memory_backend.update(AOSS_INDEX_NAME, doc_id, {"doc": {"metadata": {"symptom": ["pain", "swelling"]}}})
+    assert consistency.wait_for_writes([updated])
+
+
+def test_waiting_gives_up_at_the_deadline(memory_backend):
+    assert consistency.wait_for_writes([consistency.expect_document("never-written")], deadline=0.05) is False
+
+
+def test_ack_mode_and_failed_writes_do_not_wait(memory_backend, monkeypatch):
+    # a failed write has no id to wait for
+    assert consistency.wait_for_writes([consistency.expect_document(None)], deadline=0)
+    monkeypatch.setattr(consistency, "CONSISTENCY_MODE", "ack")
+    assert consistency.wait_for_writes([consistency.expect_document("never-written")], deadline=0)
@@ -0,0 +1,31 @@
+import json
+
+from tests.unit.conftest import load_handler
+from aoss_common import consistency
+from aoss_common.client import AOSS_INDEX_NAME
+
+
+def test_delete_waits_for_the_document_to_disappear_before_bumping(memory_backend, monkeypatch):
+    module = load_handler("delete_post")
+    doc_id = memory_backend.index(AOSS_INDEX_NAME, {"statement": "knee pain"})["_id"]
+
+    order = []
+    real_pending = consistency.pending_writes
+
+    def pending_writes(client, expectations):
+        pending = real_pending(client, expectations)
+        order.append(("poll", [doc_id for doc_id, _, _ in pending]))
+        return pending
+    monkeypatch.setattr(consistency, "pending_writes", pending_writes)
+    monkeypatch.setattr(module, "bump_generation", lambda **kwargs: order.append(("bump", kwargs)))
+
+    response = module.handler({"body": json.dumps({"id": doc_id})}, None)
+    assert response["statusCode"] == 200
+    assert order == [("poll", []), ("bump", {"visible": True})]
+
+
+def test_deleted_expectation_stays_pending_while_the_document_is_visible(memory_backend):
+    doc_id = memory_backend.index(AOSS_INDEX_NAME, {"statement": "knee pain"})["_id"]
+    assert consistency.pending_writes(memory_backend, [consistency.expect_deleted(doc_id)])
+    memory_backend.delete(AOSS_INDEX_NAME, doc_id)
+    assert consistency.pending_writes(memory_backend, [consistency.expect_deleted(doc_id)]) == []
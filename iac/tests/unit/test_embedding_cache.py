@@ -0,0 +1,44 @@
+import pytest
+
+from aoss_common import embeddings
+from aoss_common.cache import ByteLRU, FileStore
+
+
+@pytest.fixture
+def api(monkeypatch):
+    calls = []
+
+    def request_embeddings(statement):
+        calls.append(statement)
+        return [0.5, -1.25, float(len(statement))]
+    monkeypatch.setattr(embeddings, "request_embeddings", request_embeddings)
+    monkeypatch.setattr(embeddings, "_memory", ByteLRU(1024, sizeof=lambda vector: vector.itemsize * len(vector)))
+    monkeypatch.setattr(embeddings, "_store", None)
+    return calls
+
+
+def test_repeated_statements_are_embedded_once(api):
+    assert embeddings.generate_embeddings("pain in my knee") == [0.5, -1.25, 15.0]
+    assert embeddings.generate_embeddings("pain  in my knee ") == [0.5, -1.25, 15.0]
+    assert api == ["pain in my knee"]
+
+
+def test_the_persistent_tier_outlives_the_container(api, tmp_path):
+    embeddings.set_store(FileStore(str(tmp_path)))
+    embeddings.generate_embeddings("pain in my knee")
+
+    # a new container: empty memory tier, same store
+    embeddings._memory.clear()
+    assert embeddings.generate_embeddings("pain in my knee") == [0.5, -1.25, 15.0]
+    assert api == ["pain in my knee"]
+    assert embeddings.embedding_cache_stats()["store"]["hits"] >= 1
+
+
+def test_memory_tier_is_bounded_in_bytes():
+    lru = ByteLRU(10, sizeof=len)
+    lru.put("a", b"12345")
+    lru.put("b", b"12345")
+    lru.get("a")
+    lru.put("c", b"12345")
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (b"12345", None, b"12345")
+    assert lru.stats()["evictions"] == 1
@@ -0,0 +1,92 @@
+import json
+import time
+
+import pytest
+
+from tests.unit.conftest import fake_metadata, load_handler
+from aoss_common import embeddings, embeddings_client
+from aoss_common.embeddings_client import EmbeddingsClient, EmbeddingsError
+
+
+class Response:
+    def __init__(self, status_code, vector=None):
+        self.status_code = status_code
+        self.text = "error"
+        self.vector = vector
+
+    def json(self):
+        return self.vector
+
+
+def answers(client, monkeypatch, *responses):
+    # session.post returns the given responses in turn; a (seconds, response) pair is slow
+    calls = []
+
+    def post(*args, **kwargs):
+        response = responses[min(len(calls), len(responses) - 1)]
+        calls.append(kwargs["json"]["inputText"])
+        if isinstance(response, tuple):
+            time.sleep(response[0])
+            response = response[1]
+        return response
+    monkeypatch.setattr(client.session, "post", post)
+    return calls
+
+
+def test_embed_raises_when_the_api_gives_no_vector(monkeypatch):
+    client = EmbeddingsClient(url="http://localhost/embeddings", api_key="local")
+    monkeypatch.setattr(client.session, "post", lambda *args, **kwargs: Response(400))
+    with pytest.raises(EmbeddingsError, match="400"):
+        client.embed("pain in my knee")
+
+
+@pytest.mark.parametrize("name", ["ingest_post", "search_post"])
+def test_handlers_fail_before_searching_without_embeddings(memory_backend, monkeypatch, name):
+    module = load_handler(name)
+    searches = []
+
+    def unavailable(statement):
+        raise EmbeddingsError("Embeddings API unavailable after 3 attempts")
+    monkeypatch.setattr(embeddings, "request_embeddings", unavailable)
+    monkeypatch.setattr(module, "generate_statement_metadata", fake_metadata)
+    search, msearch = memory_backend.search, memory_backend.msearch
+
+    def recorded(call):
+        def record(*args, **kwargs):
+            searches.append(json.dumps(args, default=str))
+            return call(*args, **kwargs)
+        return record
+    monkeypatch.setattr(memory_backend, "search", recorded(search))
+    monkeypatch.setattr(memory_backend, "msearch", recorded(msearch))
+
+    body = {"statement": f"{name} without embeddings", "intent": "Inform", "severity": "Low", "source": "Patient", "topics": [], "medicalConditions": []}
+    response = module.handler({"body": json.dumps(body)}, None)
+    assert response["statusCode"] == 500
+    assert json.loads(response["body"])["msg"] == "Embeddings API unavailable after 3 attempts"
+    assert not [body for body in searches if '"knn"' in body]
+
+
+def test_throttling_and_server_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(embeddings_client, "EMBEDDINGS_BACKOFF_BASE", 0.001)
+    client = EmbeddingsClient(url="http://localhost/embeddings", api_key="local")
+    calls = answers(client, monkeypatch, Response(429), Response(503), Response(200, [0.5]))
+    assert client.embed("pain in my knee") == [0.5]
+    assert len(calls) == 3 and client.stats()["retries"] == 2
+
+    calls = answers(client, monkeypatch, Response(503))
+    with pytest.raises(EmbeddingsError, match=f"after {embeddings_client.EMBEDDINGS_MAX_RETRIES + 1} attempts"):
+        client.embed("pain in my knee")
+    assert len(calls) == embeddings_client.EMBEDDINGS_MAX_RETRIES + 1
+
+
+def test_a_slow_call_is_hedged_and_the_first_answer_wins(monkeypatch):
+    monkeypatch.setattr(embeddings_client, "EMBEDDINGS_HEDGE", True)
+    client = EmbeddingsClient(url="http://localhost/embeddings", api_key="local")
+    client._latencies.extend([10.0] * embeddings_client.EMBEDDINGS_HEDGE_MIN_SAMPLES)
+    calls = answers(client, monkeypatch, (0.5, Response(200, [0.1])), Response(200, [0.5]))
+
+    started = time.monotonic()
+    assert client.embed("pain in my knee") == [0.5]
+    assert time.monotonic() - started < 0.4
+    assert len(calls) == 2
+    assert (client.stats()["hedges"], client.stats()["hedge_wins"]) == (1, 1)
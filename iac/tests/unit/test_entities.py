@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from aoss_common import entities
+from aoss_common.cache import ByteLRU, FileStore
+
+
+class Comprehend:
+    def __init__(self):
+        self.calls = []
+
+    def detect_entities_v2(self, Text):
+        self.calls.append(Text)
+        return {"Entities": [
+            {"Text": "Knee", "Category": "ANATOMY", "Score": 0.95},
+            {"Text": "pain", "Category": "MEDICAL_CONDITION", "Score": 0.9},
+            {"Text": "my", "Category": "ANATOMY", "Score": 0.2}
+        ]}
+
+
+@pytest.fixture
+def comprehend(monkeypatch):
+    client = Comprehend()
+    monkeypatch.setattr(entities, "comprehend_client", client)
+    monkeypatch.setattr(entities, "_memory", ByteLRU(1024 * 1024, sizeof=len, ttl=entities.ENTITIES_CACHE_TTL))
+    monkeypatch.setattr(entities, "_store", None)
+    return client
+
+
+def test_thresholded_entities_are_cached_per_statement(comprehend):
+    meta, topics = entities.generate_statement_metadata("pain in my Knee")
+    assert meta == {"anatomy": ["knee"], "medicalcondition": ["pain"]}
+    assert sorted(topics) == ["anatomy", "medical condition"]
+
+    # callers get their own copy to modify
+    meta["anatomy"].append("changed")
+    assert entities.generate_statement_metadata("pain in  my Knee")[0] == {"anatomy": ["knee"], "medicalcondition": ["pain"]}
+    assert comprehend.calls == ["pain in my Knee"]
+
+
+def test_stored_entries_are_shared_until_they_expire(comprehend, tmp_path):
+    entities.set_store(FileStore(str(tmp_path)))
+    entities.generate_statement_metadata("pain in my Knee")
+
+    # a new container reads the stored entry
+    entities._memory.clear()
+    entities.generate_statement_metadata("pain in my Knee")
+    assert len(comprehend.calls) == 1
+
+    key = entities.entities_key("pain in my Knee")
+    entities._memory.clear()
+    stale = json.loads(entities._store.get(key))
+    entities._store.put(key, json.dumps({**stale, "expires": 0}).encode("utf-8"))
+    entities.generate_statement_metadata("pain in my Knee")
+    assert len(comprehend.calls) == 2
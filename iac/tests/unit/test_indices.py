@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from tests.unit.conftest import load_handler
+from aoss_common import backend, indices
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.similar import SIMILAR_INDEX_NAME
+
+
+@pytest.fixture
+def empty_backend():
+    store = backend.MemoryBackend()
+    backend.set_backend(store)
+    indices.invalidate_index()
+    indices.invalidate_index(SIMILAR_INDEX_NAME)
+    yield store
+    backend.set_backend(None)
+    indices.invalidate_index()
+    indices.invalidate_index(SIMILAR_INDEX_NAME)
+
+
+def test_bootstrap_creates_the_indices_once(empty_backend):
+    module = load_handler("bootstrap")
+    assert json.loads(module.handler({}, None)["body"]) == {AOSS_INDEX_NAME: True, SIMILAR_INDEX_NAME: True}
+    assert json.loads(module.handler({}, None)["body"]) == {AOSS_INDEX_NAME: False, SIMILAR_INDEX_NAME: False}
+
+
+def test_existence_is_remembered_until_an_index_not_found(empty_backend, monkeypatch):
+    checks = []
+    real_exists = empty_backend.index_exists
+    monkeypatch.setattr(empty_backend, "index_exists", lambda index_name, timeout=None: checks.append(index_name) or real_exists(index_name))
+
+    indices.ensure_index()
+    checks.clear()
+    assert indices.index_check() and indices.index_check()
+    assert checks == []
+
+    # the index went away under a warm container: the failed request forgets it
+    del empty_backend.indices[AOSS_INDEX_NAME]
+    response = load_handler("search_all").handler({"queryStringParameters": {}}, None)
+    assert response["statusCode"] == 500
+    assert indices.index_check() is False
+    assert checks == [AOSS_INDEX_NAME]
@@ -0,0 +1,76 @@
+import pytest
+
+from aoss_common import ingest
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.similar import SIMILAR_INDEX_NAME
+
+
+def item(statement):
+    return {"statement": statement, "intent": "Inform", "severity": "Low", "source": "Patient"}
+
+
+def test_near_duplicates_within_a_batch_map_to_the_earlier_create(memory_backend, fake_enrichment):
+    results, _ = ingest.ingest_batch([item("pain in my left knee"), item("headache at night"), item("pain in my knee")])
+
+    assert [result["status"] for result in results] == ["created", "created", "mapped"]
+    assert results[2]["mapped_to"] == [results[0]["id"]]
+    assert "id" not in results[2]
+    links = memory_backend.search(SIMILAR_INDEX_NAME, {"query": {"match_all": {}}})["hits"]["hits"]
+    assert [(link["_source"]["parent-id"], link["_source"]["statement"]) for link in links] == [(results[0]["id"], "pain in my knee")]
+
+
+def test_a_batch_near_duplicate_fails_with_its_parent(memory_backend, fake_enrichment, monkeypatch):
+    real_bulk_write = ingest.bulk_write
+    monkeypatch.setattr(ingest, "bulk_write", lambda actions: [{"ok": False, "error": "rejected"} for _ in actions])
+    results, _ = ingest.ingest_batch([item("pain in my left knee"), item("pain in my knee")])
+    monkeypatch.setattr(ingest, "bulk_write", real_bulk_write)
+
+    assert [result["status"] for result in results] == ["error", "error"]
+    assert memory_backend.search(AOSS_INDEX_NAME, {"query": {"match_all": {}}})["hits"]["hits"] == []
+
+
+def test_batch_reports_one_outcome_per_item_in_request_order(memory_backend, fake_enrichment):
+    first, _ = ingest.ingest_batch([item("pain in my left knee"), item("headache at night")])
+    fake_enrichment.calls.clear()
+
+    results, _ = ingest.ingest_batch([
+        item("Pain in my knee!"),
+        item("pain in my knee"),
+        {"statement": "no intent"},
+        item("Headache at night."),
+        item("rash on my arm")
+    ])
+
+    assert [result["status"] for result in results] == ["mapped", "duplicate", "error", "exact", "created"]
+    assert results[0]["mapped_to"] == [first[0]["id"]]
+    assert results[1]["duplicate_of"] == 0
+    assert results[3]["id"] == first[1]["id"]
+    # repeats and exact matches never reach the embeddings API
+    assert fake_enrichment.calls == ["pain in my knee", "rash on my arm"]
+
+
+def test_exact_lookup_matches_canonical_forms(memory_backend, fake_enrichment):
+    first, _ = ingest.ingest_batch([item("Headache at night")])
+    fake_enrichment.calls.clear()
+
+    assert ingest.find_exact([ingest.statement_hash("headache  at  NIGHT")]) == {ingest.statement_hash("headache at night"): first[0]["id"]}
+    results, writes = ingest.ingest_batch([item("HEADACHE, at night")])
+    assert (results[0]["status"], results[0]["id"], writes) == ("exact", first[0]["id"], [])
+    assert fake_enrichment.calls == []
+
+
+def test_batches_over_the_limit_are_rejected(memory_backend, fake_enrichment):
+    with pytest.raises(ValueError, match="exceeds the limit"):
+        ingest.ingest_batch([item(f"statement {i}") for i in range(ingest.BATCH_MAX_ITEMS + 1)])
+
+
+def test_exact_lookup_finds_every_hash_despite_repeated_documents(memory_backend):
+    # documents indexed before dedupe: one statement many times over
+    knee, rash = ingest.statement_hash("pain in my knee"), ingest.statement_hash("rash on my arm")
+    for _ in range(3):
+        memory_backend.index(AOSS_INDEX_NAME, {"statement": "pain in my knee", "statement-hash": knee})
+    rash_id = memory_backend.index(AOSS_INDEX_NAME, {"statement": "rash on my arm", "statement-hash": rash})["_id"]
+
+    found = ingest.find_exact([knee, rash])
+    assert set(found) == {knee, rash}
+    assert found[rash] == rash_id
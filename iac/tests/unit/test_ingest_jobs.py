@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+
+from tests.unit.conftest import LAMBDA_DIR, LAYER_DIR
+from aoss_common.jobstore import get_job
+
+
+def test_job_status_function_starts_with_the_stack_env():
+    # exactly what apig_stack.py gives fn_aoss_ingest_job_get, plus what the Lambda runtime sets
+    env = {
+        "JOBS_TABLE": "ingest-jobs",
+        "LOCALHOST_ORIGIN": "http://localhost:3000",
+        "AWS_REGION": "us-east-1",
+        "AWS_ACCESS_KEY_ID": "test",
+        "AWS_SECRET_ACCESS_KEY": "test",
+        "PATH": os.environ.get("PATH", ""),
+        "PYTHONPATH": LAYER_DIR
+    }
+    script = (
+        "import importlib.util, sys\n"
+        f"spec = importlib.util.spec_from_file_location('index', {os.path.join(LAMBDA_DIR, 'aoss', 'ingest_job_get', 'index.py')!r})\n"
+        "module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)\n"
+        "print(sorted(name for name in sys.modules if name.startswith('aoss_common')))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "aoss_common.client" not in result.stdout
+    assert "aoss_common.embeddings" not in result.stdout
+
+
+def local_jobs(monkeypatch):
+    from aoss_common import jobs, jobstore
+    monkeypatch.setattr(jobs, "_queue", jobs.LocalQueue())
+    monkeypatch.setattr(jobstore, "_store", jobstore.LocalJobStore())
+    return jobs
+
+
+def item(statement):
+    return {"statement": statement, "intent": "Inform", "severity": "Low", "source": "Patient"}
+
+
+def test_jobs_go_from_queued_to_done(memory_backend, fake_enrichment, monkeypatch):
+    jobs = local_jobs(monkeypatch)
+    first, repeat = jobs.enqueue_ingest([item("pain in my knee"), item("Pain in my knee!")])
+    assert get_job(first)["status"] == "queued"
+
+    assert jobs.drain_local_queue() == 1
+    done, duplicate = get_job(first), get_job(repeat)
+    assert (done["status"], done["outcome"], done["attempts"]) == ("done", "created", 1)
+    assert (duplicate["status"], duplicate["outcome"]) == ("done", "duplicate")
+    assert duplicate["duplicate_of"] == first
+    assert duplicate["id"] == done["id"] is not None
+
+
+def test_a_duplicate_retries_and_fails_with_its_original(memory_backend, fake_enrichment, monkeypatch):
+    from aoss_common import ingest
+    jobs = local_jobs(monkeypatch)
+
+    def unavailable(statement):
+        raise RuntimeError("embeddings unavailable")
+    monkeypatch.setattr(ingest, "generate_embeddings", unavailable)
+    first, repeat = jobs.enqueue_ingest([item("pain in my knee"), item("pain in my knee")])
+
+    assert jobs.process_messages(jobs.get_queue().receive(2)) != []
+    assert [get_job(job_id)["status"] for job_id in (first, repeat)] == ["retrying", "retrying"]
+    jobs.get_queue().messages.clear()
+
+    messages = [{"message_id": str(i), "body": {"job_id": job_id, "created": 0, "item": item("pain in my knee")}, "attempt": jobs.INGEST_MAX_ATTEMPTS} for i, job_id in enumerate((first, repeat))]
+    assert jobs.process_messages(messages) == []
+    failed = get_job(repeat)
+    assert [get_job(job_id)["status"] for job_id in (first, repeat)] == ["failed", "failed"]
+    assert failed["error"] == "embeddings unavailable"
+    assert "id" not in failed
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from tests.unit.conftest import fake_embeddings, load_handler
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.ingest import map_statement, statement_document
+from aoss_common.similar import get_similar_store
+
+
+def ingest(module, statement):
+    body = {"statement": statement, "intent": "Inform", "severity": "Low", "source": "Patient"}
+    return module.handler({"body": json.dumps(body)}, None)
+
+
+def documents(backend):
+    return backend.search(AOSS_INDEX_NAME, {"query": {"match_all": {}}})["hits"]["hits"]
+
+
+def test_an_exact_repeat_skips_enrichment_and_writes(memory_backend, fake_enrichment):
+    module = load_handler("ingest_post")
+    fake_enrichment(module)
+
+    assert ingest(module, "Headache at night")["statusCode"] == 200
+    assert fake_enrichment.calls == ["headache at night"]
+    assert ingest(module, "headache, at NIGHT!")["statusCode"] == 200
+    assert fake_enrichment.calls == ["headache at night"]
+    assert len(documents(memory_backend)) == 1
+
+
+def map_near_duplicate(parents):
+    document = statement_document("pain in my knee", fake_embeddings("pain in my knee"), {"symptom": ["knee"]}, {"intent": "Inform"})
+    return map_statement(document, None, None, [{"_id": parent, "_score": 0.9} for parent in parents] + [{"_id": "unrelated", "_score": 0.5}])
+
+
+def test_links_to_every_near_duplicate_parent_go_in_one_bulk(memory_backend, monkeypatch):
+    requests = []
+    real_bulk = memory_backend.bulk
+    monkeypatch.setattr(memory_backend, "bulk", lambda body: requests.append(body) or real_bulk(body))
+
+    status, writes = map_near_duplicate(["parent-1", "parent-2", "parent-3"])
+    assert (status, len(writes), len(requests)) == ("mapped", 3, 1)
+    pages = get_similar_store().page(["parent-1", "parent-2", "parent-3", "unrelated"])
+    assert [list(pages[parent][0]) for parent in ("parent-1", "parent-2", "parent-3", "unrelated")] == [["pain in my knee"]] * 3 + [[]]
+
+
+def test_only_a_link_failure_on_every_parent_fails_the_ingest(memory_backend, monkeypatch):
+    failing = set()
+    real_bulk = memory_backend.bulk
+
+    def bulk(body):
+        response = real_bulk(body)
+        for position in failing:
+            response["items"][position]["index"]["error"] = {"type": "rejected"}
+        return response
+    monkeypatch.setattr(memory_backend, "bulk", bulk)
+
+    failing.update({0})
+    status, writes = map_near_duplicate(["parent-1", "parent-2"])
+    assert (status, len(writes)) == ("mapped", 1)
+
+    failing.update({0, 1})
+    with pytest.raises(ValueError, match="All similar statement links failed"):
+        map_near_duplicate(["parent-3", "parent-4"])
@@ -0,0 +1,54 @@
+import pytest
+
+from tests.unit.conftest import fake_embeddings
+from aoss_common import knn
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.nearcache import clear_near_cache
+from aoss_common.vectors import document_vectors, FULL_VECTOR_FIELD
+
+
+@pytest.fixture
+def two_docs(memory_backend, monkeypatch):
+    for statement in ("knee pain at night", "back pain in the morning", "headache"):
+        memory_backend.index(AOSS_INDEX_NAME, {"statement": statement, **document_vectors(fake_embeddings(statement)), "metadata": {"symptom": [statement.split()[0]]}})
+    clear_near_cache()
+    searches = []
+    real_search = memory_backend.search
+
+    def search(index, body, scroll=None):
+        searches.append(body)
+        return real_search(index, body, scroll)
+    monkeypatch.setattr(memory_backend, "search", search)
+    return searches
+
+
+only_pain = {"bool": {"must": [{"terms": {"metadata.symptom": ["knee", "back"]}}]}}
+
+
+def test_efficient_filter_is_not_overfetched(two_docs, monkeypatch):
+    monkeypatch.setattr(knn, "KNN_FILTER_MODE", "efficient")
+    response = knn.knn_search(fake_embeddings("knee pain"), only_pain)
+    assert len(response["hits"]["hits"]) == 2
+    assert len(two_docs) == 1
+
+
+def test_post_filter_is_overfetched(two_docs, monkeypatch):
+    monkeypatch.setattr(knn, "KNN_FILTER_MODE", "post")
+    knn.knn_search(fake_embeddings("knee pain"), only_pain)
+    assert [body["query"]["knn"][knn.VECTOR_FIELD]["k"] for body in two_docs][:2] == [5, 20]
+
+
+def test_empty_must_is_no_filter(two_docs, monkeypatch):
+    monkeypatch.setattr(knn, "KNN_FILTER_MODE", "post")
+    knn.knn_search(fake_embeddings("knee pain"), {"bool": {"must": [{"bool": {"must": []}}]}})
+    assert len(two_docs) == 1
+    assert "post_filter" not in two_docs[0]
+
+
+def test_hits_come_back_without_their_vectors(two_docs):
+    hits = knn.knn_search(fake_embeddings("knee pain"), None)["hits"]["hits"]
+    assert hits and all(set(hit["_source"]) == {"statement", "metadata"} for hit in hits)
+    assert two_docs[0]["_source"] == {"excludes": [knn.VECTOR_FIELD, FULL_VECTOR_FIELD]}
+
+    hits = knn.knn_search(fake_embeddings("knee pain"), None, fields=["statement", knn.VECTOR_FIELD])["hits"]["hits"]
+    assert all(set(hit["_source"]) == {"statement"} for hit in hits)
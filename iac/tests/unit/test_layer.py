@@ -0,0 +1,14 @@
+import os
+import zipfile
+
+from tests.unit.conftest import LAMBDA_DIR
+
+LAYER_ZIP = os.path.join(LAMBDA_DIR, "custom_packages", "layers", "aoss-layer.zip")
+
+
+def test_layer_ships_numpy_for_the_runtime():
+    # without it nearcache.py turns the L1 tier off in every deployed function
+    names = set(zipfile.ZipFile(LAYER_ZIP).namelist())
+    assert "python/numpy/__init__.py" in names
+    assert "python/numpy/__pycache__/__init__.cpython-310.pyc" in names
+    assert any(name.startswith("python/numpy/_core/_multiarray_umath.cpython-310-x86_64-linux-gnu") for name in names)
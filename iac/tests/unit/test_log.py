@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from aoss_common import log
+
+
+@pytest.fixture
+def lines(monkeypatch, capsys):
+    monkeypatch.setattr(log, "_request", {"route": None, "request_id": None, "debug": False})
+    monkeypatch.setattr(log, "LOG_LEVEL", log.LEVELS["INFO"])
+
+    def read():
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return read
+
+
+class Context:
+    aws_request_id = "req-1"
+
+
+def test_debug_lines_and_their_fields_cost_nothing_at_info(lines):
+    def payload():
+        raise AssertionError("evaluated")
+    log.begin_request("search", {"headers": {}}, Context())
+    log.debug("Search response", body=payload)
+    log.info("Page read", documents=3)
+    assert lines() == [{"level": "INFO", "msg": "Page read", "route": "search", "request_id": "req-1", "documents": 3}]
+
+
+def test_payloads_are_compacted_outside_debug(lines):
+    log.info("Embedded", vector=[0.25] * 1536, statement="x" * 300, ids=list(range(12)))
+    [line] = lines()
+    assert line["vector"] == "<vector[1536]>"
+    assert line["statement"] == "x" * log.LOG_MAX_STRING + "<44 more chars>"
+    assert line["ids"] == list(range(10)) + ["<2 more>"]
+
+
+def test_a_debug_header_turns_on_full_logging_for_one_request(lines, monkeypatch):
+    monkeypatch.setattr(log, "LOG_DEBUG_HEADER", True)
+    log.begin_request("search", {"headers": {"X-Debug-Log": "1"}})
+    log.debug("Search response", vector=lambda: [0.25] * 20)
+    log.begin_request("search", {"headers": {}})
+    log.debug("Search response", vector=[0.25] * 20)
+    [line] = lines()
+    assert line["vector"] == [0.25] * 20
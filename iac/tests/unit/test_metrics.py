@@ -0,0 +1,52 @@
+import pytest
+
+from aoss_common import metrics
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    local = metrics.LocalSink()
+    monkeypatch.setattr(metrics, "METRICS", True)
+    metrics.set_sink(local)
+    yield local
+    metrics.set_sink(None)
+
+
+def test_one_emf_record_per_invocation_with_summed_stages(sink):
+    @metrics.instrumented("search")
+    def handler(event, context):
+        with metrics.stage("Search"):
+            pass
+        metrics.timed("Search", lambda: None)
+        metrics.timed("Embeddings", lambda: None)
+        return {"statusCode": 200}
+
+    handler({}, None)
+    [record] = sink.records
+    definition = record["_aws"]["CloudWatchMetrics"][0]
+    assert definition["Dimensions"] == [["Route"]]
+    assert [metric["Name"] for metric in definition["Metrics"]] == ["Search", "Embeddings", "Total", "Errors"]
+    assert (record["Route"], record["StatusCode"], record["Errors"]) == ("search", 200, 0)
+    assert record["Total"] >= record["Search"] + record["Embeddings"]
+    assert set(sink.timings()) == {("search", "Search"), ("search", "Embeddings"), ("search", "Total")}
+
+
+def test_failures_count_as_errors(sink):
+    @metrics.instrumented("delete")
+    def failing(event, context):
+        return {"statusCode": 500}
+
+    @metrics.instrumented("delete")
+    def raising(event, context):
+        raise RuntimeError("boom")
+
+    failing({}, None)
+    with pytest.raises(RuntimeError):
+        raising({}, None)
+    assert [(record["StatusCode"], record["Errors"]) for record in sink.records] == [(500, 1), (None, 1)]
+
+
+def test_stages_outside_an_invocation_are_not_recorded(sink):
+    with metrics.stage("Search"):
+        pass
+    assert sink.records == []
@@ -0,0 +1,19 @@
+from tests.unit.conftest import fake_embeddings
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.migrate import migrate_index
+from aoss_common.similar import SIMILAR_INDEX_NAME, get_similar_store, similar_link
+from aoss_common.vectors import document_vectors
+
+
+def test_migration_keeps_the_source_links(memory_backend):
+    parent = memory_backend.index(AOSS_INDEX_NAME, {"statement": "knee pain", **document_vectors(fake_embeddings("knee pain"))})["_id"]
+    memory_backend.index(SIMILAR_INDEX_NAME, similar_link(parent, "knee pain at night", {}, {}))
+
+    result = migrate_index("statements-migrated", profile="fp16")
+    assert result["links"] == 1 and result["links_failed"] == 0
+
+    # the live index still sees its link, the migrated copy has its own
+    new_parent = next(iter(memory_backend.indices["statements-migrated"]["docs"]))
+    pages = get_similar_store().page([parent, new_parent])
+    assert list(pages[parent][0]) == ["knee pain at night"]
+    assert list(pages[new_parent][0]) == ["knee pain at night"]
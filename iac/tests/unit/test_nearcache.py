@@ -0,0 +1,48 @@
+import sys
+
+from aoss_common import nearcache
+
+
+def cache(**kwargs):
+    return nearcache.NearDuplicateCache(**{"capacity": 2, "dimension": 3, "threshold": 0.99, "ttl": 30, **kwargs})
+
+
+def test_a_near_identical_query_with_the_same_filters_is_served():
+    l1 = cache()
+    key = nearcache.query_key("statements", {"term": {"intent": "Inform"}}, 20, None)
+    l1.put([1.0, 0.0, 0.0], key, {"hits": ["knee"]})
+
+    assert l1.get([1.0, 0.001, 0.0], key) == {"hits": ["knee"]}
+    assert l1.get([1.0, 0.001, 0.0], nearcache.query_key("statements", None, 20, None)) is None
+    assert l1.get([0.0, 1.0, 0.0], key) is None
+
+
+def test_least_recently_used_rows_make_room_and_old_rows_expire(monkeypatch):
+    l1 = cache()
+    l1.put([1.0, 0.0, 0.0], 1, "x")
+    l1.put([0.0, 1.0, 0.0], 1, "y")
+    l1.get([1.0, 0.0, 0.0], 1)
+    l1.put([0.0, 0.0, 1.0], 1, "z")
+    assert (l1.get([1.0, 0.0, 0.0], 1), l1.get([0.0, 1.0, 0.0], 1)) == ("x", None)
+
+    now = nearcache.time.time()
+    monkeypatch.setattr(nearcache.time, "time", lambda: now + 31)
+    assert l1.get([1.0, 0.0, 0.0], 1) is None
+
+
+def test_a_write_drops_the_rows_near_it():
+    l1 = cache(capacity=3)
+    l1.put([1.0, 0.0, 0.0], 1, "knee")
+    l1.put([0.9, 0.1, 0.0], 2, "other filters, same neighbourhood")
+    l1.put([0.0, 1.0, 0.0], 1, "arm")
+    assert l1.invalidate([1.0, 0.05, 0.0]) == 2
+    assert (l1.get([1.0, 0.0, 0.0], 1), l1.get([0.0, 1.0, 0.0], 1)) == (None, "arm")
+
+
+def test_the_tier_is_off_without_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    monkeypatch.setattr(nearcache, "np", None)
+    monkeypatch.setattr(nearcache, "_cache", None)
+    monkeypatch.setattr(nearcache, "_unavailable", False)
+    assert nearcache.get_near_cache() is None
+    assert nearcache._unavailable
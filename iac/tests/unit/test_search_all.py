@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from tests.unit.conftest import load_handler
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.vectors import document_vectors, VECTOR_DIMENSION
+
+
+@pytest.mark.parametrize("size", ["abc", "0", "-5", "2.5"])
+def test_bad_page_size_is_a_client_error(memory_backend, size):
+    module = load_handler("search_all")
+    response = module.handler({"queryStringParameters": {"size": size}}, None)
+    assert response["statusCode"] == 400
+    assert size in json.loads(response["body"])["msg"]
+
+
+def test_pages_follow_the_cursor(memory_backend):
+    module = load_handler("search_all")
+    for statement in ("knee pain", "back pain", "neck pain"):
+        memory_backend.index(AOSS_INDEX_NAME, {"statement": statement})
+
+    seen, params = [], {"size": "2", "fields": "statement"}
+    while True:
+        response = module.handler({"queryStringParameters": params}, None)
+        assert response["statusCode"] == 200
+        body = json.loads(response["body"])
+        seen += [hit["_source"]["statement"] for hit in body["All results"]["hits"]["hits"]]
+        if body["cursor"] is None:
+            break
+        params = {**params, "cursor": body["cursor"]}
+    assert sorted(seen) == ["back pain", "knee pain", "neck pain"]
+
+
+def test_pages_leave_the_vectors_out(memory_backend):
+    module = load_handler("search_all")
+    memory_backend.index(AOSS_INDEX_NAME, {"statement": "knee pain", **document_vectors([0.5] * VECTOR_DIMENSION)})
+    body = json.loads(module.handler({"queryStringParameters": {}}, None)["body"])
+    assert [hit["_source"] for hit in body["All results"]["hits"]["hits"]] == [{"statement": "knee pain"}]
@@ -0,0 +1,89 @@
+import json
+import time
+
+import pytest
+
+from tests.unit.conftest import fake_embeddings, load_handler
+from aoss_common import searchcache
+from aoss_common.client import AOSS_INDEX_NAME
+from aoss_common.exact import statement_hash
+from aoss_common.vectors import document_vectors
+
+
+@pytest.fixture
+def search(memory_backend, fake_enrichment):
+    module = load_handler("search_post")
+    fake_enrichment(module)
+
+    def run(statement, **fields):
+        body = {"statement": statement, "intent": "", "severity": "", "source": "", "topics": [], "medicalConditions": [], **fields}
+        response = module.handler({"body": json.dumps(body)}, None)
+        assert response["statusCode"] == 200, response["body"]
+        return json.loads(response["body"])
+    run.calls = fake_enrichment.calls
+    return run
+
+
+def index_statement(backend, statement):
+    # a write made by another container: straight to the index, no record_write
+    backend.index(AOSS_INDEX_NAME, {
+        "statement": statement,
+        "statement-hash": statement_hash(statement),
+        **document_vectors(fake_embeddings(statement)),
+        "metadata": {"symptom": [statement.split()[-1]]},
+        "background": {"intent": "a", "severity": "b", "source": "c", "topic": ["topic"]}
+    })
+
+
+def test_repeated_search_is_served_from_the_cache(search, memory_backend):
+    index_statement(memory_backend, "i have a bad headache")
+    first = search("i have a bad headache", topics=["b", "a"])
+    calls = len(search.calls)
+    assert search("i have a bad headache", topics=["a", "b"]) == first
+    assert len(search.calls) == calls
+
+
+def test_generation_bump_retires_cached_responses(search, memory_backend):
+    assert search("i have a bad headache")["Search response"] == ""
+    index_statement(memory_backend, "i have a bad headache")
+    # not bumped yet: still the cached answer
+    assert search("i have a bad headache")["Search response"] == ""
+    searchcache.bump_generation()
+    assert search("i have a bad headache")["Search response"] != ""
+
+
+def test_new_generation_clears_the_near_duplicate_tier(search, memory_backend):
+    index_statement(memory_backend, "i have a bad headache")
+    first = search("i have a bad headache")
+    # different page size: not in the response cache, but the same kNN query for L1
+    index_statement(memory_backend, "i have a headache")
+    searchcache.bump_generation()
+    second = search("i have a bad headache", similarPageSize=3)
+    assert second != first
+
+
+def test_writes_not_yet_visible_hold_the_cache(search, memory_backend, monkeypatch):
+    monkeypatch.setattr(searchcache, "SEARCH_CACHE_HOLD", 0.2)
+    index_statement(memory_backend, "i have a bad headache")
+    searchcache.bump_generation(visible=False)
+    search("i have a bad headache")
+    calls = len(search.calls)
+    search("i have a bad headache")
+    assert len(search.calls) == calls + 1
+
+    time.sleep(0.25)
+    search("i have a bad headache")
+    calls = len(search.calls)
+    search("i have a bad headache")
+    assert len(search.calls) == calls
+
+
+def test_ingest_bumps_with_the_visibility_it_waited_for(memory_backend, fake_enrichment, monkeypatch):
+    module = load_handler("ingest_post")
+    fake_enrichment(module)
+    bumps = []
+    monkeypatch.setattr(module, "wait_for_writes", lambda writes: False)
+    monkeypatch.setattr(module, "bump_generation", lambda **kwargs: bumps.append(kwargs))
+    body = {"statement": "pain in my knee", "intent": "Inform", "severity": "Low", "source": "Patient"}
+    assert module.handler({"body": json.dumps(body)}, None)["statusCode"] == 200
+    assert bumps == [{"visible": False}]
@@ -0,0 +1,81 @@
+import time
+
+import requests
+from requests_aws4auth import AWS4Auth
+
+from aoss_common import signing
+from aoss_common.session import Credentials
+
+
+class Loader:
+    # hands out key-1, key-2, ... each expiring `lifetime` seconds after it is loaded
+    def __init__(self, lifetime):
+        self.lifetime = lifetime
+        self.loads = 0
+
+    def __call__(self):
+        self.loads += 1
+        expiry = time.time() + self.lifetime if self.lifetime is not None else None
+        return Credentials(f"key-{self.loads}", "secret", "token", expiry)
+
+
+def sign(auth):
+    request = auth(requests.Request("GET", "https://localhost/statements/_search").prepare())
+    return request.headers["Authorization"]
+
+
+def test_credentials_are_reused_until_they_near_expiry():
+    loader = Loader(lifetime=3600)
+    auth = signing.RefreshableSigV4Auth("us-east-1", "aoss", load_credentials=loader)
+    sign(auth)
+    sign(auth)
+    assert loader.loads == 1
+    assert auth.stats()["keys_derived"] == 1
+
+
+def test_credentials_are_reloaded_ahead_of_expiry():
+    loader = Loader(lifetime=signing.SIGV4_REFRESH_AHEAD - 1)
+    auth = signing.RefreshableSigV4Auth("us-east-1", "aoss", load_credentials=loader)
+    assert "key-1/" in sign(auth)
+    assert "key-2/" in sign(auth)
+    assert loader.loads == 2
+
+
+def test_a_failed_early_refresh_keeps_the_current_credentials():
+    loader = Loader(lifetime=signing.SIGV4_REFRESH_AHEAD - 1)
+    auth = signing.RefreshableSigV4Auth("us-east-1", "aoss", load_credentials=loader)
+    sign(auth)
+
+    def failing():
+        raise RuntimeError("metadata endpoint down")
+    auth._load_credentials = failing
+    assert "key-1/" in sign(auth)
+    assert auth.stats()["refresh_errors"] == 1
+
+
+def test_credentials_without_expiry_get_the_static_signer():
+    # the Lambda environment's credentials never change under the container
+    loader = Loader(lifetime=None)
+    auth = signing.sigv4_auth("us-east-1", "aoss", load_credentials=loader)
+    assert isinstance(auth, AWS4Auth)
+    assert "key-1/" in sign(auth)
+    assert "key-1/" in sign(auth)
+    assert loader.loads == 1
+
+    assert isinstance(signing.sigv4_auth("us-east-1", "aoss", load_credentials=Loader(lifetime=3600)), signing.RefreshableSigV4Auth)
+
+
+def test_an_expired_token_response_reloads_before_the_next_request():
+    loader = Loader(lifetime=3600)
+    auth = signing.RefreshableSigV4Auth("us-east-1", "aoss", load_credentials=loader)
+    sign(auth)
+
+    response = requests.Response()
+    response.status_code = 403
+    response._content = b'{"message": "The security token included in the request is expired"}'
+    auth._check_response(response)
+    assert "key-2/" in sign(auth)
+
+    response._content = b'{"message": "User is not authorized"}'
+    auth._check_response(response)
+    assert "key-2/" in sign(auth)
@@ -0,0 +1,63 @@
+import json
+
+from tests.unit.conftest import load_handler
+from aoss_common import similar
+
+
+def test_similar_page_size_is_clamped(memory_backend):
+    module = load_handler("search_post")
+    store = similar.AossSimilarStore()
+    store.append([similar.similar_link("parent", f"statement {i}", {}, {}) for i in range(similar.SIMILAR_PAGE_SIZE_MAX + 5)])
+
+    response = module.handler({"body": json.dumps({"similarParent": "parent", "similarPageSize": 10 ** 9})}, None)
+    body = json.loads(response["body"])
+    assert len(body["Similar statements"]) == similar.SIMILAR_PAGE_SIZE_MAX
+    assert body["Similar cursor"] is not None
+
+    for size in (0, -5):
+        entries, _ = store.page(["parent"], size=size)["parent"]
+        assert len(entries) == 1
+
+
+def stored_links(backend):
+    return [hit["_source"] for hit in backend.search(similar.SIMILAR_INDEX_NAME, {"size": 1000, "query": {"match_all": {}}})["hits"]["hits"]]
+
+
+def test_a_repeated_link_is_stored_once(memory_backend):
+    store = similar.AossSimilarStore()
+    link = similar.similar_link("parent", "pain in my knee", {}, {})
+    first, writes = store.append([link, dict(link)])
+    again, rewrites = store.append([similar.similar_link("parent", "pain in my knee", {}, {})])
+
+    assert len(writes) == 1 and rewrites == []
+    assert first[0]["id"] == first[1]["id"] == again[0]["id"]
+    assert [link["statement"] for link in stored_links(memory_backend)] == ["pain in my knee"]
+
+
+def test_reingesting_a_near_duplicate_keeps_full_pages(memory_backend, fake_enrichment, monkeypatch):
+    from aoss_common import ingest, singleflight
+    for statement in ("pain in my left knee", "pain in my knee", "pain in my knee", "sharp pain in my left knee", "pain in my knee"):
+        # as if the previous request's claim had expired
+        monkeypatch.setattr(singleflight, "_store", None)
+        ingest.ingest_batch([{"statement": statement, "intent": "Inform", "severity": "Low", "source": "Patient"}])
+    assert len(stored_links(memory_backend)) == 2
+    parent = next(iter(memory_backend.indices[ingest.AOSS_INDEX_NAME]["docs"]))
+
+    entries, cursor = similar.AossSimilarStore().page([parent], size=1)[parent]
+    assert len(entries) == 1 and cursor is not None
+    entries, cursor = similar.AossSimilarStore().page([parent], size=2)[parent]
+    assert len(entries) == 2 and cursor is None
+
+
+def test_deleting_a_document_deletes_its_links(memory_backend, monkeypatch):
+    from aoss_common.client import AOSS_INDEX_NAME
+    monkeypatch.setattr(similar, "SIMILAR_DELETE_BATCH", 2)
+    module = load_handler("delete_post")
+    parent = memory_backend.index(AOSS_INDEX_NAME, {"statement": "knee pain"})["_id"]
+    other = memory_backend.index(AOSS_INDEX_NAME, {"statement": "headache"})["_id"]
+    store = similar.AossSimilarStore()
+    store.append([similar.similar_link(parent, f"knee pain {i}", {}, {}) for i in range(5)] + [similar.similar_link(other, "bad headache", {}, {})])
+
+    response = module.handler({"body": json.dumps({"id": parent})}, None)
+    assert response["statusCode"] == 200
+    assert [(link["parent-id"], link["statement"]) for link in stored_links(memory_backend)] == [(other, "bad headache")]
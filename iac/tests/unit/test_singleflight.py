@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from aoss_common import singleflight
+
+
+@pytest.fixture
+def claims(monkeypatch):
+    store = singleflight.LocalClaimStore()
+    monkeypatch.setattr(singleflight, "_store", store)
+    monkeypatch.setattr(singleflight, "CLAIM_POLL_INTERVAL", 0.01)
+    return store
+
+
+def run_in_thread(fn):
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(result=fn()))
+    thread.start()
+    return thread, outcome
+
+
+def test_concurrent_callers_share_one_run(claims):
+    started, release = threading.Event(), threading.Event()
+    runs = []
+
+    def ingest():
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return {"status": "created", "id": "doc-1"}
+
+    thread, first = run_in_thread(lambda: singleflight.single_flight("key", ingest))
+    started.wait(5)
+    waiter, second = run_in_thread(lambda: singleflight.single_flight("key", ingest))
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+
+    assert runs == [1]
+    assert first["result"] == ({"status": "created", "id": "doc-1"}, False)
+    assert second["result"] == ({"status": "created", "id": "doc-1"}, True)
+
+
+def test_a_waiter_takes_over_when_the_holder_fails(claims):
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("embeddings unavailable")
+
+    def holder():
+        try:
+            singleflight.single_flight("key", failing)
+        except RuntimeError as e:
+            return e
+
+    thread, first = run_in_thread(holder)
+    started.wait(5)
+    waiter, second = run_in_thread(lambda: singleflight.single_flight("key", lambda: {"status": "created"}))
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+
+    assert isinstance(first["result"], RuntimeError)
+    assert second["result"] == ({"status": "created"}, False)
+    assert claims.get("key")["status"] == "done"
+
+
+def test_a_dead_holder_is_taken_over_once_its_lease_runs_out(claims, monkeypatch):
+    monkeypatch.setattr(singleflight, "CLAIM_LEASE", 0.05)
+    assert claims.acquire("key", "dead-container") is None
+
+    started = time.monotonic()
+    result, shared = singleflight.single_flight("key", lambda: {"status": "created"}, deadline=5)
+    assert (result, shared) == ({"status": "created"}, False)
+    assert time.monotonic() - started >= 0.04
+    assert claims.get("key")["owner"] != "dead-container"
+
+
+def test_a_live_holder_makes_waiters_time_out(claims):
+    claims.acquire("key", "busy-container")
+    with pytest.raises(singleflight.ClaimTimeout):
+        singleflight.single_flight("key", lambda: {"status": "created"}, deadline=0.05)
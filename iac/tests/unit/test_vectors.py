@@ -0,0 +1,28 @@
+import numpy as np
+
+from aoss_common.ingest import plan_statement
+from aoss_common.vectors import cosine, cosine_score, is_exact_score, rescore, FULL_VECTOR_FIELD
+
+
+def test_identical_vectors_rescore_as_exact():
+    rng = np.random.default_rng(7)
+    for _ in range(200):
+        vector = rng.normal(size=1536).tolist()
+        similarity = cosine(vector, vector)
+        assert -1.0 <= similarity <= 1.0
+        hits = rescore([{"_id": "a", "_score": 0.5, "_source": {FULL_VECTOR_FIELD: vector}}], vector, 1)
+        assert is_exact_score(hits[0]["_score"])
+
+
+def test_near_exact_score_is_not_linked_as_similar():
+    document = {"statement": "knee pain", "metadata": {}, "background": {}}
+    links = []
+    status, doc_ids = plan_statement(document, [{"_id": "a", "_score": 0.9999999}], links)
+    assert (status, doc_ids, links) == ("exact", [], [])
+
+
+def test_similar_score_still_maps():
+    document = {"statement": "knee pain", "metadata": {}, "background": {}}
+    links = []
+    status, doc_ids = plan_statement(document, [{"_id": "a", "_score": cosine_score(0.9)}], links)
+    assert (status, doc_ids) == ("mapped", ["a"])